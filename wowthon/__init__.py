@@ -4,27 +4,56 @@ __version__ = '0.3.0a'
 __all__ = [
     'WoWAPI', 'Realm', 'Guild', 'GuildEmblem', 'Character', 'Auction',
     'AuctionListings', 'Item', 'TalentSpec', 'Quest', 'Achievement',
-    'ItemSet', 'ArenaTeam', 'APIError'
+    'ItemSet', 'ArenaTeam', 'APIError', 'ConnectionPool',
+    'AsyncWoWAPI', 'RateLimiter', 'QuotaExceededError', 'CircuitBreaker',
+    'CircuitOpenError', 'SingleFlight', 'Transport', 'Response',
+    'UrllibTransport', 'FakeBattleNet', 'Cache',
+    'PersistentStore', 'ShardedCache', 'AuctionColumns', 'AuctionDiff',
+    'PriceHistory', 'MarketStats', 'DumpCache', 'AuctionHarvester'
 ]
 
 #
 # Package imports
 #
 from wowthon.fetch import _FetchMixin
+from wowthon.transport import Transport, Response, UrllibTransport
+from wowthon.pool import ConnectionPool, PooledResponse
+from wowthon.ratelimit import RateLimiter
+from wowthon.breaker import CircuitBreaker
+from wowthon.singleflight import SingleFlight
+from wowthon.cache import Cache, ShardedCache
+from wowthon.store import PersistentStore
+from wowthon.dumpcache import DumpCache
 from wowthon.wowapi import WoWAPI
+from wowthon.asyncapi import AsyncWoWAPI
 from wowthon.realm import Realm
 from wowthon.guild import Guild, GuildEmblem
 from wowthon.character import Character, TalentSpec
-from wowthon.auctions import Auction, AuctionListings
+from wowthon.auctions import Auction, AuctionListings, AuctionColumns, \
+                             AuctionDiff, MarketStats
 from wowthon.item import Item, ItemSet
 from wowthon.quest import Quest
 from wowthon.achievement import Achievement
 from wowthon.pvp import ArenaTeam
-from wowthon.exceptions import APIError
+from wowthon.snapshot import CacheSnapshot
+from wowthon.history import PriceHistory
+from wowthon.harvest import AuctionHarvester
+from wowthon.fakeserver import FakeBattleNet
+from wowthon.exceptions import APIError, QuotaExceededError, \
+                               CircuitOpenError
 
 # Hide package structure
 del fetch
+del transport
+del pool
+del ratelimit
+del breaker
+del singleflight
+del cache
+del store
+del dumpcache
 del wowapi
+del asyncapi
 del realm
 del guild
 del character
@@ -33,6 +62,10 @@ del item
 del quest
 del achievement
 del pvp
+del snapshot
+del history
+del harvest
+del fakeserver
 del exceptions
 
 #
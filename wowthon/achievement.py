@@ -9,6 +9,7 @@ class Achievement(wowthon._FetchMixin):
     """
 
     _PATH = 'achievement/'
+    _STORE_KIND = 'ach'
 
     def __init__(self, api, id, region=None, locale=None, json=None):
         """
@@ -30,6 +31,8 @@ class Achievement(wowthon._FetchMixin):
         if not locale: locale = api.locale
         self._api = api
         self._id = id
+        self._region = region
+        self._locale = locale
         self._json = json
         self._url = wowthon.REGION[region]['prefix'] + self._PATH + \
                     str(id) + '?locale=' + locale
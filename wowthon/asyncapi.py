@@ -0,0 +1,128 @@
+﻿import asyncio
+import concurrent.futures
+
+import wowthon
+
+class AsyncWoWAPI:
+    """
+    An asyncio front end to `wowthon.WoWAPI`.
+
+    The getters return awaitables which resolve to fully downloaded objects,
+    so that many requests can be made at once:
+
+        api = wowthon.AsyncWoWAPI('Draenor', 'eu', concurrency=20)
+        chars = await asyncio.gather(*[api.get_char(n) for n in names])
+
+    Requests are run on a pool of `concurrency` worker threads using the
+    wrapped synchronous API, available as `AsyncWoWAPI.api`. The objects
+    returned are the usual entity classes and share the synchronous API's
+    cache, so their properties can be read as normal once loaded.
+
+    """
+    def __init__(self, realm, region='us', locale='', private_key='',
+                 public_key='', concurrency=10, api=None):
+        """
+        Construct a new AsyncWoWAPI for the specified realm.
+
+        Arguments:
+        realm -- the WoW realm on which the API will operate
+
+        Keyword Arguments:
+        region -- the server region (default 'us')
+        locale -- the locale to use (default '')
+        private_key -- your private API key (default '')
+        public_key -- your public API key (default '')
+        concurrency -- the maximum number of requests in flight at once
+                       (default 10)
+        api -- an existing `wowthon.WoWAPI` to wrap instead of creating a
+               new one. The other arguments are then ignored. It should be
+               created with `thread_safe=True`. (default None)
+
+        """
+        if api is None:
+            pool = wowthon.ConnectionPool(max_size=concurrency)
+            api = wowthon.WoWAPI(realm, region, locale, private_key,
+                                 public_key, transport=pool,
+                                 thread_safe=True)
+        self.api = api
+        self.concurrency = concurrency
+        self._executor = concurrent.futures.ThreadPoolExecutor(concurrency)
+        api._executor = self._executor
+
+    def __getattr__(self, name):
+        # Anything not made asynchronous is taken from the wrapped API
+        return getattr(self.api, name)
+
+    def close(self):
+        """Shut down the worker threads used for requests."""
+        self.api._executor = None
+        self._executor.shutdown()
+
+    def _load(self, getter, *args, **kwargs):
+        """
+        Return an awaitable which calls `getter` and fetches the result.
+
+        """
+        def load():
+            obj = getter(*args, **kwargs)
+            obj._fetch()
+            return obj
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(self._executor, load)
+
+    def get_realm(self, *realms, **kwargs):
+        """
+        Return an awaitable resolving to a list of loaded Realm objects.
+
+        Takes the same arguments as `wowthon.WoWAPI.get_realm`.
+
+        """
+        if not realms: realms = [self.api.realm]
+        loads = [self._load(lambda r: self.api.get_realm(r, **kwargs)[0], r)
+                 for r in realms]
+        return asyncio.gather(*loads)
+
+    def get_guild(self, *args, **kwargs):
+        """
+        Return an awaitable resolving to a loaded Guild object.
+
+        Takes the same arguments as `wowthon.WoWAPI.get_guild`.
+
+        """
+        return self._load(self.api.get_guild, *args, **kwargs)
+
+    def get_char(self, *args, **kwargs):
+        """
+        Return an awaitable resolving to a loaded Character object.
+
+        Takes the same arguments as `wowthon.WoWAPI.get_char`.
+
+        """
+        return self._load(self.api.get_char, *args, **kwargs)
+
+    def get_item(self, *args, **kwargs):
+        """
+        Return an awaitable resolving to a loaded Item object.
+
+        Takes the same arguments as `wowthon.WoWAPI.get_item`.
+
+        """
+        return self._load(self.api.get_item, *args, **kwargs)
+
+    def get_quest(self, *args, **kwargs):
+        """
+        Return an awaitable resolving to a loaded Quest object.
+
+        Takes the same arguments as `wowthon.WoWAPI.get_quest`.
+
+        """
+        return self._load(self.api.get_quest, *args, **kwargs)
+
+    def get_achieve(self, *args, **kwargs):
+        """
+        Return an awaitable resolving to a loaded Achievement object.
+
+        Takes the same arguments as `wowthon.WoWAPI.get_achieve`.
+
+        """
+        return self._load(self.api.get_achieve, *args, **kwargs)
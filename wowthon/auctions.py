@@ -1,10 +1,17 @@
 ﻿import urllib.request
 from urllib.error import HTTPError #, URLError # Need URLError?
 import json as jsonlib
+import codecs
+import re
+import array
+import bisect
+import itertools
+import mmap
+import struct
+import sys
 import wowthon
 
 class AuctionListings(wowthon._FetchMixin):
-    # TODO Do updates and last modified
     #: A list of valid auction house names
     AUCTION_HOUSES = [
         'alliance',
@@ -21,7 +28,20 @@ class AuctionListings(wowthon._FetchMixin):
 
     _PATH = 'auction/data/'
 
-    def __init__(self, api, realm=None, region=None):
+    def __init__(self, api, realm=None, region=None, stream=False):
+        """
+        Create the auction listings for a realm.
+
+        Optional arguments:
+        realm -- the realm whose auction houses are listed (default: api
+                 settings)
+        region -- the region of the realm (default: api settings)
+        stream -- if true, `auctions` and `all_auctions` return iterators
+                  reading auctions from the dump as it downloads, instead
+                  of lists. See `AuctionListings.iter_auctions`.
+                  (default: False)
+
+        """
         if not realm:
             realm = api.realm
         if not region:
@@ -35,20 +55,139 @@ class AuctionListings(wowthon._FetchMixin):
         self._url = wowthon.REGION[self._region]['prefix'] + self._PATH \
                     + self._realm
         self._auctions = {}
-        self._last_modified = 0
+        self._columns = None
+        # The lastModified time of the dump the listings were read from
+        self._dump_modified = None
+        # The binary snapshot the listings were opened from, if any
+        self._path = None
+        self.stream = stream
+
+    @classmethod
+    def open_binary(cls, api, path):
+        """
+        Open listings saved by `AuctionListings.save_binary`.
+
+        The file is memory mapped rather than read, so opening it takes
+        about as long whatever its size. The listings are only ever read
+        from the file, never downloaded.
+
+        Throws:
+        ValueError -- if the file is not a binary auction snapshot
+
+        """
+        columns = AuctionColumns.open(api, path)
+        ret = cls(api, columns._realm, columns._region)
+        ret._columns = columns
+        ret._dump_modified = columns.dump_modified
+        ret._path = path
+        return ret
+
+    def save_binary(self, path):
+        """
+        Save the listings to a binary snapshot at `path`, to be opened again
+        with `AuctionListings.open_binary`.
+
+        See `AuctionColumns.save`.
+
+        """
+        columns = self.to_columns()
+        columns.dump_modified = self._dump_modified
+        columns.save(path)
+
+    @property
+    def dump_modified(self):
+        """
+        Returns the lastModified time, in milliseconds, of the dump the
+        listings were last read from, or None if none has been read.
+
+        """
+        return self._dump_modified
+
+    def refresh(self):
+        """
+        Check the auction data index for a newer dump than the one the
+        listings were read from.
+
+        If there is one, the listings are cleared, to be read from the new
+        dump when next used, and True is returned. If not, nothing more is
+        downloaded and False is returned. Listings opened from a binary
+        snapshot are never refreshed.
+
+        """
+        if self._path is not None:
+            return False
+        self._fetch(force=True)
+        return self._check_dump()
+
+    def _check_dump(self):
+        """
+        Clear the listings if the index lists a different dump to the one
+        they were read from. Returns true if they were cleared.
+
+        """
+        if self._path is not None:
+            # Saved listings do not change
+            return False
+        modified = self._json_property('files')[0]['lastModified']
+        if modified == self._dump_modified:
+            return False
+        self._ah_json = None
+        self._auctions = {}
+        self._columns = None
+        self._dump_modified = None
+        return True
+
+    def _dump_chunks(self):
+        """
+        Yield the pieces of the current dump, from the API's dump cache if
+        it has it and downloading it otherwise.
+
+        """
+        # Anything read from an older dump is cleared first, so that it is
+        # not taken as read from this one
+        self._check_dump()
+        files = self._json_property('files')
+        url = files[0]['url']
+        modified = files[0]['lastModified']
+        cache = self._api.dump_cache
+        if cache is None:
+            chunks = self._api._stream(url)
+        else:
+            chunks = cache.get(self._region, self._realm, modified)
+            if chunks is None:
+                chunks = cache.put(self._region, self._realm, modified,
+                                   self._api._stream(url))
+        yield from chunks
+        self._dump_modified = modified
 
     def _get_data(self):
+        self._check_dump()
         if not self._ah_json:
-            # TODO Check last modified
-            # Get the file URL
-            url = self._json_property('files')[0]['url']
-            # Download the data
-            fp = urllib.request.urlopen(url)
-            # Read and convert to UTF-8 (json doesn't work on bytes)
-            data = fp.readall().decode('utf-8')
-            # Interpret the JSON
-            self._ah_json = jsonlib.loads(data)
+            modified = self._json_property('files')[0]['lastModified']
+            if self._api.dump_cache is None:
+                # Download the data, compressed if the server allows
+                url = self._json_property('files')[0]['url']
+                self._ah_json = self._api._get_json(url)
+            else:
+                self._ah_json = self._api._decode_json(
+                    b''.join(self._dump_chunks()))
+            self._dump_modified = modified
+
+    def iter_auctions(self, ah=None):
+        """
+        Download the auction dump, yielding an Auction for each auction in
+        the auction house `ah`, or in every auction house if `ah` is None,
+        as it arrives.
+
+        The dump is parsed a piece at a time, so only a small part of it is
+        ever held in memory. Every call downloads the dump again, unless
+        the API has a `wowthon.DumpCache`.
 
+        """
+        for house, auction in _parse_dump(self._dump_chunks()):
+            if house == ah or (ah is None and
+                               house in AuctionListings.AUCTION_HOUSES):
+                yield Auction(self._api, auction)
 
     def auctions(self, ah):
         """
@@ -56,7 +195,21 @@ class AuctionListings(wowthon._FetchMixin):
 
         Valid auction houses are listed in `AuctionListings.AUCTION_HOUSES`
 
+        In streaming mode, an iterator over the auctions is returned
+        instead, see `AuctionListings.iter_auctions`.
+
         """
+        if self.stream:
+            return self.iter_auctions(ah)
+        if self._path is not None:
+            data = self._auctions.get(ah)
+            if data is None:
+                house = AuctionListings.AUCTION_HOUSES.index(ah)
+                columns = self._columns
+                data = [columns[i] for i in range(len(columns))
+                        if columns.house[i] == house]
+                self._auctions[ah] = data
+            return data
         self._get_data()
         data = self._auctions.get(ah)
         if not data:
@@ -69,11 +222,928 @@ class AuctionListings(wowthon._FetchMixin):
         return data
 
     def all_auctions(self):
+        if self.stream:
+            return self.iter_auctions()
         ret = []
         for ah in AuctionListings.AUCTION_HOUSES:
             ret.extend(self.auctions(ah))
         return ret
 
+    def to_columns(self):
+        """
+        Return every auction of the realm as an `AuctionColumns`, which
+        keeps them in compact arrays rather than as Auction objects.
+
+        If the dump has not been downloaded already, it is streamed straight
+        into the arrays without being held in memory. The columns are built
+        once and returned again by later calls, until a newer dump is found
+        by `AuctionListings.refresh`.
+
+        """
+        self._check_dump()
+        if self._columns is None:
+            columns = AuctionColumns(self._api, self._realm, self._region)
+            if self._ah_json:
+                for house in AuctionListings.AUCTION_HOUSES:
+                    for auction in self._ah_json[house]['auctions']:
+                        columns.append(house, auction)
+            else:
+                for house, auction in _parse_dump(self._dump_chunks()):
+                    if house in AuctionListings.AUCTION_HOUSES:
+                        columns.append(house, auction)
+            self._columns = columns
+        return self._columns
+
+    def cheapest(self, item_id, n=1):
+        """
+        Return a list of the `n` auctions of the item `item_id` with the
+        lowest buyout price per item, cheapest first.
+
+        See `AuctionColumns.cheapest`.
+
+        """
+        return self.to_columns().cheapest(item_id, n)
+
+    def by_owner(self, name):
+        """
+        Return a list of every auction listed by the character `name`.
+
+        See `AuctionColumns.by_owner`.
+
+        """
+        return self.to_columns().by_owner(name)
+
+    def in_price_range(self, item_id, lo=None, hi=None):
+        """
+        Return a list of the auctions of the item `item_id` with a buyout
+        price per item from `lo` to `hi`, cheapest first.
+
+        See `AuctionColumns.in_price_range`.
+
+        """
+        return self.to_columns().in_price_range(item_id, lo, hi)
+
+    def market_stats(self, percentiles=(10, 25, 50, 75, 90), fence=1.5):
+        """
+        Return the `MarketStats` of every item listed with a buyout.
+
+        See `AuctionColumns.market_stats`.
+
+        """
+        return self.to_columns().market_stats(percentiles, fence)
+
+    def diff(self, previous):
+        """
+        Return an `AuctionDiff` of the changes to these listings since
+        `previous`, an earlier AuctionListings or AuctionColumns of the same
+        realm.
+
+        Both snapshots are compared as columns, see
+        `AuctionListings.to_columns`. Columns `previous` has already read
+        are used as they are, without checking for a newer dump.
+
+        """
+        if isinstance(previous, AuctionListings):
+            if previous._columns is not None:
+                previous = previous._columns
+            else:
+                previous = previous.to_columns()
+        return AuctionDiff(previous, self.to_columns())
+
+class AuctionColumns:
+    """
+    The auctions of a realm, stored column by column in arrays with one row
+    per auction.
+
+    Rows take a few dozen bytes each, against several hundred for an
+    Auction object and its dictionary. Owner names are interned, so that the
+    `owner` column holds an index into `owners`, and the `house` and
+    `time_left` columns hold indexes into `AuctionListings.AUCTION_HOUSES`
+    and `time_left_names`.
+
+    The columns are `array.array` objects, so they can be wrapped by other
+    libraries without copying, e.g. `numpy.frombuffer(columns.buyout,
+    'int64')`.
+
+    Indexing returns an Auction for a row, made when it is asked for:
+
+        columns = listings.to_columns()
+        auction = columns[0]
+
+    Auctions can be looked up by item, owner and price. The indexes used
+    are built together by the first lookup, in a single pass over the rows,
+    and kept until more rows are appended.
+
+    """
+    #: Identifies the binary snapshot format
+    MAGIC = b'WOWAUCTS'
+    #: The version of the binary snapshot format
+    VERSION = 1
+    # Magic, version, header offset and header length
+    _HEADER = struct.Struct('<8sIQQ')
+    # The columns saved in binary snapshots
+    _COLUMNS = ['auc', 'item', 'owner', 'bid', 'buyout', 'quantity',
+                'time_left', 'house']
+
+    def __init__(self, api, realm=None, region=None):
+        """
+        Create an empty set of columns for the auctions of a realm.
+
+        """
+        self._api = api
+        self._realm = realm
+        self._region = region
+
+        #: The auction ids
+        self.auc = array.array('q')
+        #: The item ids
+        self.item = array.array('i')
+        #: Indexes into `owners`
+        self.owner = array.array('i')
+        self.bid = array.array('q')
+        #: The buyout prices, 0 where there is none
+        self.buyout = array.array('q')
+        self.quantity = array.array('i')
+        #: Indexes into `time_left_names`
+        self.time_left = array.array('b')
+        #: Indexes into `AuctionListings.AUCTION_HOUSES`
+        self.house = array.array('b')
+
+        #: The names of the auction owners
+        self.owners = []
+        #: The possible values of time_left
+        self.time_left_names = list(AuctionListings.TIME_LEFT)
+        # name -> index into owners
+        self._owner_ids = {}
+        self._time_left_ids = dict(
+            (n, i) for i, n in enumerate(self.time_left_names))
+        self._house_ids = dict(
+            (n, i) for i, n in enumerate(AuctionListings.AUCTION_HOUSES))
+        # item id -> (rows, unit buyouts), sorted by unit buyout
+        self._items = None
+        # item id -> [auctions, quantity listed]
+        self._item_totals = None
+        # owner index -> rows
+        self._owner_rows = None
+        # Rows in order of auction id
+        self._id_order = None
+        # The memory map of a saved snapshot the columns were opened from
+        self._map = None
+
+        #: The lastModified time of the dump the columns were read from, if
+        #: known
+        self.dump_modified = None
+
+    def _intern(self, names, ids, name):
+        """Return the index of `name` in `names`, adding it if needed."""
+        ret = ids.get(name)
+        if ret is None:
+            ret = ids[name] = len(names)
+            names.append(name)
+        return ret
+
+    def append(self, house, json):
+        """
+        Add the auction dictionary `json`, from the auction house `house`,
+        as a new row.
+
+        Throws:
+        TypeError -- if the columns were opened from a saved snapshot
+
+        """
+        if self._map is not None:
+            raise TypeError('Saved auction snapshots cannot be changed.')
+        self.auc.append(json['auc'])
+        self.item.append(json['item'])
+        self.owner.append(self._intern(self.owners, self._owner_ids,
+                                       json['owner']))
+        self.bid.append(json['bid'])
+        self.buyout.append(json['buyout'])
+        self.quantity.append(json['quantity'])
+        self.time_left.append(self._intern(self.time_left_names,
+                                           self._time_left_ids,
+                                           json['timeLeft']))
+        self.house.append(self._house_ids[house])
+        self._items = None
+        self._item_totals = None
+        self._owner_rows = None
+        self._id_order = None
+
+    def row(self, i):
+        """
+        Return the auction in row `i` as a dictionary, in the form used by
+        the API.
+
+        """
+        return {
+            'auc' : self.auc[i],
+            'item' : self.item[i],
+            'owner' : self.owners[self.owner[i]],
+            'bid' : self.bid[i],
+            'buyout' : self.buyout[i],
+            'quantity' : self.quantity[i],
+            'timeLeft' : self.time_left_names[self.time_left[i]]
+        }
+
+    def _build_indexes(self):
+        """
+        Build the item and owner indexes, and the totals listed of each
+        item, with one pass over the rows.
+
+        An item index already in place, such as the one saved with opened
+        columns, is kept rather than built again.
+
+        """
+        build_items = self._items is None
+        items = {}
+        totals = {}
+        owner_rows = [array.array('i') for name in self.owners]
+        item = self.item
+        owner = self.owner
+        buyout = self.buyout
+        quantity = self.quantity
+        for i in range(len(self.auc)):
+            owner_rows[owner[i]].append(i)
+            total = totals.get(item[i])
+            if total is None:
+                total = totals[item[i]] = [0, 0]
+            total[0] += 1
+            total[1] += quantity[i]
+            # Auctions without a buyout can only be bid on
+            if build_items and buyout[i]:
+                unit = buyout[i] / quantity[i]
+                prices = items.get(item[i])
+                if prices is None:
+                    prices = items[item[i]] = []
+                prices.append((unit, i))
+
+        for item_id, prices in items.items():
+            prices.sort()
+            items[item_id] = (array.array('i', [i for p, i in prices]),
+                              array.array('d', [p for p, i in prices]))
+        self._owner_rows = owner_rows
+        self._item_totals = totals
+        if build_items:
+            self._items = items
+
+    def _item_index(self, item_id):
+        """
+        Return a tuple (rows, unit buyouts) for the auctions of `item_id`
+        which have a buyout, sorted by unit buyout.
+
+        """
+        if self._items is None:
+            self._build_indexes()
+        return self._items.get(item_id, ((), ()))
+
+    def item_totals(self):
+        """
+        Return a dictionary of item id -> (number of auctions, quantity
+        listed) for every item listed.
+
+        """
+        if self._item_totals is None:
+            self._build_indexes()
+        return dict((item_id, tuple(total))
+                    for item_id, total in self._item_totals.items())
+
+    def cheapest(self, item_id, n=1):
+        """
+        Return a list of the `n` auctions of the item `item_id` with the
+        lowest buyout price per item, cheapest first.
+
+        Auctions without a buyout price are left out.
+
+        """
+        rows = self._item_index(item_id)[0]
+        return [self[i] for i in rows[:n]]
+
+    def by_owner(self, name):
+        """
+        Return a list of every auction listed by the character `name`, in
+        row order.
+
+        """
+        if self._owner_ids is None:
+            self._owner_ids = dict((n, i) for i, n in enumerate(self.owners))
+        owner = self._owner_ids.get(name)
+        if owner is None:
+            return []
+        if self._owner_rows is None:
+            self._build_indexes()
+        return [self[i] for i in self._owner_rows[owner]]
+
+    def in_price_range(self, item_id, lo=None, hi=None):
+        """
+        Return a list of the auctions of the item `item_id` with a buyout
+        price per item from `lo` to `hi` inclusive, cheapest first.
+
+        Auctions without a buyout price are left out.
+
+        Optional arguments:
+        lo -- the lowest price per item, or None for no lower limit
+              (default: None)
+        hi -- the highest price per item, or None for no upper limit
+              (default: None)
+
+        """
+        rows, prices = self._item_index(item_id)
+        start = 0
+        end = len(rows)
+        if lo is not None:
+            start = bisect.bisect_left(prices, lo)
+        if hi is not None:
+            end = bisect.bisect_right(prices, hi)
+        return [self[i] for i in rows[start:end]]
+
+    def market_stats(self, percentiles=(10, 25, 50, 75, 90), fence=1.5):
+        """
+        Return a `MarketStats` table of the buyout prices per item of every
+        item listed with a buyout.
+
+        The statistics are taken over the items listed rather than the
+        auctions, so that an auction of 20 counts 20 times. They are found
+        from the item index, whose prices are already sorted, with a
+        running total of the quantity listed and a binary search for each
+        percentile.
+
+        Optional arguments:
+        percentiles -- the percentiles of the price per item to find
+                       (default: (10, 25, 50, 75, 90))
+        fence -- outliers are left out of the trimmed median if their price
+                 is further than `fence` times the interquartile range
+                 below the 25th or above the 75th percentile
+                 (default: 1.5)
+
+        """
+        if self._items is None:
+            self._build_indexes()
+        ret = MarketStats(percentiles)
+        quantity = self.quantity
+        buyout = self.buyout
+        columns = [ret.percentiles[p] for p in percentiles]
+
+        for item_id in sorted(self._items):
+            rows, prices = self._items[item_id]
+            counts = array.array('q', itertools.accumulate(
+                quantity[i] for i in rows))
+            total = counts[-1]
+            for column, p in zip(columns, percentiles):
+                column.append(_percentile(prices, counts, p))
+            low = _percentile(prices, counts, 25)
+            high = _percentile(prices, counts, 75)
+            spread = (high - low) * fence
+            start = bisect.bisect_left(prices, low - spread)
+            end = bisect.bisect_right(prices, high + spread)
+
+            ret.item.append(item_id)
+            ret.auctions.append(len(rows))
+            ret.quantity.append(total)
+            ret.mean.append(sum(buyout[i] for i in rows) / total)
+            ret.trimmed_median.append(
+                _percentile(prices, counts, 50, start, end))
+            ret.outliers.append(len(rows) - (end - start))
+        return ret
+
+    def id_order(self):
+        """
+        Return an array of the row numbers in order of auction id.
+
+        Dumps list each auction house in close to id order, which the sort
+        takes advantage of. The order is kept until more rows are appended.
+
+        """
+        if self._id_order is None:
+            self._id_order = array.array(
+                'i', sorted(range(len(self.auc)), key=self.auc.__getitem__))
+        return self._id_order
+
+    def house_of(self, i):
+        """Return the name of the auction house of row `i`."""
+        return AuctionListings.AUCTION_HOUSES[self.house[i]]
+
+    def save(self, path):
+        """
+        Save the columns to a binary snapshot at `path`, to be opened again
+        with `AuctionColumns.open`.
+
+        The file holds each column as an array of fixed width values, the
+        owner names as a table of UTF-8 strings, and the item index used by
+        `AuctionColumns.cheapest` and `AuctionColumns.in_price_range`. A
+        small JSON header records where each part starts.
+
+        """
+        if self._items is None:
+            self._build_indexes()
+        item_ids = sorted(self._items)
+        starts = array.array('q', [0])
+        rows = array.array('i')
+        prices = array.array('d')
+        for item_id in item_ids:
+            item_rows, item_prices = self._items[item_id]
+            rows.extend(item_rows)
+            prices.extend(item_prices)
+            starts.append(len(rows))
+
+        owner_starts = array.array('q', [0])
+        owner_data = bytearray()
+        for name in self.owners:
+            owner_data += bytes(name, 'UTF-8')
+            owner_starts.append(len(owner_data))
+
+        parts = [(name, getattr(self, name)) for name in self._COLUMNS]
+        parts += [
+            ('index_items', array.array('i', item_ids)),
+            ('index_starts', starts),
+            ('index_rows', rows),
+            ('index_prices', prices),
+            ('owner_starts', owner_starts),
+            ('owner_data', array.array('B', owner_data))
+        ]
+
+        layout = {}
+        with open(path, 'wb') as f:
+            f.write(self._HEADER.pack(self.MAGIC, self.VERSION, 0, 0))
+            for name, values in parts:
+                # Keep every part aligned for its values
+                f.write(bytes(-f.tell() % 8))
+                values = memoryview(values)
+                layout[name] = [f.tell(), values.format, len(values)]
+                f.write(values.cast('B'))
+            header = {
+                'byteorder' : sys.byteorder,
+                'realm' : self._realm,
+                'region' : self._region,
+                'dump_modified' : self.dump_modified,
+                'time_left_names' : self.time_left_names,
+                'parts' : layout
+            }
+            offset = f.tell()
+            data = bytes(jsonlib.dumps(header, separators=(',', ':')),
+                         'UTF-8')
+            f.write(data)
+            f.seek(0)
+            f.write(self._HEADER.pack(self.MAGIC, self.VERSION, offset,
+                                      len(data)))
+
+    @classmethod
+    def open(cls, api, path):
+        """
+        Open the columns saved by `AuctionColumns.save` at `path`.
+
+        The file is memory mapped, and every column is a view of it rather
+        than a copy, so only the parts which are used are ever read. The
+        columns cannot be changed.
+
+        Throws:
+        ValueError -- if the file is not a binary auction snapshot
+
+        """
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, offset, length = cls._HEADER.unpack_from(mapped)
+            if magic != cls.MAGIC or version != cls.VERSION:
+                raise ValueError('"' + path + '" is not an auction snapshot.')
+            header = jsonlib.loads(mapped[offset:offset + length])
+            if header['byteorder'] != sys.byteorder:
+                raise ValueError('"' + path + '" was saved on a machine '
+                                 'with a different byte order.')
+        except Exception:
+            mapped.close()
+            raise
+
+        view = memoryview(mapped)
+        parts = {}
+        for name, (start, typecode, count) in header['parts'].items():
+            size = array.array(typecode).itemsize
+            parts[name] = view[start:start + count * size].cast(typecode)
+
+        ret = cls(api, header['realm'], header['region'])
+        for name in cls._COLUMNS:
+            setattr(ret, name, parts[name])
+        ret.owners = _StringTable(parts['owner_starts'],
+                                  parts['owner_data'])
+        ret.time_left_names = header['time_left_names']
+        ret.dump_modified = header['dump_modified']
+        ret._owner_ids = None
+        ret._items = _SavedItemIndex(parts['index_items'],
+                                     parts['index_starts'],
+                                     parts['index_rows'],
+                                     parts['index_prices'])
+        ret._map = mapped
+        return ret
+
+    def __getstate__(self):
+        # Only the columns are sent to other processes. The API cannot be
+        # pickled, and the lookups and indexes are rebuilt when needed.
+        state = dict(self.__dict__)
+        state['_api'] = None
+        state['_owner_ids'] = None
+        state['_time_left_ids'] = None
+        state['_items'] = None
+        state['_item_totals'] = None
+        state['_owner_rows'] = None
+        state['_id_order'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._owner_ids = dict((n, i) for i, n in enumerate(self.owners))
+        self._time_left_ids = dict(
+            (n, i) for i, n in enumerate(self.time_left_names))
+
+    def __len__(self):
+        return len(self.auc)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('auction row out of range')
+        return Auction(self._api, self.row(i), self._realm, self._region)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+def _percentile(prices, counts, p, start=0, end=None):
+    """
+    Return the price of the item `p` percent of the way through those listed
+    in the auctions start to end, given their sorted `prices` and the
+    running total `counts` of their quantities.
+
+    """
+    if end is None:
+        end = len(prices)
+    before = counts[start - 1] if start else 0
+    target = before + (counts[end - 1] - before) * p / 100
+    i = bisect.bisect_left(counts, target, start, end)
+    return prices[min(i, end - 1)]
+
+class MarketStats:
+    """
+    A table of the market prices of items, as found by
+    `AuctionListings.market_stats`, with one row per item in order of item
+    id.
+
+    Each column is an array, so the table stays small for every item of a
+    realm. `MarketStats.get` looks up the row of an item:
+
+        stats = listings.market_stats()
+        stats.get(72092)['trimmed_median']
+
+    """
+    def __init__(self, percentiles):
+        """
+        Create an empty table with a column for each of `percentiles`.
+
+        """
+        #: The item ids
+        self.item = array.array('i')
+        #: The number of auctions with a buyout
+        self.auctions = array.array('i')
+        #: The quantity listed in those auctions
+        self.quantity = array.array('q')
+        #: The mean buyout per item, weighted by quantity
+        self.mean = array.array('d')
+        #: The median buyout per item once outliers are left out
+        self.trimmed_median = array.array('d')
+        #: The number of auctions left out as outliers
+        self.outliers = array.array('i')
+        #: percentile -> the buyout per item at that percentile
+        self.percentiles = dict((p, array.array('d')) for p in percentiles)
+
+    def row(self, i):
+        """Return row `i` of the table as a dictionary."""
+        ret = {
+            'item' : self.item[i],
+            'auctions' : self.auctions[i],
+            'quantity' : self.quantity[i],
+            'mean' : self.mean[i],
+            'trimmed_median' : self.trimmed_median[i],
+            'outliers' : self.outliers[i],
+        }
+        for p, column in self.percentiles.items():
+            ret['p' + str(p)] = column[i]
+        return ret
+
+    def get(self, item_id, default=None):
+        """
+        Return the row of the item `item_id` as a dictionary, or `default`
+        if it had no auctions with a buyout.
+
+        """
+        i = bisect.bisect_left(self.item, item_id)
+        if i < len(self.item) and self.item[i] == item_id:
+            return self.row(i)
+        return default
+
+    def __len__(self):
+        return len(self.item)
+
+class _StringTable:
+    """
+    A read only list of strings kept as UTF-8 in `data`, with string `i`
+    from byte `starts[i]` to `starts[i + 1]`. Strings are decoded as they
+    are looked up.
+
+    """
+    def __init__(self, starts, data):
+        self._starts = starts
+        self._data = data
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('string table index out of range')
+        return str(self._data[self._starts[i]:self._starts[i + 1]],
+                   'UTF-8')
+
+    def __len__(self):
+        return len(self._starts) - 1
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+class _SavedItemIndex:
+    """
+    The item index of a saved snapshot, looked up like the dictionary of
+    item id -> (rows, unit buyouts) built by `AuctionColumns`.
+
+    The rows and prices of item `items[i]` are those from `starts[i]` to
+    `starts[i + 1]`.
+
+    """
+    def __init__(self, items, starts, rows, prices):
+        self._item_ids = items
+        self._starts = starts
+        self._rows = rows
+        self._prices = prices
+
+    def get(self, item_id, default=None):
+        i = bisect.bisect_left(self._item_ids, item_id)
+        if i == len(self._item_ids) or self._item_ids[i] != item_id:
+            return default
+        start = self._starts[i]
+        end = self._starts[i + 1]
+        return self._rows[start:end], self._prices[start:end]
+
+    def __getitem__(self, item_id):
+        ret = self.get(item_id)
+        if ret is None:
+            raise KeyError(item_id)
+        return ret
+
+    def __contains__(self, item_id):
+        return self.get(item_id) is not None
+
+    def __iter__(self):
+        return iter(self._item_ids)
+
+    def __len__(self):
+        return len(self._item_ids)
+
+class AuctionDiff:
+    """
+    The changes between two snapshots of a realm's auction houses, as
+    found by `AuctionListings.diff`.
+
+    The changes are kept as arrays of row numbers into the two
+    `AuctionColumns` compared:
+
+    new -- rows of `current` whose auctions were not in `previous`
+    removed -- rows of `previous` whose auctions have gone, having sold or
+               expired
+    changed -- rows of `current` whose auctions have a different bid
+    changed_from -- the rows of `previous` for the same auctions as
+                    `changed`
+
+    Each array is in order of auction id.
+
+    """
+    def __init__(self, previous, current):
+        """
+        Compare the AuctionColumns `previous` and `current`.
+
+        The two are joined on auction id by merging their rows in id order,
+        in time linear in the number of rows once they are sorted. Apart
+        from the results, only the sorted row orders are held in memory.
+
+        """
+        #: The earlier snapshot
+        self.previous = previous
+        #: The later snapshot
+        self.current = current
+        self.new = array.array('i')
+        self.removed = array.array('i')
+        self.changed = array.array('i')
+        self.changed_from = array.array('i')
+
+        old_order = previous.id_order()
+        new_order = current.id_order()
+        old_auc = previous.auc
+        new_auc = current.auc
+        old_bid = previous.bid
+        new_bid = current.bid
+        i = 0
+        j = 0
+        while i < len(old_order) and j < len(new_order):
+            old = old_order[i]
+            new = new_order[j]
+            if old_auc[old] < new_auc[new]:
+                self.removed.append(old)
+                i += 1
+            elif old_auc[old] > new_auc[new]:
+                self.new.append(new)
+                j += 1
+            else:
+                if old_bid[old] != new_bid[new]:
+                    self.changed.append(new)
+                    self.changed_from.append(old)
+                i += 1
+                j += 1
+        self.removed.extend(old_order[i:])
+        self.new.extend(new_order[j:])
+
+    def new_auctions(self):
+        """Yield an Auction for each new auction."""
+        for i in self.new:
+            yield self.current[i]
+
+    def removed_auctions(self):
+        """
+        Yield an Auction, from the earlier snapshot, for each auction which
+        has gone.
+
+        """
+        for i in self.removed:
+            yield self.previous[i]
+
+    def changed_auctions(self):
+        """
+        Yield a tuple (before, after) of Auctions for each auction whose bid
+        has changed.
+
+        """
+        for old, new in zip(self.changed_from, self.changed):
+            yield self.previous[old], self.current[new]
+
+    @property
+    def counts(self):
+        """
+        Returns a dictionary of the number of new, removed and changed
+        auctions.
+
+        """
+        return {
+            'new' : len(self.new),
+            'removed' : len(self.removed),
+            'changed' : len(self.changed)
+        }
+
+def _parse_dump(chunks):
+    """
+    Parse an auction dump from `chunks`, an iterable of pieces of its UTF-8
+    encoded body, yielding tuples as each part is read.
+
+    Every auction in an auction house's list is yielded as a tuple
+    (auction house, auction dictionary). Any other member of the dump, such
+    as 'realm', is yielded as a tuple (name, value).
+
+    """
+    parser = _DumpParser(chunks)
+    parser.expect('{')
+    if parser.peek() == '}':
+        parser.end()
+        return
+    while True:
+        name = parser.value()
+        parser.expect(':')
+        if name in AuctionListings.AUCTION_HOUSES and parser.peek() == '{':
+            parser.expect('{')
+            while parser.peek() != '}':
+                member = parser.value()
+                parser.expect(':')
+                if member == 'auctions' and parser.peek() == '[':
+                    for auction in parser.array():
+                        yield name, auction
+                else:
+                    parser.value()
+                if parser.peek() == ',':
+                    parser.expect(',')
+            parser.expect('}')
+        else:
+            yield name, parser.value()
+        if parser.peek() == '}':
+            parser.end()
+            return
+        parser.expect(',')
+
+class _DumpParser:
+    """
+    Reads JSON values one at a time from an iterable of byte strings,
+    keeping only the unread part of the text in memory.
+
+    """
+    #: The number of characters read before the buffer is trimmed
+    TRIM = 65536
+
+    _WHITESPACE = re.compile(r'[ \t\r\n]*')
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._text = codecs.getincrementaldecoder('UTF-8')()
+        self._decoder = jsonlib.JSONDecoder()
+        self._buf = ''
+        self._pos = 0
+        self._done = False
+
+    def _fill(self):
+        """Read another piece, returning False at the end of the input."""
+        if self._done:
+            return False
+        try:
+            chunk = self._text.decode(next(self._chunks))
+        except StopIteration:
+            chunk = self._text.decode(b'', True)
+            self._done = True
+        if self._pos:
+            self._buf = self._buf[self._pos:]
+            self._pos = 0
+        self._buf += chunk
+        return True
+
+    def peek(self):
+        """Return the next character which is not whitespace."""
+        while True:
+            self._pos = self._WHITESPACE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                raise ValueError('Unexpected end of auction data')
+
+    def expect(self, char):
+        """Read the character `char`."""
+        found = self.peek()
+        if found != char:
+            raise ValueError('Expected "' + char + '" in auction data, '
+                             'found "' + found + '"')
+        self._pos += 1
+
+    def value(self):
+        """Read and return a complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                ret, end = self._decoder.raw_decode(self._buf, self._pos)
+            except ValueError:
+                ret = end = None
+            # A number at the end of the buffer may not be complete yet
+            if end is not None and (end < len(self._buf) or self._done):
+                break
+            if not self._fill():
+                if end is None:
+                    raise ValueError('Invalid auction data')
+                break
+        self._pos = end
+        if self._pos > self.TRIM:
+            self._buf = self._buf[self._pos:]
+            self._pos = 0
+        return ret
+
+    def end(self):
+        """
+        Read the closing brace of the dump and the rest of the input, which
+        must be whitespace.
+
+        The input is read to its end so that whatever is producing it, such
+        as a download being saved, also finishes.
+
+        """
+        self.expect('}')
+        while True:
+            self._pos = self._WHITESPACE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                raise ValueError('Unexpected data after the auction data')
+            if not self._fill():
+                return
+
+    def array(self):
+        """Read a JSON array, yielding each of its values in turn."""
+        self.expect('[')
+        if self.peek() == ']':
+            self._pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.peek() == ']':
+                self._pos += 1
+                return
+            self.expect(',')
+
 class Auction:
     """
     Encapsulates an individual auction.
@@ -147,7 +1217,7 @@ class Auction:
 
         """
         # TODO Use Item object instead
-        if not self_item:
+        if not self._item:
             self._item = self._api.get_item(self._json['item'])
         return self._item
 
@@ -0,0 +1,124 @@
+﻿import threading
+import time
+
+import wowthon
+
+class CircuitBreaker:
+    """
+    Stops requests being made to a region that keeps failing.
+
+    After `threshold` failures in a row the breaker opens, and requests
+    raise `wowthon.CircuitOpenError` straight away for `reset_timeout`
+    seconds. A single trial request is then let through: if it succeeds
+    the breaker closes again, otherwise it stays open for another
+    `reset_timeout` seconds.
+
+    """
+    #: The states a breaker may be in
+    STATES = [
+        'closed',
+        'open',
+        'half-open'
+    ]
+
+    def __init__(self, region, threshold=5, reset_timeout=30):
+        """
+        Create a new, closed circuit breaker for `region`.
+
+        Optional arguments:
+        threshold -- the number of failures in a row that open the breaker
+                     (default: 5)
+        reset_timeout -- the number of seconds the breaker stays open
+                         (default: 30)
+
+        """
+        self.region = region
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial = False
+        self._stats = {
+            'opened' : 0,
+            'rejected' : 0,
+        }
+
+    @property
+    def state(self):
+        """Return the current state, one of `CircuitBreaker.STATES`."""
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return 'open'
+            return 'half-open'
+
+    def allow(self):
+        """
+        Check that a request may be made.
+
+        Returns True if the request is the trial request of a half-open
+        breaker, which must then be resolved with `CircuitBreaker.success`,
+        `CircuitBreaker.failure` or `CircuitBreaker.release`.
+
+        Throws:
+        CircuitOpenError -- if the breaker is open
+
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            waited = time.monotonic() - self._opened_at
+            if waited >= self.reset_timeout and not self._trial:
+                # Let one request through to see if the region is back
+                self._trial = True
+                return True
+            self._stats['rejected'] += 1
+            retry_in = max(self.reset_timeout - waited, 0)
+        raise wowthon.CircuitOpenError(self.region, retry_in)
+
+    def success(self):
+        """Record a successful request, closing the breaker."""
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def release(self):
+        """
+        Give up the trial request without a result, for instance when it
+        was never sent, so that the next request is tried instead.
+
+        """
+        with self._lock:
+            self._trial = False
+
+    def failure(self):
+        """Record a failed request, opening the breaker if necessary."""
+        with self._lock:
+            self._failures += 1
+            if self._trial or (self._opened_at is None and
+                               self._failures >= self.threshold):
+                self._opened_at = time.monotonic()
+                self._stats['opened'] += 1
+            self._trial = False
+
+    @property
+    def stats(self):
+        """
+        Return a dictionary of statistics with the following fields:
+
+        state -- the current state of the breaker
+        failures -- the number of failures since the last success
+        opened -- the number of times the breaker has opened
+        rejected -- the number of requests refused while open
+
+        """
+        state = self.state
+        with self._lock:
+            ret = dict(self._stats)
+            ret['failures'] = self._failures
+        ret['state'] = state
+        return ret
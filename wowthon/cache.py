@@ -0,0 +1,408 @@
+﻿import collections
+import sys
+import threading
+import time
+import weakref
+
+class Cache:
+    """
+    A bounded cache of API objects, evicting the least recently used entry
+    once full and dropping entries older than the time to live of their
+    kind.
+
+    Keys are tuples whose first element is the kind of object, such as
+    'item' or 'char'. Every lookup, insertion and eviction takes constant
+    time.
+
+    With `weak` set, the cache is also an identity map: objects evicted to
+    make room are only referenced weakly, and are returned again for as long
+    as the application still holds them. A small `max_entries` then keeps
+    recently used objects alive, while memory use follows what is actually
+    in use.
+
+    """
+    #: The default number of seconds objects of each kind are kept for
+    TTLS = {
+        'item' : 7 * 24 * 3600,
+        'itemset' : 7 * 24 * 3600,
+        'quest' : 7 * 24 * 3600,
+        'ach' : 7 * 24 * 3600,
+        'item_class' : 24 * 3600,
+        'classes' : 24 * 3600,
+        'races' : 24 * 3600,
+        'battlegroups' : 24 * 3600,
+        'guild' : 15 * 60,
+        'char' : 15 * 60,
+    }
+
+    def __init__(self, max_entries=10000, max_bytes=None, ttl=3600,
+                 ttls=None, weak=False):
+        """
+        Create a new, empty cache.
+
+        Optional arguments:
+        max_entries -- the maximum number of objects kept (default: 10000,
+                       None for no limit)
+        max_bytes -- the approximate maximum amount of memory used by the
+                     data of the objects kept (default: None, no limit)
+        ttl -- the number of seconds objects of a kind not in `ttls` are
+               kept for (default: 3600, None for forever)
+        ttls -- a dictionary of the number of seconds objects of each kind
+                are kept for, updating `Cache.TTLS` (default: None)
+        weak -- keep weak references to evicted objects, so that they are
+                still returned while they are in use (default: False)
+
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.ttls = dict(self.TTLS)
+        if ttls: self.ttls.update(ttls)
+        self.weak = weak
+
+        self._lock = threading.Lock()
+        # key -> _Entry, least recently used first
+        self._entries = collections.OrderedDict()
+        self._bytes = 0
+        # key -> (weak reference, expiry time) for evicted objects
+        self._weak = {}
+        # (key, weak reference) of evicted objects since freed
+        self._dead = []
+        self._stats = {
+            'hits' : 0,
+            'weak_hits' : 0,
+            'misses' : 0,
+            'evictions' : 0,
+            'expired' : 0,
+        }
+
+    def get(self, key, default=None):
+        """
+        Return the object cached at `key`, or `default` if there is none.
+
+        """
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is None:
+                return default
+            return entry.value
+
+    def set(self, key, value):
+        """
+        Cache `value` at `key`, evicting old entries if the cache is full.
+
+        """
+        with self._lock:
+            self._insert(key, value)
+
+    def setdefault(self, key, value):
+        """
+        Return the object cached at `key`. If there is none, `value` is
+        cached and returned instead.
+
+        Several threads creating an object for the same key at once all get
+        the same one back.
+
+        """
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is not None:
+                return entry.value
+            self._insert(key, value)
+            return value
+
+    def _lookup(self, key):
+        """
+        Return the entry for `key` and mark it as recently used, or return
+        None if there is none.
+
+        """
+        entry = self._entries.get(key)
+        if entry is None and self.weak:
+            entry = self._revive(key)
+        if entry is None:
+            self._stats['misses'] += 1
+            return None
+        if entry.expires is not None and entry.expires <= time.time():
+            self._remove(key)
+            self._stats['expired'] += 1
+            self._stats['misses'] += 1
+            return None
+        self._entries.move_to_end(key)
+        self._stats['hits'] += 1
+        # A revived object may need room made for it
+        self._evict(keep=key)
+        return entry
+
+    def _insert(self, key, value):
+        ttl = self.ttls.get(key[0], self.ttl)
+        expires = None
+        if ttl is not None:
+            expires = time.time() + ttl
+        entry = _Entry(value, expires)
+        if key in self._entries:
+            self._remove(key)
+        self._weak.pop(key, None)
+        self._entries[key] = entry
+        if self.max_bytes is not None:
+            self._bytes += entry.measure()
+        self._evict(keep=key)
+
+    def resize(self, key, value):
+        """
+        Measure `value` again after its data has changed, if it is the
+        object cached at `key`, evicting old entries if the cache is now
+        full.
+
+        Objects fetch their data after they are cached, so the API calls
+        this whenever an object stores newly downloaded data.
+
+        """
+        if self.max_bytes is None:
+            return
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.value is not value:
+                return
+            self._bytes += entry.measure()
+            self._evict(keep=key)
+
+    def delete(self, key):
+        """Remove the object cached at `key`, if there is one."""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._weak.pop(key, None)
+
+    def clear(self):
+        """Remove every object from the cache."""
+        with self._lock:
+            self._entries.clear()
+            self._weak.clear()
+            self._bytes = 0
+
+    def items(self):
+        """
+        Return a list of (key, object) tuples for every object in the cache,
+        including evicted objects which are still in use.
+
+        """
+        with self._lock:
+            ret = [(k, e.value) for k, e in self._entries.items()]
+            self._purge()
+            for key, (ref, expires) in self._weak.items():
+                value = ref()
+                if value is not None:
+                    ret.append((key, value))
+        return ret
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def _full(self):
+        if self.max_entries is not None and \
+           len(self._entries) > self.max_entries:
+            return True
+        return self.max_bytes is not None and self._bytes > self.max_bytes
+
+    def _evict(self, keep):
+        """
+        Remove the least recently used entries, other than `keep`, until the
+        cache is within its limits.
+
+        """
+        while self._full():
+            key = next(iter(self._entries))
+            if key == keep and not self.weak:
+                break
+            entry = self._entries[key]
+            self._remove(key)
+            self._stats['evictions'] += 1
+            if self.weak:
+                self._keep_weak(key, entry)
+
+    def _keep_weak(self, key, entry):
+        """
+        Keep a weak reference to the object of an evicted entry.
+
+        """
+        def freed(ref, key=key, dead=self._dead):
+            # Called during garbage collection, so the lock may be held
+            dead.append((key, ref))
+        try:
+            ref = weakref.ref(entry.value, freed)
+        except TypeError:
+            # Lists and dictionaries cannot be weakly referenced
+            return
+        self._purge()
+        self._weak[key] = (ref, entry.expires)
+
+    def _purge(self):
+        """Forget the weak references to objects that have been freed."""
+        while self._dead:
+            key, ref = self._dead.pop()
+            if self._weak.get(key, (None,))[0] is ref:
+                del self._weak[key]
+
+    def _revive(self, key):
+        """
+        Move the object weakly referenced at `key`, if it is still alive,
+        back into the cache and return its entry. The caller makes room for
+        it.
+
+        """
+        self._purge()
+        ref, expires = self._weak.pop(key, (None, None))
+        value = ref() if ref is not None else None
+        if value is None:
+            return None
+        entry = _Entry(value, expires)
+        self._entries[key] = entry
+        if self.max_bytes is not None:
+            self._bytes += entry.measure()
+        self._stats['weak_hits'] += 1
+        return entry
+
+    @property
+    def stats(self):
+        """
+        Return a dictionary of cache statistics with the following fields:
+
+        hits -- the number of lookups that found an object
+        weak_hits -- the number of those which found an object that had been
+                     evicted but was still in use
+        misses -- the number of lookups that did not
+        evictions -- the number of objects removed to make room
+        expired -- the number of objects removed for being too old
+        entries -- the number of objects cached
+        bytes -- the approximate size of the cached data, if `max_bytes` is
+                 set, otherwise 0
+        weak -- the number of evicted objects still in use
+
+        """
+        with self._lock:
+            ret = dict(self._stats)
+            ret['entries'] = len(self._entries)
+            ret['bytes'] = self._bytes
+            self._purge()
+            ret['weak'] = len(self._weak)
+        return ret
+
+class ShardedCache:
+    """
+    A cache split into several `Cache` shards, each with its own lock, so
+    that threads looking up different keys rarely wait for each other.
+
+    Keys are spread over the shards by their hash. Limits are divided evenly
+    between the shards, so the least recently used object of a shard is
+    evicted rather than that of the whole cache.
+
+    """
+    def __init__(self, shards=16, max_entries=10000, max_bytes=None,
+                 ttl=3600, ttls=None, weak=False):
+        """
+        Create a new, empty cache.
+
+        Optional arguments:
+        shards -- the number of shards (default: 16)
+
+        The other arguments are as for `Cache`.
+
+        """
+        def share(limit):
+            if limit is None:
+                return None
+            # Rounded up
+            return -(-limit // shards)
+        self.shards = [Cache(share(max_entries), share(max_bytes), ttl, ttls,
+                             weak) for i in range(shards)]
+
+    def _shard(self, key):
+        return self.shards[hash(key) % len(self.shards)]
+
+    def get(self, key, default=None):
+        """See `Cache.get`."""
+        return self._shard(key).get(key, default)
+
+    def set(self, key, value):
+        """See `Cache.set`."""
+        self._shard(key).set(key, value)
+
+    def setdefault(self, key, value):
+        """See `Cache.setdefault`."""
+        return self._shard(key).setdefault(key, value)
+
+    def resize(self, key, value):
+        """See `Cache.resize`."""
+        self._shard(key).resize(key, value)
+
+    def delete(self, key):
+        """See `Cache.delete`."""
+        self._shard(key).delete(key)
+
+    def clear(self):
+        """Remove every object from the cache."""
+        for shard in self.shards:
+            shard.clear()
+
+    def items(self):
+        """See `Cache.items`."""
+        ret = []
+        for shard in self.shards:
+            ret.extend(shard.items())
+        return ret
+
+    def __len__(self):
+        return sum(len(shard) for shard in self.shards)
+
+    @property
+    def stats(self):
+        """
+        Return a dictionary of statistics for the whole cache, with the
+        fields described in `Cache.stats`.
+
+        """
+        ret = {}
+        for shard in self.shards:
+            for stat, value in shard.stats.items():
+                ret[stat] = ret.get(stat, 0) + value
+        return ret
+
+class _Entry:
+    __slots__ = ['value', 'expires', 'size']
+
+    def __init__(self, value, expires):
+        self.value = value
+        self.expires = expires
+        self.size = 0
+
+    def measure(self):
+        """
+        Measure the entry again, returning the change in its size.
+
+        """
+        old = self.size
+        self.size = _sizeof(getattr(self.value, '_json', self.value))
+        return self.size - old
+
+def _sizeof(obj):
+    """
+    Estimate the memory used by `obj` and the containers and strings it
+    holds, as decoded from JSON.
+
+    """
+    ret = 0
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        ret += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple)):
+            stack.extend(obj)
+    return ret
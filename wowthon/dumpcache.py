@@ -0,0 +1,134 @@
+﻿import os
+import threading
+
+class DumpCache:
+    """
+    A directory of downloaded auction dumps, so that a dump is only
+    downloaded once however many times, or by however many processes, it is
+    read.
+
+    Dumps are kept as they were sent, keyed by region, realm and the
+    lastModified time given for them by the auction data index. A dump is
+    written to a temporary file as it downloads and only takes its place
+    once complete, so a failed download is never read back.
+
+    """
+    # Files are read back in pieces of this many bytes
+    _CHUNK_SIZE = 65536
+
+    def __init__(self, path, keep=2):
+        """
+        Use the directory at `path`, creating it if it does not exist.
+
+        Arguments:
+        path -- the directory to keep dumps in
+
+        Optional arguments:
+        keep -- the number of dumps kept for each realm. Older ones are
+                deleted as newer ones are saved. (default: 2)
+
+        """
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits' : 0,
+            'misses' : 0,
+            'writes' : 0,
+        }
+
+    def _count(self, stat):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def _prefix(self, region, realm):
+        return region + '-' + realm + '-'
+
+    def _file_name(self, region, realm, last_modified):
+        return os.path.join(self.path, self._prefix(region, realm) +
+                            str(last_modified) + '.json')
+
+    def get(self, region, realm, last_modified):
+        """
+        Return an iterator over the pieces of the dump saved for `realm`
+        with the time `last_modified`, or None if there is no such dump.
+
+        """
+        try:
+            f = open(self._file_name(region, realm, last_modified), 'rb')
+        except FileNotFoundError:
+            self._count('misses')
+            return None
+        self._count('hits')
+        return self._read(f)
+
+    def _read(self, f):
+        with f:
+            for chunk in iter(lambda: f.read(self._CHUNK_SIZE), b''):
+                yield chunk
+
+    def put(self, region, realm, last_modified, chunks):
+        """
+        Save the dump downloading as `chunks`, an iterator over its pieces,
+        for `realm` with the time `last_modified`.
+
+        Returns an iterator passing the pieces on as they are saved. The
+        dump is only kept if the iterator is read to its end.
+
+        """
+        name = self._file_name(region, realm, last_modified)
+        temp = name + '.' + str(os.getpid()) + '.' + \
+               str(threading.get_ident()) + '.tmp'
+        done = False
+        try:
+            with open(temp, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    yield chunk
+            os.replace(temp, name)
+            done = True
+        finally:
+            if not done:
+                os.remove(temp)
+        self._count('writes')
+        self._prune(region, realm)
+
+    def _prune(self, region, realm):
+        """Delete all but the newest `keep` dumps of a realm."""
+        prefix = self._prefix(region, realm)
+        dumps = []
+        for name in os.listdir(self.path):
+            time = name[len(prefix):-len('.json')]
+            if name.startswith(prefix) and name.endswith('.json') and \
+               time.isdigit():
+                dumps.append((int(time), name))
+        dumps.sort()
+        for time, name in dumps[:len(dumps) - self.keep]:
+            try:
+                os.remove(os.path.join(self.path, name))
+            except FileNotFoundError:
+                # Removed by another process
+                pass
+
+    def clear(self):
+        """Delete every saved dump."""
+        for name in os.listdir(self.path):
+            if name.endswith('.json'):
+                os.remove(os.path.join(self.path, name))
+
+    def __len__(self):
+        return len([n for n in os.listdir(self.path) if n.endswith('.json')])
+
+    @property
+    def stats(self):
+        """
+        Return a dictionary of cache statistics with the following fields:
+
+        hits -- the number of dumps read from the cache
+        misses -- the number of dumps not found
+        writes -- the number of dumps saved
+
+        """
+        with self._lock:
+            return dict(self._stats)
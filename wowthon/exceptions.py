@@ -13,3 +13,34 @@ class APIError(Exception):
 
     def __repr__(self):
         return 'APIError <' + str(self) + '>'
+
+class QuotaExceededError(Exception):
+    """
+    Raised when a request would exceed an API key's daily request quota.
+
+    """
+    def __init__(self, quota):
+        self.quota = quota
+
+    def __str__(self):
+        return 'daily quota of ' + str(self.quota) + ' requests used up'
+
+    def __repr__(self):
+        return 'QuotaExceededError <' + str(self) + '>'
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of making a request to a region that has recently been
+    failing, until it has had time to recover.
+
+    """
+    def __init__(self, region, retry_in):
+        self.region = region
+        self.retry_in = retry_in
+
+    def __str__(self):
+        return 'region "' + self.region + '" is failing, retry in ' + \
+               str(round(self.retry_in, 1)) + 's'
+
+    def __repr__(self):
+        return 'CircuitOpenError <' + str(self) + '>'
@@ -0,0 +1,845 @@
+﻿import http.server
+import threading
+import json as jsonlib
+import random
+import time
+import email.utils
+import gzip
+import urllib.parse
+import zlib
+
+import wowthon
+
+# Building blocks for generated names
+_SYLLABLES = [
+    'ka', 'dor', 'el', 'an', 'thar', 'ri', 'mo', 'vel', 'zul', 'ash',
+    'gor', 'li', 'nae', 'bush', 'dra', 'en', 'fel', 'ith', 'mar', 'os'
+]
+_ADJECTIVES = [
+    'Savage', 'Frozen', 'Ancient', 'Gleaming', 'Shadowed', 'Runed',
+    'Blessed', 'Vicious', 'Tarnished', 'Elementium', 'Embersilk', 'Heavy'
+]
+_NOUNS = [
+    'Shortsword', 'Bracers', 'Cloak', 'Signet', 'Greathelm', 'Leggings',
+    'Potion', 'Flask', 'Ore', 'Cloth', 'Leather', 'Gem'
+]
+_REALMS = {
+    'eu' : ['Draenor', 'Silvermoon', 'Twisting Nether', 'Ravencrest',
+            'Argent Dawn', 'Aggra (Português)'],
+    'us' : ['Illidan', 'Stormrage', 'Area 52', 'Tichondrius', 'Azjol-Nerub'],
+    'kr' : ['Azshara', 'Hyjal'],
+    'tw' : ['Shadowmoon', 'Whisperwind'],
+    'cn' : ['Ashenvale', 'Darnassus']
+}
+_BATTLEGROUPS = ['Cyclone', 'Rampage', 'Reckoning', 'Vindication',
+                 'Bloodlust', 'Misery']
+_TITLES = ['Private %s', '%s the Explorer', 'Starcaller %s',
+           '%s the Kingslayer', '%s, Destroyer\'s End', 'Loremaster %s']
+
+#: The lastModified time (in milliseconds) of all generated data
+BASE_LAST_MODIFIED = 1337000000000
+
+def _rng(*key):
+    """
+    Return a random number generator seeded from `key`, so the same data is
+    generated for the same entity every time.
+
+    """
+    seed = zlib.crc32(bytes(repr(key), 'UTF-8'))
+    return random.Random(seed)
+
+def _name(rng, syllables=2):
+    name = ''.join(rng.choice(_SYLLABLES) for i in range(syllables))
+    return name.title()
+
+class FakeBattleNet:
+    """
+    A local stand-in for the Battle.net community platform API.
+
+    Serves generated, but realistically shaped, JSON for every endpoint used
+    by wowthon from a `http.server` on the local machine. The same names and
+    ids always produce the same data. Characters under level 10 return 404,
+    as they do on Battle.net.
+
+    Use `FakeBattleNet.transport` to send an API's requests to the server:
+
+        with wowthon.FakeBattleNet(latency=0.05) as server:
+            api = wowthon.WoWAPI('Draenor', 'eu',
+                                 transport=server.transport())
+            api.get_guild('Delphae').members
+
+    """
+    def __init__(self, latency=0, error_rate=0, error_codes=None, seed=0,
+                 guild_size=50, auctions=1000, compress=True,
+                 host='127.0.0.1', port=0):
+        """
+        Create a new fake server. It is not started until `start` is called.
+
+        Optional arguments:
+        latency -- the number of seconds to wait before every response
+                   (default: 0)
+        error_rate -- the fraction of requests answered with an error
+                      instead (default: 0)
+        error_codes -- a list of the HTTP status codes injected errors are
+                       chosen from (default: [503])
+        seed -- changes all generated data (default: 0)
+        guild_size -- the number of members in every guild (default: 50)
+        auctions -- the number of auctions in each auction house
+                    (default: 1000)
+        compress -- whether to gzip responses when asked to (default: True)
+        host -- the address to listen on (default: '127.0.0.1')
+        port -- the port to listen on (default: 0, any free port)
+
+        """
+        if error_codes is None: error_codes = [503]
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_codes = error_codes
+        self.seed = seed
+        self.guild_size = guild_size
+        self.auctions = auctions
+        self.compress = compress
+        self._bind = (host, port)
+        self._server = None
+        self._thread = None
+
+        self._lock = threading.Lock()
+        self._errors = random.Random(seed)
+        # realm slug -> auction snapshot number
+        self._generations = {}
+        # (realm slug, snapshot number) -> encoded dump
+        self._dumps = {}
+        self.stats = {
+            'requests' : 0,
+            'errors' : 0,
+            'not_found' : 0,
+            'not_modified' : 0,
+            'bytes_sent' : 0,
+        }
+
+    #
+    # Server control
+    #
+
+    def start(self):
+        """Start serving requests on a background thread."""
+        self._server = http.server.ThreadingHTTPServer(self._bind, _Handler)
+        self._server.daemon_threads = True
+        self._server.fake = self
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        args=(0.05,))
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the server."""
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @property
+    def address(self):
+        """Return the 'host:port' the server is listening on."""
+        host, port = self._server.server_address[:2]
+        return host + ':' + str(port)
+
+    def transport(self, transport=None, **kwargs):
+        """
+        Return a transport which sends every request to this server.
+
+        Optional arguments:
+        transport -- the transport to send the requests with (default: a new
+                     `wowthon.ConnectionPool` made with `kwargs`)
+
+        """
+        if transport is None:
+            transport = wowthon.ConnectionPool(**kwargs)
+        return FakeTransport(self.address, transport)
+
+    def next_snapshot(self, realm):
+        """
+        Move the auction houses of the realm with the slug `realm` on to a
+        new snapshot, as happens on Battle.net about once an hour. Some
+        auctions are sold or expire, some are bid on and new ones appear.
+
+        """
+        with self._lock:
+            self._generations[realm] = self._generations.get(realm, 0) + 1
+
+    #
+    # Request handling
+    #
+
+    def _route(self, region, path, query):
+        """
+        Return a tuple (status, JSON document) for a request to `path`.
+
+        """
+        parts = [urllib.parse.unquote(p) for p in path.split('/') if p]
+        fields = []
+        if query.get('fields'):
+            fields = query['fields'][0].split(',')
+        locale = query.get('locale', [''])[0]
+
+        if parts[:1] == ['auction-data']:
+            return 200, self._auction_dump(region, parts[1])
+        if parts[:2] != ['api', 'wow'] or len(parts) < 3:
+            return 404, None
+        parts = parts[2:]
+        kind = parts[0]
+
+        if parts == ['realm', 'status']:
+            realms = None
+            if query.get('realms'):
+                realms = query['realms'][0].split(',')
+            return 200, self.realm_status(region, realms)
+        elif kind == 'character' and len(parts) == 3:
+            return self.character(region, parts[1], parts[2], fields)
+        elif kind == 'guild' and len(parts) == 3:
+            return 200, self.guild(region, parts[1], parts[2], fields)
+        elif kind == 'item' and len(parts) == 3 and parts[1] == 'set':
+            return 200, self.item_set(int(parts[2]))
+        elif kind == 'item' and len(parts) == 2:
+            return 200, self.item(int(parts[1]))
+        elif kind == 'quest' and len(parts) == 2:
+            return 200, self.quest(int(parts[1]))
+        elif kind == 'achievement' and len(parts) == 2:
+            return 200, self.achievement(int(parts[1]))
+        elif kind == 'arena' and len(parts) == 4:
+            return 200, self.arena_team(region, parts[1], parts[2],
+                                        parts[3])
+        elif kind == 'auction' and len(parts) == 3 and parts[1] == 'data':
+            return 200, self.auction_index(region, parts[2])
+        elif parts == ['data', 'battlegroups']:
+            return 200, {'battlegroups' : [
+                {'name' : b, 'slug' : b.lower()} for b in _BATTLEGROUPS]}
+        elif parts == ['data', 'character', 'classes']:
+            return 200, {'classes' : [
+                {'id' : id, 'mask' : 1 << (id - 1), 'name' : name.title(),
+                 'powerType' : 'rage' if id == 1 else 'mana'}
+                for id, name in sorted(wowthon.CLASSES.items())]}
+        elif parts == ['data', 'character', 'races']:
+            return 200, {'races' : [
+                {'id' : id, 'mask' : 1 << (id - 1), 'name' : name.title(),
+                 'side' : 'alliance' if wowthon.WoWAPI.side_for_race(id) == 0
+                          else 'horde'}
+                for id, name in sorted(wowthon.RACES.items())]}
+        elif parts == ['data', 'item', 'classes']:
+            return 200, {'classes' : [
+                {'class' : i, 'name' : n} for i, n in enumerate(
+                    ['Consumable', 'Container', 'Weapon', 'Gem', 'Armor',
+                     'Reagent', 'Projectile', 'Trade Goods'])]}
+        return 404, None
+
+    def _respond(self, handler):
+        with self._lock:
+            self.stats['requests'] += 1
+            inject = self._errors.random() < self.error_rate
+            code = self._errors.choice(self.error_codes)
+        if self.latency:
+            time.sleep(self.latency)
+
+        if inject:
+            with self._lock:
+                self.stats['errors'] += 1
+            body = {'status' : 'nok', 'reason' : 'Internal server error.'}
+            return handler.send_json(code, body)
+
+        url = urllib.parse.urlsplit(handler.path)
+        # Paths are /<original host>/<original path>
+        host, _, path = url.path[1:].partition('/')
+        region = None
+        for r, info in wowthon.REGION.items():
+            if urllib.parse.urlsplit(info['prefix']).netloc == host:
+                region = r
+        query = urllib.parse.parse_qs(url.query)
+
+        try:
+            code, body = self._route(region, path, query)
+        except ValueError:
+            code, body = 404, None
+        if code == 404:
+            with self._lock:
+                self.stats['not_found'] += 1
+            if body is None:
+                body = {'status' : 'nok', 'reason' : 'Not found.'}
+            return handler.send_json(code, body)
+
+        since = handler.headers.get('If-Modified-Since')
+        if since and isinstance(body, dict) and 'lastModified' in body:
+            since = email.utils.parsedate_to_datetime(since).timestamp()
+            if body['lastModified'] <= since * 1000:
+                with self._lock:
+                    self.stats['not_modified'] += 1
+                return handler.send_json(304, None)
+        return handler.send_json(code, body)
+
+    #
+    # Generated data
+    #
+
+    def realm_status(self, region, realms=None):
+        """Return the realm/status document for `realms` in `region`."""
+        if realms is None:
+            realms = [wowthon.WoWAPI.realm_name_to_slug(r)
+                      for r in _REALMS.get(region, [])]
+        ret = []
+        for slug in realms:
+            rng = _rng(self.seed, region, slug)
+            name = slug.replace('-', ' ').title()
+            for known in _REALMS.get(region, []):
+                if wowthon.WoWAPI.realm_name_to_slug(known) == slug:
+                    name = known
+            ret.append({
+                'type' : rng.choice(wowthon.REALM_TYPES),
+                'queue' : rng.random() < 0.1,
+                'wintergrasp' : {
+                    'area' : 1, 'controlling-faction' : rng.randint(0, 1),
+                    'status' : rng.randint(0, 3), 'next' : 1337001000000
+                },
+                'tol-barad' : {
+                    'area' : 21, 'controlling-faction' : rng.randint(0, 1),
+                    'status' : rng.randint(0, 3), 'next' : 1337002000000
+                },
+                'status' : True,
+                'population' : rng.choice(wowthon.POPULATION_LEVELS),
+                'name' : name,
+                'battlegroup' : rng.choice(_BATTLEGROUPS),
+                'slug' : slug
+            })
+        return {'realms' : ret}
+
+    def _realm_name(self, region, realm):
+        return self.realm_status(region, [realm])['realms'][0]['name']
+
+    def _char_summary(self, region, realm, name):
+        """Return the basic information shown for a character."""
+        rng = _rng(self.seed, region, realm, name.lower())
+        race = rng.choice(sorted(wowthon.RACES))
+        level = 85 if rng.random() < 0.6 else rng.randint(1, 84)
+        return {
+            'lastModified' : BASE_LAST_MODIFIED - rng.randint(0, 10**9),
+            'name' : name,
+            'realm' : self._realm_name(region, realm),
+            'battlegroup' : rng.choice(_BATTLEGROUPS),
+            'class' : rng.choice(sorted(wowthon.CLASSES)),
+            'race' : race,
+            'gender' : rng.randint(0, 1),
+            'level' : level,
+            'achievementPoints' : rng.randint(0, 200) * 10 * level // 85,
+            'thumbnail' : realm + '/' + str(rng.randint(1, 255)) + '/' + \
+                          str(rng.randint(10**7, 10**8)) + '-avatar.jpg'
+        }
+
+    def character(self, region, realm, name, fields=None):
+        """
+        Return a tuple (status, document) for a character, with `fields`.
+
+        """
+        if not fields: fields = []
+        ret = self._char_summary(region, realm, name)
+        if ret['level'] < 10:
+            return 404, {'status' : 'nok',
+                         'reason' : 'Character not found.'}
+        rng = _rng(self.seed, region, realm, name.lower(), 'fields')
+
+        if 'guild' in fields:
+            gname = _name(rng, 3)
+            guild = self.guild(region, realm, gname)
+            guild['members'] = self.guild_size
+            del guild['lastModified']
+            ret['guild'] = guild
+        if 'titles' in fields:
+            titles = [{'id' : 100 + i, 'name' : t}
+                      for i, t in enumerate(_TITLES) if rng.random() < 0.5]
+            if titles:
+                titles[rng.randrange(len(titles))]['selected'] = True
+            ret['titles'] = titles
+        if 'stats' in fields:
+            ret['stats'] = {
+                'health' : rng.randint(100000, 160000),
+                'powerType' : 'mana',
+                'power' : rng.randint(20000, 120000),
+                'str' : rng.randint(100, 4000),
+                'agi' : rng.randint(100, 4000),
+                'sta' : rng.randint(3000, 8000),
+                'int' : rng.randint(100, 4000),
+                'spr' : rng.randint(100, 2000),
+                'mastery' : round(rng.uniform(8, 20), 2),
+                'crit' : round(rng.uniform(5, 30), 2),
+                'haste' : round(rng.uniform(0, 20), 2),
+                'armor' : rng.randint(8000, 40000)
+            }
+        if 'talents' in fields:
+            ret['talents'] = []
+            for i in range(2):
+                spec = {
+                    'name' : rng.choice(['Balance', 'Feral Combat',
+                                         'Restoration']),
+                    'icon' : 'spell_nature_starfall',
+                    'build' : ''.join(str(rng.randint(0, 3))
+                                      for j in range(60)),
+                    'trees' : [{'total' : rng.randint(0, 41),
+                                'points' : '0' * 20} for j in range(3)],
+                    'glyphs' : {}
+                }
+                for kind in ['prime', 'major', 'minor']:
+                    spec['glyphs'][kind] = [{
+                        'glyph' : rng.randint(100, 1000),
+                        'item' : rng.randint(40000, 45000),
+                        'name' : 'Glyph of ' + _name(rng),
+                        'icon' : 'inv_glyph_' + kind + 'druid'
+                    } for j in range(3)]
+                if i == 0:
+                    spec['selected'] = True
+                ret['talents'].append(spec)
+        if 'pvp' in fields:
+            ret['pvp'] = {
+                'ratedBattlegrounds' : {
+                    'personalRating' : rng.randint(0, 2400),
+                    'battlegrounds' : [{
+                        'name' : bg,
+                        'played' : rng.randint(0, 100),
+                        'won' : rng.randint(0, 50)
+                    } for bg in ['Arathi Basin', 'Warsong Gulch',
+                                 'Twin Peaks', 'Battle for Gilneas']]
+                },
+                'arenaTeams' : [{
+                    'name' : _name(rng, 3),
+                    'personalRating' : rng.randint(0, 2400),
+                    'teamRating' : rng.randint(0, 2400),
+                    'size' : rng.choice(list(wowthon.TEAM_SIZES.values()))
+                } for i in range(rng.randint(0, 3))],
+                'totalHonorableKills' : rng.randint(0, 100000)
+            }
+        if 'professions' in fields:
+            def profession(pname):
+                return {'id' : rng.randint(100, 800), 'name' : pname,
+                        'icon' : 'trade_' + pname.lower(),
+                        'rank' : rng.randint(1, 525), 'max' : 525,
+                        'recipes' : [rng.randint(2000, 90000)
+                                     for i in range(rng.randint(0, 20))]}
+            ret['professions'] = {
+                'primary' : [profession(p) for p in
+                             rng.sample(['Alchemy', 'Herbalism', 'Mining',
+                                         'Tailoring', 'Enchanting'], 2)],
+                'secondary' : [profession(p) for p in
+                               ['Cooking', 'First Aid', 'Fishing',
+                                'Archaeology']]
+            }
+        if 'appearance' in fields:
+            ret['appearance'] = {
+                'faceVariation' : rng.randint(0, 10),
+                'skinColor' : rng.randint(0, 10),
+                'hairVariation' : rng.randint(0, 10),
+                'hairColor' : rng.randint(0, 10),
+                'featureVariation' : rng.randint(0, 10),
+                'showHelm' : rng.random() < 0.5,
+                'showCloak' : rng.random() < 0.5
+            }
+        if 'mounts' in fields:
+            ret['mounts'] = sorted(rng.sample(range(400, 110000), 30))
+        if 'companions' in fields:
+            ret['companions'] = sorted(rng.sample(range(4000, 100000), 20))
+        if 'pets' in fields and ret['class'] == 3:
+            ret['pets'] = [{'name' : _name(rng), 'creature' :
+                            rng.randint(1000, 50000), 'slot' : i}
+                           for i in range(rng.randint(1, 5))]
+        if 'quests' in fields:
+            ret['quests'] = sorted(rng.sample(range(1, 30000), 200))
+        if 'achievements' in fields:
+            completed = sorted(rng.sample(range(6, 6000), 300))
+            ret['achievements'] = {
+                'achievementsCompleted' : completed,
+                'achievementsCompletedTimestamp' : [
+                    BASE_LAST_MODIFIED - rng.randint(0, 10**11)
+                    for a in completed],
+                'criteria' : [], 'criteriaQuantity' : [],
+                'criteriaTimestamp' : [], 'criteriaCreated' : []
+            }
+        if 'progression' in fields:
+            ret['progression'] = {'raids' : [{
+                'name' : raid, 'normal' : rng.randint(0, 2),
+                'heroic' : rng.randint(0, 2), 'id' : 5000 + i,
+                'bosses' : []
+            } for i, raid in enumerate(['Firelands', 'Dragon Soul'])]}
+        if 'reputation' in fields:
+            ret['reputation'] = [{
+                'id' : 1000 + i, 'name' : _name(rng, 3),
+                'standing' : rng.randint(0, 7),
+                'value' : rng.randint(0, 21000), 'max' : 21000
+            } for i in range(20)]
+        if 'feed' in fields:
+            ret['feed'] = [{
+                'type' : 'LOOT', 'timestamp' : BASE_LAST_MODIFIED - i,
+                'itemId' : rng.randint(2000, 80000)
+            } for i in range(10)]
+        if 'items' in fields:
+            ret['items'] = {
+                'averageItemLevel' : rng.randint(333, 397),
+                'averageItemLevelEquipped' : rng.randint(333, 397),
+            }
+            for slot in ['head', 'neck', 'shoulder', 'back', 'chest',
+                         'wrist', 'hands', 'waist', 'legs', 'feet',
+                         'finger1', 'finger2', 'trinket1', 'trinket2',
+                         'mainHand']:
+                id = rng.randint(50000, 80000)
+                ret['items'][slot] = {
+                    'id' : id, 'name' : self.item(id)['name'],
+                    'icon' : 'inv_misc_questionmark',
+                    'quality' : 4, 'tooltipParams' : {}
+                }
+        return 200, ret
+
+    def guild(self, region, realm, name, fields=None):
+        """Return the document for a guild, with `fields`."""
+        if not fields: fields = []
+        rng = _rng(self.seed, region, realm, name.lower())
+        ret = {
+            'lastModified' : BASE_LAST_MODIFIED - rng.randint(0, 10**9),
+            'name' : name,
+            'realm' : self._realm_name(region, realm),
+            'battlegroup' : rng.choice(_BATTLEGROUPS),
+            'level' : rng.randint(1, 25),
+            'side' : rng.randint(0, 1),
+            'achievementPoints' : rng.randint(0, 1500) * 5,
+            'emblem' : {
+                'icon' : rng.randint(0, 150),
+                'iconColor' : 'ff{:06x}'.format(rng.randint(0, 0xffffff)),
+                'border' : rng.randint(0, 5),
+                'borderColor' : 'ff{:06x}'.format(rng.randint(0, 0xffffff)),
+                'backgroundColor' : 'ff{:06x}'.format(rng.randint(0, 0xffffff))
+            }
+        }
+        if 'members' in fields:
+            ret['members'] = []
+            for i in range(self.guild_size):
+                cname = _name(rng, rng.randint(2, 3))
+                char = self._char_summary(region, realm, cname)
+                del char['lastModified']
+                char['guild'] = name
+                ret['members'].append({
+                    'character' : char,
+                    'rank' : min(i, rng.randint(1, 9))
+                })
+        if 'achievements' in fields:
+            ret['achievements'] = {
+                'achievementsCompleted' : sorted(
+                    rng.sample(range(4900, 5500), 50)),
+                'achievementsCompletedTimestamp' : [],
+                'criteria' : [], 'criteriaQuantity' : [],
+                'criteriaTimestamp' : [], 'criteriaCreated' : []
+            }
+        if 'news' in fields:
+            ret['news'] = [{
+                'type' : 'itemLoot',
+                'character' : _name(rng),
+                'timestamp' : BASE_LAST_MODIFIED - i * 3600000,
+                'itemId' : rng.randint(50000, 80000)
+            } for i in range(20)]
+        return ret
+
+    def item(self, id):
+        """Return the document for the item `id`."""
+        rng = _rng(self.seed, 'item', id)
+        quality = rng.choice([0, 1, 1, 1, 2, 2, 3, 4])
+        level = rng.randint(1, 397)
+        base_armor = rng.choice([0, 0, rng.randint(50, 3000)])
+        ret = {
+            'id' : id,
+            'description' : rng.choice(['', '', 'Pretty shiny.']),
+            'name' : rng.choice(_ADJECTIVES) + ' ' + rng.choice(_NOUNS),
+            'icon' : 'inv_misc_' + rng.choice(_NOUNS).lower() + '_0' + \
+                     str(rng.randint(1, 9)),
+            'stackable' : rng.choice([1, 1, 20, 200]),
+            'itemBind' : rng.randint(0, 2),
+            'bonusStats' : [{'stat' : rng.choice(sorted(wowthon.STAT_NAMES)),
+                             'amount' : rng.randint(10, 500),
+                             'reforged' : False}
+                            for i in range(rng.randint(0, 4))],
+            'itemSpells' : [],
+            'buyPrice' : rng.randint(0, 10**6),
+            'itemClass' : rng.randint(0, 7),
+            'itemSubClass' : rng.randint(0, 10),
+            'containerSlots' : 0,
+            'inventoryType' : rng.randint(0, 26),
+            'equippable' : rng.random() < 0.5,
+            'itemLevel' : level,
+            'maxCount' : 0,
+            'maxDurability' : rng.choice([0, 55, 100, 120]),
+            'minFactionId' : 0,
+            'minReputation' : 0,
+            'quality' : quality,
+            'sellPrice' : rng.randint(0, 10**5),
+            'requiredSkill' : 0,
+            'requiredLevel' : min(level, 85),
+            'requiredSkillRank' : 0,
+            'itemSource' : {'sourceId' : rng.randint(0, 50000),
+                            'sourceType' : rng.choice(['NONE',
+                                'CREATED_BY_SPELL', 'VENDOR'])},
+            'baseArmor' : base_armor,
+            'hasSockets' : False,
+            'isAuctionable' : rng.random() < 0.8,
+            'armor' : base_armor,
+            'displayInfoId' : rng.randint(1000, 100000)
+        }
+        if quality >= 2:
+            ret['disenchantingSkillRank'] = rng.choice([1, 225, 475])
+        if rng.random() < 0.2:
+            ret['hasSockets'] = True
+            ret['socketInfo'] = {
+                'sockets' : [{'type' : rng.choice(wowthon.Item.SOCKET_TYPES)}
+                             for i in range(rng.randint(1, 3))],
+                'socketBonus' : '+10 Stamina'
+            }
+        if rng.random() < 0.2:
+            low = rng.randint(100, 2000)
+            ret['weaponInfo'] = {
+                'damage' : {'min' : low, 'max' : low * 2},
+                'weaponSpeed' : rng.choice([1.8, 2.6, 3.6]),
+                'dps' : round(low / 2.0, 1)
+            }
+        return ret
+
+    def item_set(self, id):
+        """Return the document for the item set `id`."""
+        rng = _rng(self.seed, 'itemset', id)
+        return {
+            'id' : id,
+            'name' : rng.choice(_ADJECTIVES) + ' Battlegear',
+            'setBonuses' : [
+                {'description' : 'Increases damage by ' + str(n) + '%.',
+                 'threshold' : n} for n in [2, 4]],
+            'items' : [rng.randint(70000, 80000) for i in range(5)]
+        }
+
+    def quest(self, id):
+        """Return the document for the quest `id`."""
+        rng = _rng(self.seed, 'quest', id)
+        level = rng.randint(1, 85)
+        return {
+            'id' : id,
+            'title' : rng.choice(['The ', 'A ', '']) + \
+                      rng.choice(_ADJECTIVES) + ' ' + rng.choice(_NOUNS),
+            'reqLevel' : max(level - 5, 1),
+            'suggestedPartyMembers' : rng.choice([0, 0, 0, 3, 5]),
+            'category' : _name(rng, 3),
+            'level' : level
+        }
+
+    def achievement(self, id):
+        """Return the document for the achievement `id`."""
+        rng = _rng(self.seed, 'achievement', id)
+        ret = {
+            'id' : id,
+            'title' : rng.choice(_ADJECTIVES) + ' ' + _name(rng, 2),
+            'points' : rng.choice([0, 10, 10, 20, 50]),
+            'description' : 'Do something ' + rng.choice(_ADJECTIVES).lower(),
+            'rewardItems' : [],
+            'icon' : 'achievement_' + _name(rng).lower(),
+            'criteria' : [{'id' : 1000 + i, 'description' : _name(rng, 3)}
+                          for i in range(rng.randint(0, 5))]
+        }
+        if rng.random() < 0.2:
+            item = rng.randint(50000, 80000)
+            ret['reward'] = 'Reward: ' + self.item(item)['name']
+            ret['rewardItems'] = [{'id' : item}]
+        return ret
+
+    def arena_team(self, region, realm, size, name):
+        """Return the document for an arena team."""
+        rng = _rng(self.seed, region, realm, size, name.lower())
+        players = int(size[0])
+        played = rng.randint(0, 50)
+        won = rng.randint(0, played)
+        ret = {
+            'realm' : self._realm_name(region, realm),
+            'ranking' : rng.randint(0, 5000),
+            'rating' : rng.randint(0, 2600),
+            'teamsize' : players,
+            'created' : '2011-{:02d}-{:02d}'.format(rng.randint(1, 12),
+                                                   rng.randint(1, 28)),
+            'name' : name,
+            'gamesPlayed' : played,
+            'gamesWon' : won,
+            'gamesLost' : played - won,
+            'sessionGamesPlayed' : played * 4,
+            'sessionGamesWon' : won * 4,
+            'sessionGamesLost' : (played - won) * 4,
+            'lastSessionRanking' : rng.randint(0, 5000),
+            'side' : rng.choice(['alliance', 'horde']),
+            'currentWeekRanking' : rng.randint(0, 5000),
+            'members' : []
+        }
+        for i in range(players):
+            char = self._char_summary(region, realm, _name(rng, 2))
+            char['level'] = 85
+            ret['members'].append({
+                'character' : char,
+                'rank' : 0 if i == 0 else 1,
+                'battlegroup' : char['battlegroup'],
+                'gamesPlayed' : played,
+                'gamesWon' : won,
+                'gamesLost' : played - won,
+                'sessionGamesPlayed' : played * 4,
+                'sessionGamesWon' : won * 4,
+                'sessionGamesLost' : (played - won) * 4,
+                'personalRating' : rng.randint(0, 2600)
+            })
+        return ret
+
+    #
+    # Auctions
+    #
+
+    def _auction_host(self, region):
+        return urllib.parse.urlsplit(wowthon.REGION[region]['prefix']).netloc
+
+    def auction_index(self, region, realm):
+        """Return the auction/data document for `realm`."""
+        with self._lock:
+            generation = self._generations.get(realm, 0)
+        return {'files' : [{
+            'url' : 'http://' + self._auction_host(region) + \
+                    '/auction-data/' + realm + '/auctions.json',
+            'lastModified' : BASE_LAST_MODIFIED + generation * 3600000
+        }]}
+
+    def auction_snapshot(self, region, realm, generation=None):
+        """
+        Return the auction dump for `realm` as a dictionary.
+
+        Successive snapshots (see `FakeBattleNet.next_snapshot`) are built
+        from the one before, so that listings persist between them.
+
+        """
+        if generation is None:
+            with self._lock:
+                generation = self._generations.get(realm, 0)
+        rng = _rng(self.seed, region, realm, 'auctions')
+        items = [rng.randint(2000, 80000) for i in range(
+            max(self.auctions // 10, 1))]
+        prices = dict((item, int(rng.lognormvariate(9, 2)) + 1)
+                      for item in items)
+        owners = [_name(rng, rng.randint(2, 3))
+                  for i in range(max(self.auctions // 8, 1))]
+        next_id = [1000000000 + zlib.crc32(bytes(realm, 'UTF-8')) % 10**8]
+
+        def listing():
+            item = rng.choice(items)
+            quantity = rng.choice([1, 1, 1, 5, 20])
+            buyout = int(prices[item] * quantity * rng.uniform(0.7, 1.5))
+            if rng.random() < 0.1:
+                # No buyout set
+                buyout = 0
+            next_id[0] += 1
+            return {
+                'auc' : next_id[0],
+                'item' : item,
+                'owner' : rng.choice(owners),
+                'bid' : int((buyout or prices[item] * quantity) * 0.8),
+                'buyout' : buyout,
+                'quantity' : quantity,
+                'timeLeft' : rng.choice(wowthon.AuctionListings.TIME_LEFT)
+            }
+
+        houses = dict((ah, [listing() for i in range(self.auctions)])
+                      for ah in wowthon.AuctionListings.AUCTION_HOUSES)
+        for g in range(generation):
+            for ah, auctions in houses.items():
+                kept = []
+                for auction in auctions:
+                    roll = rng.random()
+                    if roll < 0.1:
+                        # Sold or expired
+                        continue
+                    if roll < 0.15:
+                        auction = dict(auction, bid=auction['bid'] + 100)
+                    kept.append(auction)
+                while len(kept) < self.auctions:
+                    kept.append(listing())
+                houses[ah] = kept
+
+        ret = {'realm' : {'name' : self._realm_name(region, realm),
+                          'slug' : realm}}
+        for ah in wowthon.AuctionListings.AUCTION_HOUSES:
+            ret[ah] = {'auctions' : houses[ah]}
+        return ret
+
+    def _auction_dump(self, region, realm):
+        with self._lock:
+            generation = self._generations.get(realm, 0)
+            dump = self._dumps.get((realm, generation))
+        if dump is None:
+            dump = self.auction_snapshot(region, realm, generation)
+            with self._lock:
+                self._dumps[(realm, generation)] = dump
+        return dump
+
+class FakeTransport(wowthon.Transport):
+    """
+    A transport sending every request to a `FakeBattleNet` server.
+
+    The original host is kept as the first part of the request's path.
+
+    """
+    def __init__(self, address, transport):
+        self.address = address
+        self.transport = transport
+
+    def urlopen(self, url, headers=None, timeout=None):
+        parts = urllib.parse.urlsplit(url)
+        local = 'http://' + self.address + '/' + parts.netloc + parts.path
+        if parts.query:
+            local += '?' + parts.query
+        return self.transport.urlopen(local, headers, timeout)
+
+    def clear(self):
+        self.transport.clear()
+
+    @property
+    def max_size(self):
+        return getattr(self.transport, 'max_size', 8)
+
+    @property
+    def stats(self):
+        return self.transport.stats
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.fake._respond(self)
+
+    def send_json(self, code, body):
+        data = b''
+        if body is not None:
+            data = bytes(jsonlib.dumps(body), 'UTF-8')
+        encoding = None
+        if data and self.server.fake.compress and \
+           'gzip' in self.headers.get('Accept-Encoding', ''):
+            encoding = 'gzip'
+            data = gzip.compress(data, 6)
+
+        self.send_response(code)
+        if code != 304:
+            self.send_header('Content-Type',
+                             'application/json; charset=UTF-8')
+            self.send_header('Content-Length', str(len(data)))
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        self.end_headers()
+        self.wfile.write(data)
+        with self.server.fake._lock:
+            self.server.fake.stats['bytes_sent'] += len(data)
+
+    def log_message(self, *args):
+        pass
@@ -1,4 +1,7 @@
 ﻿import urllib.request
+import time
+import threading
+import contextlib
 from urllib.error import HTTPError #, URLError # Need URLError?
 
 class _FetchMixin:
@@ -6,24 +9,91 @@ class _FetchMixin:
     Mixin class to define common behaviour for any object that fetches data.
 
     """
+    #: The kind of object, if it is kept in the API's persistent store
+    _STORE_KIND = None
+
+    def _locked(self):
+        """
+        Return the object's lock if its API is thread safe, or a context
+        manager doing nothing otherwise.
+
+        The lock is held while the object's data or fields change, so that
+        threads sharing the object do not download it twice or see it half
+        updated.
+
+        """
+        if not getattr(self._api, 'thread_safe', False):
+            return _NO_LOCK
+        lock = self.__dict__.get('_lock')
+        if lock is None:
+            # setdefault is atomic, so every thread gets the same lock
+            lock = self.__dict__.setdefault('_lock', threading.RLock())
+        return lock
+
     def _fetch(self, force=False):
         """
         Fetch the data from the WoW server if it has not already been
         downloaded.
 
+        Data that has already been downloaded is also refreshed when it
+        is older than the API's `max_age`. If the data has a last modified
+        time, a refresh only downloads it again if it has changed.
+
         Arguments:
         force -- if true, fetches data regardless of whether the data
                  already exists.
 
         """
-        # TODO Use last modified to refresh
-        if force or not self._json:
-            self._json = self._api._get_json(self._url)
-            # Try to update last modified if it exists
-            try:
-                self._last_modified = self._json['lastModified']
-            except KeyError:
-                pass
+        with self._locked():
+            fetched_at = getattr(self, '_fetched_at', None)
+            max_age = self._api.max_age
+            if not force and self._json and max_age is not None and \
+               fetched_at is not None and time.time() - fetched_at > max_age:
+                force = True
+
+            if force or not self._json:
+                last_modified = None
+                if self._json and \
+                   getattr(self, '_fetched_url', None) == self._url:
+                    # Only revalidate if the same fields are being asked for
+                    last_modified = getattr(self, '_last_modified', None)
+
+                store_key = None
+                if self._STORE_KIND:
+                    store_key = (self._region, self._locale, self._STORE_KIND,
+                                 self._id)
+                if store_key and not self._json:
+                    json = self._api._get_stored_json(self._url, store_key)
+                else:
+                    json = self._api._get_json(self._url, last_modified,
+                                               store_key)
+                self._fetched_at = time.time()
+                self._fetched_url = self._url
+                if json is None:
+                    # Not modified since last time, keep what we have
+                    return
+                self._json = json
+                self._api._cache_resize(self)
+                # Try to update last modified if it exists
+                try:
+                    self._last_modified = self._json['lastModified']
+                except KeyError:
+                    pass
+
+    def fetch(self, force=False):
+        """
+        Return an awaitable which downloads the object's data without
+        blocking the event loop, and resolves to the object itself.
+
+        e.g.
+            char = await api.get_char('untamedbush').fetch()
+
+        Arguments:
+        force -- if true, fetches data regardless of whether the data
+                 already exists.
+
+        """
+        return self._api._fetch_async(self, force)
 
     def force_update(self):
         """Force the data to update itself from the server."""
@@ -52,8 +122,11 @@ class _FetchMixin:
         except KeyError:
             if has_fields and name in self._fields:
                 # If we don't have it, but we should have it, we force update
-                self.force_update()
-                return self._json[name]
+                with self._locked():
+                    if name not in self._json:
+                        # Unless another thread already has
+                        self.force_update()
+                    return self._json[name]
             else:
                 # Otherwise, we don't know what it is
                 raise
@@ -63,6 +136,11 @@ class _FetchMixin:
         Add a field to the list of fields fetched.
 
         """
-        if name not in self._fields:
-            self._fields.append(name)
-            self._url = self._generate_url()
+        with self._locked():
+            if name not in self._fields:
+                # Replaced rather than changed, for threads reading it
+                self._fields = self._fields + [name]
+                self._url = self._generate_url()
+
+# Used in place of a lock when the API is not thread safe
+_NO_LOCK = contextlib.nullcontext()
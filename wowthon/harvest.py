@@ -0,0 +1,198 @@
+﻿import concurrent.futures
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+import wowthon
+from wowthon.auctions import _parse_dump
+
+class AuctionHarvester:
+    """
+    Reads the auction houses of many realms at once.
+
+    Dumps are downloaded by a pool of threads into a `wowthon.DumpCache`,
+    and each is parsed, as soon as it is saved, by a pool of processes, so
+    that parsing runs on every CPU rather than in turn with the downloads.
+    Workers are only sent the name of the dump's file and only send back
+    the compact arrays of its `wowthon.MarketStats`, and optionally its
+    `wowthon.AuctionColumns`:
+
+        with wowthon.AuctionHarvester(processes=4) as harvester:
+            results = harvester.harvest([('eu', 'Draenor'),
+                                         ('us', 'Stormrage')])
+        results['eu', 'draenor']['stats'].get(72092)
+
+    """
+    def __init__(self, processes=None, downloads=8, dump_cache=None,
+                 columns=False, percentiles=(10, 25, 50, 75, 90), **kwargs):
+        """
+        Create a harvester.
+
+        Optional arguments:
+        processes -- the number of processes parsing dumps (default: the
+                     number of CPUs)
+        downloads -- the number of dumps downloaded at once (default: 8)
+        dump_cache -- a `wowthon.DumpCache` to save dumps in. Dumps already
+                      saved are not downloaded again. (default: a temporary
+                      directory, removed by `AuctionHarvester.close`)
+        columns -- if true, the `wowthon.AuctionColumns` of every realm are
+                   returned as well as its market statistics
+                   (default: False)
+        percentiles -- the percentiles passed to
+                       `wowthon.AuctionColumns.market_stats`
+                       (default: (10, 25, 50, 75, 90))
+
+        Any other keyword arguments, such as `public_key` or `rate_limit`,
+        are passed on to the `wowthon.WoWAPI` created for each region.
+
+        """
+        self._temp_dir = None
+        if dump_cache is None:
+            self._temp_dir = tempfile.mkdtemp(prefix='wowthon-dumps-')
+            dump_cache = wowthon.DumpCache(self._temp_dir, keep=1)
+        if 'transport' not in kwargs:
+            kwargs['transport'] = wowthon.ConnectionPool(max_size=downloads)
+        self.dump_cache = dump_cache
+        self.columns = columns
+        self.percentiles = percentiles
+        self._api_args = kwargs
+        self._apis = {}
+        self._downloads = concurrent.futures.ThreadPoolExecutor(downloads)
+        # Workers are started from the download threads, which is not safe
+        # to do by forking
+        context = None
+        if 'forkserver' in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context('forkserver')
+        self._processes = concurrent.futures.ProcessPoolExecutor(
+            processes, context)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """
+        Shut down the threads and processes used, and remove the temporary
+        dump cache if there is one.
+
+        """
+        self._downloads.shutdown()
+        self._processes.shutdown()
+        if self._temp_dir is not None:
+            shutil.rmtree(self._temp_dir, ignore_errors=True)
+            self._temp_dir = None
+
+    def _api(self, region):
+        """Return the API used for realms in `region`."""
+        api = self._apis.get(region)
+        if api is None:
+            # Any realm will do, the listings are given theirs
+            api = wowthon.WoWAPI('Draenor', region,
+                                 dump_cache=self.dump_cache,
+                                 thread_safe=True, **self._api_args)
+            api = self._apis.setdefault(region, api)
+        return api
+
+    def harvest(self, realms):
+        """
+        Read the auction houses of every realm in `realms`, a list of
+        (region, realm name) tuples.
+
+        Returns a dictionary of (region, realm slug) -> result, in the order
+        given. Each result is a dictionary with the following fields:
+
+        stats -- the realm's `wowthon.MarketStats`
+        columns -- the realm's `wowthon.AuctionColumns`, if asked for,
+                   otherwise None
+        auctions -- the number of auctions
+        last_modified -- the lastModified time of the dump read
+        bytes -- the size of the dump
+        download_time -- the seconds taken to check the auction data
+                         index and download the dump, if it was not
+                         already saved
+        wait_time -- the seconds between the download ending and a
+                     process starting to parse it
+        parse_time -- the seconds taken to parse the dump and find its
+                      statistics
+        error -- the exception raised while reading the realm, or None. If
+                 there is one, the other fields may be missing.
+
+        """
+        keys = []
+        for region, realm in realms:
+            region = region.lower()
+            keys.append((region, wowthon.WoWAPI.realm_name_to_slug(realm)))
+        downloads = [self._downloads.submit(self._download, region, realm)
+                     for region, realm in keys]
+
+        ret = {}
+        for key, download in zip(keys, downloads):
+            result = {'error' : None}
+            ret[key] = result
+            try:
+                details, parse = download.result()
+                saved_at = details.pop('saved_at')
+                result.update(details)
+                auctions, stats, columns, times = parse.result()
+            except Exception as e:
+                result['error'] = e
+                continue
+            if columns is not None:
+                columns._api = self._api(key[0])
+                columns._realm, columns._region = key[1], key[0]
+            result.update({
+                'stats' : stats,
+                'columns' : columns,
+                'auctions' : auctions,
+                'wait_time' : times[0] - saved_at,
+                'parse_time' : times[1] - times[0]
+            })
+        return ret
+
+    def _download(self, region, realm):
+        """
+        Save the dump of `realm` in the dump cache, then pass its file to a
+        process to be parsed.
+
+        Returns a tuple of a dictionary describing the download and the
+        future of the parse.
+
+        """
+        listings = wowthon.AuctionListings(self._api(region), realm, region)
+        start = time.time()
+        modified = listings._json_property('files')[0]['lastModified']
+        path = self.dump_cache._file_name(region, realm, modified)
+        if not os.path.exists(path):
+            for chunk in listings._dump_chunks():
+                pass
+        saved_at = time.time()
+        parse = self._processes.submit(_parse_file, path, self.percentiles,
+                                       self.columns)
+        return {
+            'last_modified' : modified,
+            'bytes' : os.path.getsize(path),
+            'download_time' : saved_at - start,
+            'saved_at' : saved_at
+        }, parse
+
+def _parse_file(path, percentiles, columns):
+    """
+    Build the columns of the dump saved at `path`, in a worker process.
+
+    Returns a tuple (auctions, MarketStats, AuctionColumns or None,
+    (start time, end time)).
+
+    """
+    start = time.time()
+    with open(path, 'rb') as f:
+        chunks = iter(lambda: f.read(65536), b'')
+        ret = wowthon.AuctionColumns(None)
+        for house, auction in _parse_dump(chunks):
+            if house in wowthon.AuctionListings.AUCTION_HOUSES:
+                ret.append(house, auction)
+    stats = ret.market_stats(percentiles)
+    return len(ret), stats, ret if columns else None, (start, time.time())
@@ -0,0 +1,266 @@
+﻿import array
+import itertools
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+
+import wowthon
+from wowthon.auctions import _percentile
+
+class PriceHistory:
+    """
+    A file recording the prices of the items on a realm's auction houses,
+    one record per item for each snapshot of the listings appended.
+
+    Records have a fixed size and are only ever appended. Each one points
+    back to the item's record from the snapshot before, so the history of
+    an item is read by following its chain from the latest record, without
+    touching those of other items:
+
+        history = wowthon.PriceHistory('draenor.hist')
+        history.append(wowthon.AuctionListings(api))
+        history.price_history(72092, since=time.time() - 7 * 86400)
+
+    The latest record of every item is kept in a small file next to the
+    history, with the suffix '.heads'. It is rebuilt from the history if it
+    is missing or out of date.
+
+    One history should be kept for each realm.
+
+    """
+    #: Identifies the file format
+    MAGIC = b'WOWHIST\0'
+    #: The version of the file format
+    VERSION = 2
+    # Magic, version, number of records
+    _HEADER = struct.Struct('<8sIQ')
+    # Snapshot time, item, previous record of the item, listings, quantity,
+    # minimum, median and mean unit buyout. Prices are doubles, which hold
+    # every copper amount exactly.
+    _RECORD = struct.Struct('<IiiIIddd')
+    # Number of records covered by the heads file
+    _HEADS_HEADER = struct.Struct('<Q')
+
+    #: The fields returned by `price_history`
+    FIELDS = ['time', 'count', 'quantity', 'min', 'median', 'mean']
+
+    def __init__(self, path, items=None):
+        """
+        Open the history at `path`, creating it if it does not exist.
+
+        Optional arguments:
+        items -- the ids of the items to record, or None to record every
+                 item listed (default: None)
+
+        Throws:
+        ValueError -- if the file is not a price history
+
+        """
+        if not os.path.exists(path):
+            with open(path, 'wb') as f:
+                f.write(self._HEADER.pack(self.MAGIC, self.VERSION, 0))
+        self.path = path
+        self.items = None if items is None else set(items)
+        self._lock = threading.Lock()
+        self._map = None
+        self._file = open(path, 'r+b')
+        try:
+            magic, version, self._count = self._HEADER.unpack(
+                self._file.read(self._HEADER.size))
+            if magic != self.MAGIC or version != self.VERSION:
+                raise ValueError('"' + path + '" is not a price history.')
+            self._heads = self._read_heads()
+        except Exception:
+            self._file.close()
+            raise
+        self._last_time = 0
+        if self._count:
+            self._last_time = self._record(self._count - 1)[0]
+
+    def _read_heads(self):
+        """
+        Return a dictionary of item id -> latest record, from the heads file
+        and any records appended since it was written.
+
+        """
+        heads = {}
+        covered = 0
+        try:
+            with open(self.path + '.heads', 'rb') as f:
+                data = f.read()
+            covered, = self._HEADS_HEADER.unpack_from(data)
+            pairs = array.array('i', data[self._HEADS_HEADER.size:])
+            heads = dict(zip(pairs[::2], pairs[1::2]))
+        except (OSError, struct.error, ValueError):
+            covered = 0
+        if covered > self._count:
+            # The history was cut short since the heads were written
+            heads = {}
+            covered = 0
+        for i in range(covered, self._count):
+            heads[self._record(i)[1]] = i
+        return heads
+
+    def _write_heads(self):
+        """Save the latest record of every item, replacing the old file."""
+        pairs = array.array('i')
+        for item, head in self._heads.items():
+            pairs.append(item)
+            pairs.append(head)
+        temp = self.path + '.heads.tmp'
+        with open(temp, 'wb') as f:
+            f.write(self._HEADS_HEADER.pack(self._count))
+            f.write(pairs.tobytes())
+        os.replace(temp, self.path + '.heads')
+
+    def _record(self, i):
+        """Return the record numbered `i` as a tuple."""
+        if self._map is None:
+            self._map = mmap.mmap(self._file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+        return self._RECORD.unpack_from(
+            self._map, self._HEADER.size + i * self._RECORD.size)
+
+    def append(self, listings, when=None):
+        """
+        Record the prices of every item in a snapshot of a realm's auction
+        houses.
+
+        Snapshots must be appended in order. One which is no newer than the
+        last appended is ignored.
+
+        Returns the number of records appended.
+
+        Arguments:
+        listings -- an AuctionListings or AuctionColumns
+
+        Optional arguments:
+        when -- the time of the snapshot, in seconds since the epoch
+                (default: the time the listings were last modified, or the
+                current time for columns)
+
+        """
+        if isinstance(listings, wowthon.AuctionListings):
+            columns = listings.to_columns()
+            if when is None:
+                # Known without a download for listings already read,
+                # including opened snapshots
+                modified = listings.dump_modified
+                if modified is None:
+                    modified = listings._json_property('files')[0][
+                        'lastModified']
+                when = modified / 1000
+        else:
+            columns = listings
+        if when is None:
+            when = time.time()
+        when = int(when)
+
+        totals = columns.item_totals()
+        quantity = columns.quantity
+        buyout = columns.buyout
+        with self._lock:
+            if when <= self._last_time:
+                return 0
+            data = bytearray()
+            count = self._count
+            for item_id in sorted(totals):
+                if self.items is not None and item_id not in self.items:
+                    continue
+                rows, prices = columns._item_index(item_id)
+                if len(prices):
+                    # Over the items listed, as in MarketStats
+                    counts = array.array('q', itertools.accumulate(
+                        quantity[i] for i in rows))
+                    low = prices[0]
+                    median = _percentile(prices, counts, 50)
+                    mean = sum(buyout[i] for i in rows) / counts[-1]
+                else:
+                    low = median = mean = math.nan
+                listed, total = totals[item_id]
+                data += self._RECORD.pack(when, item_id,
+                                          self._heads.get(item_id, -1),
+                                          listed, total, low, median, mean)
+                self._heads[item_id] = count
+                count += 1
+
+            # Records past the stored count are unused, so the history
+            # stays whole if this is interrupted
+            self._file.seek(self._HEADER.size +
+                            self._count * self._RECORD.size)
+            self._file.write(data)
+            self._file.flush()
+            self._file.seek(0)
+            self._file.write(self._HEADER.pack(self.MAGIC, self.VERSION,
+                                               count))
+            self._file.flush()
+            appended = count - self._count
+            self._count = count
+            self._last_time = when
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            self._write_heads()
+        return appended
+
+    def price_history(self, item_id, since=None, until=None):
+        """
+        Return the recorded prices of the item `item_id`, oldest first, as a
+        dictionary of arrays with the keys in `PriceHistory.FIELDS`:
+
+        time -- the time of each snapshot, in seconds since the epoch
+        count -- the number of auctions of the item
+        quantity -- the total number of the item listed
+        min, median, mean -- the buyout prices per item of those listed
+                             with a buyout, so that an auction of 20
+                             counts 20 times as in `wowthon.MarketStats`,
+                             or NaN if none had a buyout
+
+        Optional arguments:
+        since -- the earliest snapshot time to include (default: None)
+        until -- the latest snapshot time to include (default: None)
+
+        """
+        times = array.array('I')
+        counts = array.array('I')
+        quantities = array.array('I')
+        lows = array.array('d')
+        medians = array.array('d')
+        means = array.array('d')
+        with self._lock:
+            i = self._heads.get(item_id, -1)
+            while i >= 0:
+                record = self._record(i)
+                if since is not None and record[0] < since:
+                    break
+                if until is None or record[0] <= until:
+                    times.append(record[0])
+                    counts.append(record[3])
+                    quantities.append(record[4])
+                    lows.append(record[5])
+                    medians.append(record[6])
+                    means.append(record[7])
+                i = record[2]
+        ret = dict(zip(self.FIELDS, [times, counts, quantities, lows,
+                                     medians, means]))
+        for values in ret.values():
+            values.reverse()
+        return ret
+
+    def item_ids(self):
+        """Return a list of the ids of every item recorded."""
+        with self._lock:
+            return list(self._heads)
+
+    def close(self):
+        """Close the file."""
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __len__(self):
+        return self._count
@@ -6,6 +6,7 @@ class Item(wowthon._FetchMixin):
 
     """
     _PATH = 'item/'
+    _STORE_KIND = 'item'
 
     #: A list of valid spell triggers
     TRIGGERS = [
@@ -669,6 +670,7 @@ class ItemSet(wowthon._FetchMixin):
     """
 
     _PATH = 'item/set/'
+    _STORE_KIND = 'itemset'
 
     def __init__(self, api, id, region=None, locale=None, json=None):
         """
@@ -0,0 +1,235 @@
+﻿import http.client
+import threading
+import time
+import urllib.parse
+
+import wowthon
+
+class ConnectionPool(wowthon.Transport):
+    """
+    A transport keeping persistent (keep-alive) HTTP connections open
+    between requests.
+
+    Connections are pooled per scheme and host, so every lookup against a
+    region's Battle.net host reuses the same few sockets instead of paying
+    for a new TCP (and TLS) handshake on each request.
+
+    """
+    #: The maximum number of redirects followed for a single request
+    MAX_REDIRECTS = 5
+
+    def __init__(self, max_size=8, idle_timeout=30, timeout=None):
+        """
+        Create a new, empty connection pool.
+
+        Optional arguments:
+        max_size -- the maximum number of connections open to any one host
+                    at once. Requests over the limit wait for a connection
+                    to be released. (default: 8)
+        idle_timeout -- the number of seconds an unused connection is kept
+                        before it is closed (default: 30)
+        timeout -- the socket timeout in seconds for new connections
+                   (default: None, the global default)
+
+        """
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+
+        self._lock = threading.Condition()
+        # (scheme, host) -> list of (connection, last used time)
+        self._idle = {}
+        # (scheme, host) -> number of connections currently handed out
+        self._busy = {}
+
+        self._stats = {
+            'requests' : 0,
+            'created' : 0,
+            'reused' : 0,
+            'expired' : 0,
+            'discarded' : 0,
+        }
+
+    def _new_connection(self, scheme, host):
+        """
+        Open a new connection to `host`.
+
+        """
+        if scheme == 'https':
+            return http.client.HTTPSConnection(host, timeout=self.timeout)
+        return http.client.HTTPConnection(host, timeout=self.timeout)
+
+    def _acquire(self, key):
+        """
+        Return a tuple (connection, reused) for the host `key`.
+
+        Blocks while `max_size` connections to the host are in use.
+
+        """
+        with self._lock:
+            while self._busy.get(key, 0) >= self.max_size:
+                self._lock.wait()
+            self._busy[key] = self._busy.get(key, 0) + 1
+
+            idle = self._idle.get(key, [])
+            now = time.time()
+            while idle:
+                conn, last_used = idle.pop()
+                if now - last_used > self.idle_timeout:
+                    # Server has most likely dropped it by now
+                    conn.close()
+                    self._stats['expired'] += 1
+                    continue
+                self._stats['reused'] += 1
+                return conn, True
+
+            self._stats['created'] += 1
+        return self._new_connection(*key), False
+
+    def _release(self, key, conn, reuse=True):
+        """
+        Hand a connection back to the pool, or close it if `reuse` is false.
+
+        """
+        with self._lock:
+            self._busy[key] -= 1
+            if reuse:
+                self._idle.setdefault(key, []).append((conn, time.time()))
+            else:
+                conn.close()
+                self._stats['discarded'] += 1
+            self._lock.notify()
+
+    def _send(self, key, path, headers, timeout=None):
+        """
+        Send a GET request for `path`, returning (connection, response).
+
+        A request made on a reused connection that the server has already
+        closed is retried once on a fresh connection.
+
+        """
+        conn, reused = self._acquire(key)
+        try:
+            self._set_timeout(conn, timeout)
+            conn.request('GET', path, headers=headers)
+            return conn, conn.getresponse()
+        except (http.client.HTTPException, ConnectionError):
+            self._release(key, conn, reuse=False)
+            if not reused:
+                raise
+        except BaseException:
+            # Timeouts and the like must not keep the connection's slot
+            self._release(key, conn, reuse=False)
+            raise
+
+        # Stale keep-alive connection, try again with a new one
+        with self._lock:
+            self._busy[key] = self._busy.get(key, 0) + 1
+            self._stats['created'] += 1
+        conn = self._new_connection(*key)
+        try:
+            self._set_timeout(conn, timeout)
+            conn.request('GET', path, headers=headers)
+            return conn, conn.getresponse()
+        except BaseException:
+            self._release(key, conn, reuse=False)
+            raise
+
+    def _set_timeout(self, conn, timeout):
+        """
+        Use `timeout` for the next request on `conn`, if it is not None.
+
+        """
+        if timeout is None:
+            return
+        conn.timeout = timeout
+        if conn.sock:
+            conn.sock.settimeout(timeout)
+
+    def urlopen(self, url, headers=None, timeout=None):
+        """
+        Make a GET request for `url` using a pooled connection.
+
+        If `timeout` is given, it is used as the socket timeout in seconds
+        for this request in place of the pool's `timeout`.
+
+        Redirects are followed. Returns a `PooledResponse`, which must be
+        read and closed (or used in a `with` statement) to return its
+        connection to the pool.
+
+        """
+        if headers is None: headers = {}
+        for i in range(self.MAX_REDIRECTS + 1):
+            parts = urllib.parse.urlsplit(url)
+            key = (parts.scheme, parts.netloc)
+            path = parts.path or '/'
+            if parts.query:
+                path += '?' + parts.query
+
+            with self._lock:
+                self._stats['requests'] += 1
+            conn, resp = self._send(key, path, headers, timeout)
+            ret = PooledResponse(self, key, conn, resp)
+
+            location = resp.getheader('Location')
+            if resp.status in [301, 302, 303, 307, 308] and location:
+                ret.read()
+                ret.close()
+                url = urllib.parse.urljoin(url, location)
+                continue
+            return ret
+
+        raise http.client.HTTPException('Too many redirects for ' + url)
+
+    def clear(self):
+        """Close every idle connection in the pool."""
+        with self._lock:
+            for conns in self._idle.values():
+                for conn, last_used in conns:
+                    conn.close()
+            self._idle = {}
+
+    @property
+    def stats(self):
+        """
+        Return a dictionary of pool statistics with the following fields:
+
+        requests -- the number of requests made through the pool
+        created -- the number of connections opened
+        reused -- the number of requests served by an existing connection
+        expired -- the number of idle connections closed for being too old
+        discarded -- the number of connections closed after use
+        idle -- the number of connections currently waiting to be reused
+        busy -- the number of connections currently in use
+
+        """
+        with self._lock:
+            ret = dict(self._stats)
+            ret['idle'] = sum(len(c) for c in self._idle.values())
+            ret['busy'] = sum(self._busy.values())
+        return ret
+
+class PooledResponse(wowthon.Response):
+    """
+    A response whose connection belongs to a `ConnectionPool`.
+
+    """
+    def __init__(self, pool, key, conn, resp):
+        super().__init__(resp, resp.status, resp.reason, resp.msg)
+        self._pool = pool
+        self._key = key
+        self._conn = conn
+
+    def close(self):
+        """
+        Release the connection back to the pool.
+
+        The connection is only reused if the body has been read fully and
+        the server has not asked for the connection to be closed.
+
+        """
+        if self._closed:
+            return
+        self._closed = True
+        reuse = self._resp.isclosed() and not self._resp.will_close
+        self._pool._release(self._key, self._conn, reuse)
@@ -8,6 +8,7 @@ class Quest(wowthon._FetchMixin):
 
     """
     _PATH = 'quest/'
+    _STORE_KIND = 'quest'
     def __init__(self, api, id, region=None, locale=None, json=None):
         """
         Create a new Quest object using the specified API, for the quest `id`.
@@ -28,6 +29,8 @@ class Quest(wowthon._FetchMixin):
 
         self._api = api
         self._id = id
+        self._region = region
+        self._locale = locale
         self._json = json
         self._url = wowthon.REGION[region]['prefix'] + self._PATH + \
                     str(id) + '?locale=' + locale
@@ -0,0 +1,146 @@
+﻿import threading
+import time
+
+import wowthon
+
+class RateLimiter:
+    """
+    A token bucket limiting the rate requests are made at.
+
+    Tokens are added to the bucket at `rate` per second, up to `burst`
+    tokens. Each request takes a token. When the bucket is empty, requests
+    wait in turn for the next token rather than failing, which smooths
+    bursts out to the allowed rate.
+
+    Requests made with the same API key to the same region share a limiter;
+    see `RateLimiter.for_key`.
+
+    """
+    # (public key, region) -> RateLimiter
+    _registry = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, rate, burst=None, daily_quota=None):
+        """
+        Create a new rate limiter.
+
+        Arguments:
+        rate -- the number of requests allowed per second, or None to only
+                enforce `daily_quota`
+
+        Optional arguments:
+        burst -- the number of requests that may be made at once after a
+                 quiet period (default: `rate`, at least 1)
+        daily_quota -- the number of requests allowed per day (UTC), or None
+                       for no limit. Requests over the quota raise
+                       `wowthon.QuotaExceededError`. (default: None)
+
+        """
+        if not burst: burst = max(rate or 1, 1)
+        self.rate = rate
+        self.burst = burst
+        self.daily_quota = daily_quota
+
+        self._lock = threading.Lock()
+        self._tokens = burst
+        self._last = time.monotonic()
+        self._day = None
+        self._spent = 0
+        self._stats = {
+            'requests' : 0,
+            'delayed' : 0,
+            'waited' : 0.0,
+        }
+
+    @classmethod
+    def for_key(cls, public_key, region, rate, burst=None, daily_quota=None):
+        """
+        Return the rate limiter shared by requests made with `public_key` to
+        `region`, creating it with the given settings if there is none yet.
+
+        """
+        key = (public_key, region)
+        with cls._registry_lock:
+            if key not in cls._registry:
+                cls._registry[key] = cls(rate, burst, daily_quota)
+            return cls._registry[key]
+
+    def _roll_day(self):
+        # Quotas reset at midnight UTC
+        day = time.gmtime()[:3]
+        if day != self._day:
+            self._day = day
+            self._spent = 0
+
+    def acquire(self):
+        """
+        Take a token for one request, waiting until one is available.
+
+        Returns the number of seconds spent waiting.
+
+        Throws:
+        QuotaExceededError -- if the daily quota has been used up
+
+        """
+        with self._lock:
+            self._roll_day()
+            if self.daily_quota is not None and \
+               self._spent >= self.daily_quota:
+                raise wowthon.QuotaExceededError(self.daily_quota)
+            self._spent += 1
+            self._stats['requests'] += 1
+            if self.rate is None:
+                return 0
+
+            now = time.monotonic()
+            self._tokens = min(self.burst,
+                               self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            # Waiting requests leave the bucket in debt, which queues them
+            # up behind each other in the order they arrived.
+            self._tokens -= 1
+            wait = 0
+            if self._tokens < 0:
+                wait = -self._tokens / self.rate
+                self._stats['delayed'] += 1
+                self._stats['waited'] += wait
+
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    @property
+    def spent_today(self):
+        """Return the number of requests made so far today (UTC)."""
+        with self._lock:
+            self._roll_day()
+            return self._spent
+
+    @property
+    def remaining_today(self):
+        """
+        Return the number of requests left in today's quota, or None if
+        there is no daily quota.
+
+        """
+        if self.daily_quota is None:
+            return None
+        return max(self.daily_quota - self.spent_today, 0)
+
+    @property
+    def stats(self):
+        """
+        Return a dictionary of statistics with the following fields:
+
+        requests -- the number of requests let through
+        delayed -- the number of requests that had to wait
+        waited -- the total number of seconds spent waiting
+        spent_today -- see `RateLimiter.spent_today`
+        remaining_today -- see `RateLimiter.remaining_today`
+
+        """
+        with self._lock:
+            ret = dict(self._stats)
+        ret['spent_today'] = self.spent_today
+        ret['remaining_today'] = self.remaining_today
+        return ret
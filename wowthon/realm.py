@@ -38,13 +38,14 @@ class Realm(wowthon._FetchMixin):
                     name + api._get_locale_suffix('&')
 
     def _fetch(self, force=False):
-        super()._fetch()
-        try:
-            # Only returns one realm.
-            self._json = self._json['realms'][0]
-        except KeyError:
-            # Already been done, presumably.
-            pass
+        with self._locked():
+            super()._fetch()
+            try:
+                # Only returns one realm.
+                self._json = self._json['realms'][0]
+            except KeyError:
+                # Already been done, presumably.
+                pass
 
     @property
     def name(self):
@@ -0,0 +1,73 @@
+﻿import threading
+
+class SingleFlight:
+    """
+    Makes sure only one call for a given key runs at a time.
+
+    Callers asking for a key that is already being worked on wait for that
+    call to finish and share its result (or exception) instead of repeating
+    the work.
+
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        # key -> _Call
+        self._calls = {}
+        self._stats = {
+            'hits' : 0,
+            'misses' : 0,
+        }
+
+    def do(self, key, func, *args):
+        """
+        Return `func(*args)`, unless a call for `key` is already running,
+        in which case its result is waited for and returned.
+
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self._stats['hits'] += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self._stats['misses'] += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    @property
+    def stats(self):
+        """
+        Return a dictionary of statistics with the following fields:
+
+        hits -- the number of calls that shared another call's result
+        misses -- the number of calls that did the work themselves
+        in_flight -- the number of calls currently running
+
+        """
+        with self._lock:
+            ret = dict(self._stats)
+            ret['in_flight'] = len(self._calls)
+        return ret
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
@@ -0,0 +1,137 @@
+﻿import json as jsonlib
+import mmap
+import struct
+import threading
+
+import wowthon
+
+class CacheSnapshot:
+    """
+    A file holding the downloaded data of cached objects, from which they
+    are rebuilt as they are asked for.
+
+    The file starts with a header giving the position of an index, a JSON
+    list describing every object. Each object's JSON data is stored before
+    the index, and is only read from the memory mapped file, and its object
+    built, when it is looked up.
+
+    """
+    #: Identifies the file format
+    MAGIC = b'WOWCACHE'
+    #: The version of the file format
+    VERSION = 1
+    # Magic, version, index offset and index length
+    _HEADER = struct.Struct('<8sIQQ')
+
+    #: The kinds of object saved in snapshots
+    KINDS = ['item', 'quest', 'ach', 'char', 'guild']
+
+    def __init__(self, path):
+        """
+        Open the snapshot at `path`.
+
+        Throws:
+        ValueError -- if the file is not a cache snapshot
+
+        """
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+            magic, version, offset, length = self._HEADER.unpack_from(
+                self._map)
+            if magic != self.MAGIC or version != self.VERSION:
+                raise ValueError('"' + path + '" is not a cache snapshot.')
+            index = jsonlib.loads(self._map[offset:offset + length])
+        except Exception:
+            self.close()
+            raise
+        self._lock = threading.Lock()
+        # key -> [offset, length, fields, last modified, fetched at]
+        self._index = dict((tuple(record[0]), record[1:])
+                           for record in index)
+
+    @classmethod
+    def write(cls, path, objects):
+        """
+        Save the data of every downloaded entity in `objects`, a list of
+        (cache key, object) tuples, to a snapshot at `path`.
+
+        Returns the number of objects saved.
+
+        """
+        index = []
+        with open(path, 'wb') as f:
+            f.write(cls._HEADER.pack(cls.MAGIC, cls.VERSION, 0, 0))
+            for key, obj in objects:
+                json = getattr(obj, '_json', None)
+                if key[0] not in cls.KINDS or not json:
+                    continue
+                data = bytes(jsonlib.dumps(json, separators=(',', ':')),
+                             'UTF-8')
+                index.append([list(key), f.tell(), len(data),
+                              getattr(obj, '_fields', None),
+                              getattr(obj, '_last_modified', None),
+                              getattr(obj, '_fetched_at', None)])
+                f.write(data)
+            offset = f.tell()
+            data = bytes(jsonlib.dumps(index, separators=(',', ':')),
+                         'UTF-8')
+            f.write(data)
+            f.seek(0)
+            f.write(cls._HEADER.pack(cls.MAGIC, cls.VERSION, offset,
+                                     len(data)))
+        return len(index)
+
+    def pop(self, api, key):
+        """
+        Return the object saved at `key`, rebuilt for `api`, or None if there
+        is no such object. Each object is only returned once.
+
+        """
+        with self._lock:
+            record = self._index.pop(key, None)
+        if record is None:
+            return None
+        offset, length, fields, last_modified, fetched_at = record
+        json = api._decode_json(self._map[offset:offset + length])
+
+        kind = key[0]
+        if kind == 'char':
+            region, locale, realm, name = key[1:]
+            obj = wowthon.Character(api, json.get('name', name), realm,
+                                    region, locale, fields, json=json)
+        elif kind == 'guild':
+            region, realm, name = key[1:]
+            obj = wowthon.Guild(api, json.get('name', name), realm, region,
+                                fields, json=json)
+        else:
+            cls = {
+                'item' : wowthon.Item,
+                'quest' : wowthon.Quest,
+                'ach' : wowthon.Achievement
+            }[kind]
+            region, locale, id = key[1:]
+            obj = cls(api, id, region=region, locale=locale, json=json)
+
+        if last_modified is not None:
+            obj._last_modified = last_modified
+        if fetched_at is not None:
+            obj._fetched_at = fetched_at
+        obj._fetched_url = obj._url
+        return obj
+
+    def keys(self):
+        """Return a list of the keys of the objects not yet rebuilt."""
+        with self._lock:
+            return list(self._index)
+
+    def close(self):
+        """Close the file."""
+        if getattr(self, '_map', None) is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __len__(self):
+        return len(self._index)
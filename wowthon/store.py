@@ -0,0 +1,137 @@
+﻿import sqlite3
+import threading
+import time
+
+class PersistentStore:
+    """
+    A cache of static game data kept in an SQLite database, so that items,
+    quests and the like are only downloaded once across processes.
+
+    Documents are stored as the JSON bytes downloaded, keyed by region,
+    locale, kind of object and id. The database uses write-ahead logging,
+    so any number of processes (and threads) can read and write it at
+    once.
+
+    """
+    #: The kinds of object kept in the store
+    KINDS = [
+        'item',
+        'itemset',
+        'quest',
+        'ach',
+        'item_class',
+        'classes',
+        'races',
+        'battlegroups'
+    ]
+
+    def __init__(self, path, max_age=None, timeout=30):
+        """
+        Open the store at `path`, creating it if it does not exist.
+
+        Arguments:
+        path -- the file name of the database
+
+        Optional arguments:
+        max_age -- the number of seconds a document is used for before it is
+                   downloaded again (default: None, forever)
+        timeout -- the number of seconds to wait for another process
+                   writing to the database (default: 30)
+
+        """
+        self.path = path
+        self.max_age = max_age
+        self.timeout = timeout
+        # Connections cannot be shared between threads
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits' : 0,
+            'misses' : 0,
+            'writes' : 0,
+        }
+
+        db = self._db()
+        db.execute('PRAGMA journal_mode=WAL')
+        with db:
+            db.execute('CREATE TABLE IF NOT EXISTS documents ('
+                       'region TEXT, locale TEXT, kind TEXT, id TEXT, '
+                       'json BLOB, stored_at REAL, '
+                       'PRIMARY KEY (region, locale, kind, id))')
+
+    def _db(self):
+        """Return this thread's connection to the database."""
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=self.timeout)
+            db.execute('PRAGMA synchronous=NORMAL')
+            self._local.db = db
+        return db
+
+    def _count(self, stat):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def get(self, key):
+        """
+        Return the JSON document stored at `key`, a tuple of
+        (region, locale, kind, id), as bytes, or None if it is not stored.
+
+        """
+        row = self._db().execute(
+            'SELECT json, stored_at FROM documents WHERE region = ? AND '
+            'locale = ? AND kind = ? AND id = ?',
+            [str(k) for k in key]).fetchone()
+        if row is None or (self.max_age is not None and
+                           time.time() - row[1] > self.max_age):
+            self._count('misses')
+            return None
+        self._count('hits')
+        return row[0]
+
+    def put(self, key, data):
+        """
+        Store the JSON document `data`, as bytes, at `key`.
+
+        The bytes are kept as they are, without being encoded again.
+
+        """
+        db = self._db()
+        with db:
+            # Columns are named, so stores created with a last_modified
+            # column can still be written
+            db.execute('INSERT OR REPLACE INTO documents '
+                       '(region, locale, kind, id, json, stored_at) '
+                       'VALUES (?, ?, ?, ?, ?, ?)',
+                       [str(k) for k in key] + [bytes(data), time.time()])
+        self._count('writes')
+
+    def clear(self):
+        """Remove every document from the store."""
+        db = self._db()
+        with db:
+            db.execute('DELETE FROM documents')
+
+    def close(self):
+        """Close this thread's connection to the database."""
+        db = getattr(self._local, 'db', None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+    def __len__(self):
+        return self._db().execute(
+            'SELECT COUNT(*) FROM documents').fetchone()[0]
+
+    @property
+    def stats(self):
+        """
+        Return a dictionary of store statistics with the following fields:
+
+        hits -- the number of documents read from the store
+        misses -- the number of documents not found, or found too old
+        writes -- the number of documents stored
+
+        """
+        with self._lock:
+            return dict(self._stats)
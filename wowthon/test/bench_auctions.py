@@ -0,0 +1,151 @@
+#! /usr/bin/env python
+'''
+Compares the time taken and peak memory used to read every auction of a
+large realm from `wowthon.FakeBattleNet`, with the whole dump loaded at once
+and with `stream=True`.
+
+It then compares building a list of Auction objects against building an
+`wowthon.AuctionColumns`, by time taken and by the memory still held once
+it is built.
+
+Finally it compares reading a saved dump back, by parsing its JSON, with
+opening a snapshot saved by `wowthon.AuctionListings.save_binary`.
+
+The server runs in another process so that only the client's memory is
+measured.
+
+Usage: bench_auctions.py [auctions per house]
+'''
+
+import sys
+import os
+import time
+import tempfile
+import tracemalloc
+import multiprocessing
+import wowthon
+from wowthon.fakeserver import FakeTransport
+from wowthon.auctions import _parse_dump
+
+def serve(auctions, address):
+    server = wowthon.FakeBattleNet(auctions=auctions).start()
+    address.put(server.address)
+    # Build the dump before anything is timed
+    server.auction_snapshot('eu', 'draenor')
+    address.put(None)
+    while True:
+        time.sleep(60)
+
+def measure(api, stream, memory):
+    """Return a tuple (seconds taken, peak memory in bytes or None)."""
+    if memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    listings = wowthon.AuctionListings(api, stream=stream)
+    count = 0
+    for auction in listings.all_auctions():
+        count += 1
+    took = time.perf_counter() - start
+    peak = None
+    if memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return took, peak
+
+def build(api, columns, memory):
+    """
+    Return a tuple (seconds taken, bytes retained or None) for building
+    every auction as objects, or as columns.
+
+    """
+    if memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    listings = wowthon.AuctionListings(api)
+    if columns:
+        result = listings.to_columns()
+    else:
+        result = listings.all_auctions()
+    took = time.perf_counter() - start
+    retained = None
+    if memory:
+        retained = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+    del result, listings
+    return took, retained
+
+def reopen(api):
+    """
+    Return a list of (method, seconds taken) for reading the auctions back
+    from a saved dump and from a binary snapshot.
+
+    """
+    listings = wowthon.AuctionListings(api)
+    item = listings.to_columns().item[0]
+    url = listings._json_property('files')[0]['url']
+    ret = []
+    with tempfile.TemporaryDirectory() as dir:
+        dump = os.path.join(dir, 'auctions.json')
+        with open(dump, 'wb') as f:
+            for chunk in api._stream(url):
+                f.write(chunk)
+        binary = os.path.join(dir, 'auctions.bin')
+        listings.save_binary(binary)
+
+        start = time.perf_counter()
+        with open(dump, 'rb') as f:
+            api._decode_json(f.read())
+        ret.append(('load JSON', time.perf_counter() - start))
+
+        start = time.perf_counter()
+        columns = wowthon.AuctionColumns(api)
+        with open(dump, 'rb') as f:
+            for house, auction in _parse_dump(iter(lambda: f.read(65536),
+                                                   b'')):
+                if house in wowthon.AuctionListings.AUCTION_HOUSES:
+                    columns.append(house, auction)
+        columns.cheapest(item)
+        ret.append(('JSON to columns, query', time.perf_counter() - start))
+
+        start = time.perf_counter()
+        saved = wowthon.AuctionListings.open_binary(api, binary)
+        ret.append(('open binary', time.perf_counter() - start))
+        saved.cheapest(item)
+        ret.append(('open binary, query', time.perf_counter() - start))
+        del saved
+    return ret
+
+def main(auctions):
+    address = multiprocessing.Queue()
+    server = multiprocessing.Process(target=serve, args=(auctions, address))
+    server.daemon = True
+    server.start()
+    transport = FakeTransport(address.get(), wowthon.ConnectionPool())
+    address.get()
+    api = wowthon.WoWAPI('Draenor', 'eu', transport=transport)
+
+    print('{} auctions per house'.format(auctions))
+    print('{:<10} {:>10} {:>12}'.format('mode', 'time (s)', 'peak (MB)'))
+    for stream in [False, True]:
+        took = measure(api, stream, False)[0]
+        peak = measure(api, stream, True)[1]
+        print('{:<10} {:>10.3f} {:>12.1f}'.format(
+            'stream' if stream else 'whole', took, peak / 2**20))
+    print()
+    print('{:<10} {:>10} {:>12}'.format('build', 'time (s)', 'held (MB)'))
+    for columns in [False, True]:
+        took = build(api, columns, False)[0]
+        retained = build(api, columns, True)[1]
+        print('{:<10} {:>10.3f} {:>12.1f}'.format(
+            'columns' if columns else 'objects', took, retained / 2**20))
+    print()
+    print('{:<24} {:>12}'.format('reopen', 'time (ms)'))
+    for method, took in reopen(api):
+        print('{:<24} {:>12.3f}'.format(method, took * 1000))
+    server.terminate()
+
+if __name__ == '__main__':
+    auctions = 30000
+    if len(sys.argv) > 1:
+        auctions = int(sys.argv[1])
+    main(auctions)
@@ -0,0 +1,91 @@
+#! /usr/bin/env python
+'''
+Compares reading the auction houses of many realms from
+`wowthon.FakeBattleNet` one at a time, as `Realm.auctions` does, with
+`wowthon.AuctionHarvester`, and prints the harvester's timing for each
+realm.
+
+The server runs in another process, with a delay on every response, so
+that it does not compete with the client for the interpreter.
+
+Usage: bench_harvest.py [realms] [auctions per house] [processes]
+'''
+
+import sys
+import os
+import time
+import multiprocessing
+import wowthon
+from wowthon.fakeserver import FakeTransport
+
+REALMS = [('eu', 'Draenor'), ('us', 'Stormrage'), ('eu', 'Silvermoon'),
+          ('us', 'Illidan'), ('eu', 'Ravencrest'), ('us', 'Area 52'),
+          ('eu', 'Kazzak'), ('us', 'Tichondrius'), ('eu', 'Outland'),
+          ('us', 'Sargeras'), ('eu', 'Twisting Nether'), ('us', 'Mal\'Ganis')]
+
+def serve(auctions, realms, address):
+    server = wowthon.FakeBattleNet(auctions=auctions, latency=0.2).start()
+    address.put(server.address)
+    # Build the dumps before anything is timed
+    for region, realm in realms:
+        server._auction_dump(region, wowthon.WoWAPI.realm_name_to_slug(realm))
+    address.put(None)
+    while True:
+        time.sleep(60)
+
+def serial(transport, realms):
+    for region, realm in realms:
+        api = wowthon.WoWAPI(realm, region, transport=transport)
+        api.get_realm()[0].auctions.market_stats()
+
+def main(count, auctions, processes):
+    realms = (REALMS * (count // len(REALMS) + 1))[:count]
+    address = multiprocessing.Queue()
+    server = multiprocessing.Process(target=serve,
+                                     args=(auctions, realms, address))
+    server.daemon = True
+    server.start()
+    transport = FakeTransport(address.get(), wowthon.ConnectionPool())
+    address.get()
+
+    start = time.perf_counter()
+    serial(transport, realms)
+    took_serial = time.perf_counter() - start
+
+    with wowthon.AuctionHarvester(processes, transport=transport) \
+            as harvester:
+        # Start the worker processes before timing
+        harvester.harvest(realms[:1])
+        harvester.dump_cache.clear()
+        start = time.perf_counter()
+        results = harvester.harvest(realms)
+        took = time.perf_counter() - start
+    server.terminate()
+
+    print('{} realms, {} auctions per house, {} processes'.format(
+        count, auctions, processes or os.cpu_count()))
+    print('{:<24} {:>12} {:>10} {:>10} {:>10}'.format(
+        'realm', 'download (s)', 'wait (s)', 'parse (s)', 'size (MB)'))
+    for (region, realm), result in results.items():
+        if result['error']:
+            print('{:<24} {!r}'.format(region + '-' + realm, result['error']))
+            continue
+        print('{:<24} {:>12.3f} {:>10.3f} {:>10.3f} {:>10.1f}'.format(
+            region + '-' + realm, result['download_time'],
+            result['wait_time'], result['parse_time'],
+            result['bytes'] / 2**20))
+    print()
+    print('one at a time   {:>8.3f} s'.format(took_serial))
+    print('harvester       {:>8.3f} s'.format(took))
+
+if __name__ == '__main__':
+    count = 12
+    auctions = 10000
+    processes = None
+    if len(sys.argv) > 1:
+        count = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        auctions = int(sys.argv[2])
+    if len(sys.argv) > 3:
+        processes = int(sys.argv[3])
+    main(count, auctions, processes)
@@ -0,0 +1,64 @@
+#! /usr/bin/env python
+'''
+Measures `wowthon.PriceHistory`: the time taken to append an hourly snapshot
+of a large realm, the size the history grows by, and the time taken to read
+an item's history back.
+
+Usage: bench_history.py [auctions per house] [snapshots]
+'''
+
+import sys
+import os
+import time
+import tempfile
+import wowthon
+
+def main(auctions, snapshots):
+    with wowthon.FakeBattleNet(auctions=auctions) as server:
+        api = wowthon.WoWAPI('Draenor', 'eu', transport=server.transport())
+        columns = wowthon.AuctionListings(api).to_columns()
+
+    with tempfile.TemporaryDirectory() as dir:
+        path = os.path.join(dir, 'draenor.hist')
+        history = wowthon.PriceHistory(path)
+        start = time.perf_counter()
+        history.append(columns, when=3600)
+        first = time.perf_counter() - start
+
+        # The same listings stand in for every later snapshot
+        start = time.perf_counter()
+        for i in range(2, snapshots + 1):
+            history.append(columns, when=i * 3600)
+        append = (time.perf_counter() - start) / (snapshots - 1)
+        size = os.path.getsize(path)
+
+        item = columns.item[0]
+        start = time.perf_counter()
+        prices = history.price_history(item)
+        query = time.perf_counter() - start
+        start = time.perf_counter()
+        history.price_history(item, since=(snapshots - 24) * 3600)
+        day = time.perf_counter() - start
+        history.close()
+
+    items = len(set(columns.item))
+    print('{} auctions per house, {} items, {} snapshots'.format(
+        auctions, items, snapshots))
+    print('first append (with indexes) {:>8.1f} ms'.format(first * 1000))
+    print('append                       {:>8.1f} ms'.format(append * 1000))
+    print('size per snapshot            {:>8.1f} KB'.format(
+        size / snapshots / 2**10))
+    print('size for a year              {:>8.1f} MB'.format(
+        size / snapshots * 24 * 365 / 2**20))
+    print('read {} records          {:>8.1f} ms'.format(
+        len(prices['time']), query * 1000))
+    print('read the last day            {:>8.1f} ms'.format(day * 1000))
+
+if __name__ == '__main__':
+    auctions = 30000
+    snapshots = 200
+    if len(sys.argv) > 1:
+        auctions = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        snapshots = int(sys.argv[2])
+    main(auctions, snapshots)
@@ -0,0 +1,58 @@
+#! /usr/bin/env python
+'''
+Compares the time taken and peak memory used to decode a large auction dump
+from `wowthon.FakeBattleNet` with each installed JSON backend, against
+decoding the body to a string first as was done before.
+
+Usage: bench_json.py [auctions per house]
+'''
+
+import sys
+import time
+import tracemalloc
+import json as jsonlib
+import wowthon
+
+RUNS = 3
+
+def via_str(data):
+    return jsonlib.loads(str(data, 'UTF-8'))
+
+def measure(decode, data):
+    """Return a tuple (best time in seconds, peak memory in bytes)."""
+    best = None
+    for i in range(RUNS):
+        start = time.perf_counter()
+        decode(data)
+        took = time.perf_counter() - start
+        if best is None or took < best:
+            best = took
+    tracemalloc.start()
+    decode(data)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+def main(auctions):
+    server = wowthon.FakeBattleNet(auctions=auctions)
+    dump = server.auction_snapshot('eu', 'draenor')
+    data = bytes(jsonlib.dumps(dump), 'UTF-8')
+    print('Auction dump: {} auctions, {:.1f} MB'.format(
+        auctions * len(wowthon.AuctionListings.AUCTION_HOUSES),
+        len(data) / 2**20))
+
+    decoders = [('json via str', via_str)]
+    for backend in reversed(wowthon.WoWAPI.available_json_backends()):
+        api = wowthon.WoWAPI('Draenor', 'eu', json_backend=backend)
+        decoders.append((backend + ' from bytes', api._decode_json))
+
+    print('{:<20} {:>10} {:>12}'.format('decoder', 'time (s)', 'peak (MB)'))
+    for name, decode in decoders:
+        took, peak = measure(decode, data)
+        print('{:<20} {:>10.3f} {:>12.1f}'.format(name, took, peak / 2**20))
+
+if __name__ == '__main__':
+    auctions = 30000
+    if len(sys.argv) > 1:
+        auctions = int(sys.argv[1])
+    main(auctions)
@@ -0,0 +1,85 @@
+#! /usr/bin/env python
+'''
+Compares `wowthon.AuctionListings.market_stats` with a loop over the
+properties of every Auction computing the same statistics, on a large realm
+from `wowthon.FakeBattleNet`.
+
+Usage: bench_market.py [auctions per house]
+'''
+
+import sys
+import time
+import wowthon
+
+PERCENTILES = [10, 25, 50, 75, 90]
+
+def weighted(listed, p):
+    """Return the price at `p` percent of a sorted list of (price, count)."""
+    target = sum(q for u, q in listed) * p / 100
+    seen = 0
+    for unit, quantity in listed:
+        seen += quantity
+        if seen >= target:
+            return unit
+    return listed[-1][0]
+
+def loop(auctions):
+    """Return a dictionary of item id -> statistics."""
+    grouped = {}
+    for auction in auctions:
+        if auction.buyout:
+            grouped.setdefault(auction._json['item'], []).append(
+                (auction.buyout / auction.quantity, auction.quantity,
+                 auction.buyout))
+    ret = {}
+    for item, listed in grouped.items():
+        listed.sort()
+        pairs = [(u, q) for u, q, b in listed]
+        row = dict(('p' + str(p), weighted(pairs, p)) for p in PERCENTILES)
+        low = weighted(pairs, 25)
+        high = weighted(pairs, 75)
+        spread = (high - low) * 1.5
+        kept = [(u, q) for u, q in pairs
+                if low - spread <= u <= high + spread]
+        row['trimmed_median'] = weighted(kept, 50)
+        row['mean'] = sum(b for u, q, b in listed) / \
+                      sum(q for u, q, b in listed)
+        ret[item] = row
+    return ret
+
+def main(auctions):
+    with wowthon.FakeBattleNet(auctions=auctions) as server:
+        api = wowthon.WoWAPI('Draenor', 'eu', transport=server.transport())
+        listings = wowthon.AuctionListings(api)
+        objects = listings.all_auctions()
+        columns = listings.to_columns()
+        api.transport.clear()
+
+    start = time.perf_counter()
+    expected = loop(objects)
+    took_loop = time.perf_counter() - start
+
+    start = time.perf_counter()
+    columns.market_stats(PERCENTILES)
+    took_first = time.perf_counter() - start
+    start = time.perf_counter()
+    stats = columns.market_stats(PERCENTILES)
+    took_stats = time.perf_counter() - start
+
+    for item, row in expected.items():
+        found = stats.get(item)
+        assert abs(found['trimmed_median'] - row['trimmed_median']) < 1e-6
+        assert abs(found['p90'] - row['p90']) < 1e-6
+
+    print('{} auctions per house, {} items'.format(auctions, len(stats)))
+    print('{:<26} {:>10}'.format('method', 'time (s)'))
+    print('{:<26} {:>10.3f}'.format('property loop', took_loop))
+    print('{:<26} {:>10.3f}'.format('market_stats, new indexes',
+                                    took_first))
+    print('{:<26} {:>10.3f}'.format('market_stats', took_stats))
+
+if __name__ == '__main__':
+    auctions = 30000
+    if len(sys.argv) > 1:
+        auctions = int(sys.argv[1])
+    main(auctions)
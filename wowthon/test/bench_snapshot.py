@@ -0,0 +1,57 @@
+#! /usr/bin/env python
+'''
+Times `wowthon.WoWAPI.save_cache` and `wowthon.WoWAPI.load_cache` on a cache
+of characters with every field, generated by `wowthon.FakeBattleNet`
+without any requests being made.
+
+Usage: bench_snapshot.py [characters]
+'''
+
+import sys
+import os
+import time
+import tempfile
+import wowthon
+
+FIELDS = ['guild', 'titles', 'stats', 'talents', 'pvp', 'professions',
+          'appearance', 'mounts', 'companions', 'quests', 'achievements',
+          'progression', 'reputation', 'feed', 'items']
+
+def main(count):
+    server = wowthon.FakeBattleNet()
+    api = wowthon.WoWAPI('Draenor', 'eu', cache=wowthon.Cache(None))
+    start = time.perf_counter()
+    made = 0
+    i = 0
+    while made < count:
+        name = 'Char' + str(i)
+        i += 1
+        code, json = server.character('eu', 'draenor', name, FIELDS)
+        if code != 200:
+            continue
+        api.get_char(name, initial_fields=list(FIELDS), json=json)
+        made += 1
+    print('Generated {} characters in {:.1f}s'.format(
+        count, time.perf_counter() - start))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'cache.bin')
+        start = time.perf_counter()
+        api.save_cache(path)
+        print('save_cache: {:.2f}s, {:.1f} MB'.format(
+            time.perf_counter() - start, os.path.getsize(path) / 2**20))
+
+        other = wowthon.WoWAPI('Draenor', 'eu')
+        start = time.perf_counter()
+        other.load_cache(path)
+        print('load_cache: {:.3f}s'.format(time.perf_counter() - start))
+
+        start = time.perf_counter()
+        other.get_char('Char' + str(i - 1)).level
+        print('first lookup: {:.5f}s'.format(time.perf_counter() - start))
+
+if __name__ == '__main__':
+    count = 20000
+    if len(sys.argv) > 1:
+        count = int(sys.argv[1])
+    main(count)
@@ -0,0 +1,73 @@
+#! /usr/bin/env python
+'''
+Unit tests for `wowthon.AsyncWoWAPI` and awaiting `fetch` on entities,
+loading from `wowthon.FakeBattleNet`.
+'''
+
+import unittest
+import asyncio
+import wowthon
+
+class AsyncWoWAPITest(unittest.TestCase):
+    def setUp(self):
+        self.server = wowthon.FakeBattleNet().start()
+        api = wowthon.WoWAPI('Draenor', 'eu', thread_safe=True,
+                             transport=self.server.transport())
+        self.api = wowthon.AsyncWoWAPI('Draenor', 'eu', concurrency=4,
+                                       api=api)
+
+    def tearDown(self):
+        self.api.close()
+        self.api.transport.clear()
+        self.server.stop()
+
+    def missing_char(self):
+        """Return the name of a character the server has no page for."""
+        for i in range(100):
+            name = 'Char' + str(i)
+            if self.server.character('eu', 'draenor', name)[0] == 404:
+                return name
+
+    def testGather(self):
+        async def load():
+            return await asyncio.gather(self.api.get_char('Untamedbush'),
+                                        self.api.get_item(71086),
+                                        self.api.get_realm())
+        requests = self.server.stats['requests']
+        char, item, realms = asyncio.run(load())
+        self.assertEqual(self.server.stats['requests'] - requests, 3)
+        # Everything is already downloaded
+        self.assertEqual(char.name, 'Untamedbush')
+        self.assertEqual(item.name, self.server.item(71086)['name'])
+        self.assertEqual(realms[0].name, 'Draenor')
+        self.assertEqual(self.server.stats['requests'] - requests, 3)
+        self.assertTrue(self.api.api.get_item(71086) is item)
+
+    def testError(self):
+        async def load(name):
+            return await self.api.get_char(name)
+        with self.assertRaises(wowthon.APIError) as cm:
+            asyncio.run(load(self.missing_char()))
+        self.assertEqual(cm.exception.code, 404)
+
+    def testFetch(self):
+        api = self.api.api
+        char = api.get_char('Untamedbush')
+        item = api.get_item(71086)
+        async def load():
+            return await asyncio.gather(char.fetch(), item.fetch())
+        requests = self.server.stats['requests']
+        self.assertEqual(asyncio.run(load()), [char, item])
+        self.assertEqual(self.server.stats['requests'] - requests, 2)
+        self.assertEqual(char.level,
+                         self.server.character('eu', 'draenor',
+                                               'Untamedbush')[1]['level'])
+
+    def testFetchError(self):
+        char = self.api.api.get_char(self.missing_char())
+        async def load():
+            return await char.fetch()
+        self.assertRaises(wowthon.APIError, asyncio.run, load())
+
+if __name__ == '__main__':
+    unittest.main()
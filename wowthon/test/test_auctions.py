@@ -0,0 +1,364 @@
+#! /usr/bin/env python
+'''
+Unit tests for `wowthon.AuctionListings`, run against
+`wowthon.FakeBattleNet`.
+'''
+
+import unittest
+import os
+import math
+import tempfile
+import json as jsonlib
+import wowthon
+from wowthon.auctions import _parse_dump
+
+class AuctionTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = wowthon.FakeBattleNet(auctions=200).start()
+        self.api = wowthon.WoWAPI('Draenor', 'eu',
+                                  transport=self.server.transport())
+
+    def tearDown(self):
+        self.api.transport.clear()
+        self.server.stop()
+
+class StreamTest(AuctionTestCase):
+    def testSameAsWhole(self):
+        whole = wowthon.AuctionListings(self.api)
+        stream = wowthon.AuctionListings(self.api, stream=True)
+        for ah in wowthon.AuctionListings.AUCTION_HOUSES:
+            self.assertEqual([a.id for a in stream.auctions(ah)],
+                             [a.id for a in whole.auctions(ah)])
+        self.assertEqual(len(list(stream.all_auctions())), 600)
+
+    def testSmallPieces(self):
+        dump = self.server.auction_snapshot('eu', 'draenor')
+        dump['realm']['name'] = 'Aggra (Português)'
+        data = bytes(jsonlib.dumps(dump, indent=1, ensure_ascii=False),
+                     'UTF-8')
+        parsed = list(_parse_dump(data[i:i + 7]
+                                  for i in range(0, len(data), 7)))
+        self.assertEqual(parsed[0], ('realm', dump['realm']))
+        self.assertEqual([a for ah, a in parsed if ah == 'horde'],
+                         dump['horde']['auctions'])
+        self.assertEqual(len(parsed), 601)
+
+    def testEmptyHouse(self):
+        data = b'{"alliance":{"auctions":[]},"horde":{"auctions":[1, 2]}}'
+        self.assertEqual(list(_parse_dump([data])),
+                         [('horde', 1), ('horde', 2)])
+
+    def testTruncated(self):
+        data = b'{"alliance":{"auctions":[{"auc":1},{"auc":'
+        self.assertRaises(ValueError, list, _parse_dump([data]))
+
+class ColumnsTest(AuctionTestCase):
+    def testSameAsObjects(self):
+        auctions = wowthon.AuctionListings(self.api).all_auctions()
+        columns = wowthon.AuctionListings(self.api).to_columns()
+        self.assertEqual(len(columns), 600)
+        self.assertEqual([c._json for c in columns],
+                         [a._json for a in auctions])
+        self.assertEqual(columns[-1].id, auctions[-1].id)
+        self.assertEqual(columns.house_of(0), 'alliance')
+        self.assertEqual(columns.house_of(599), 'neutral')
+        self.assertRaises(IndexError, columns.__getitem__, 600)
+
+    def testFromLoadedDump(self):
+        listings = wowthon.AuctionListings(self.api)
+        listings.auctions('horde')
+        requests = self.server.stats['requests']
+        columns = listings.to_columns()
+        self.assertEqual(self.server.stats['requests'], requests)
+        self.assertEqual(len(columns), 600)
+        self.assertTrue(listings.to_columns() is columns)
+
+    def testInterning(self):
+        columns = wowthon.AuctionColumns(self.api)
+        auction = {'auc' : 1, 'item' : 25, 'owner' : 'Bob', 'bid' : 10,
+                   'buyout' : 0, 'quantity' : 1, 'timeLeft' : 'SHORT'}
+        columns.append('horde', auction)
+        columns.append('horde', dict(auction, auc=2, timeLeft='MEDIUM'))
+        self.assertEqual(columns.owners, ['Bob'])
+        self.assertEqual(list(columns.owner), [0, 0])
+        self.assertEqual(columns.row(1)['timeLeft'], 'MEDIUM')
+        self.assertEqual(columns[0].time_left, 'SHORT')
+
+class IndexTest(AuctionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.listings = wowthon.AuctionListings(self.api)
+        self.auctions = [a._json for a in self.listings.all_auctions()]
+        self.item = self.auctions[0]['item']
+
+    def unit(self, auction):
+        return auction['buyout'] / auction['quantity']
+
+    def scan(self, item):
+        return sorted((a for a in self.auctions
+                       if a['item'] == item and a['buyout']),
+                      key=lambda a: (self.unit(a), a['auc']))
+
+    def testCheapest(self):
+        expected = self.scan(self.item)
+        cheapest = self.listings.cheapest(self.item, 3)
+        self.assertEqual([a._json for a in cheapest], expected[:3])
+        self.assertEqual(self.listings.cheapest(1), [])
+
+    def testByOwner(self):
+        owner = self.auctions[5]['owner']
+        self.assertEqual([a._json for a in self.listings.by_owner(owner)],
+                         [a for a in self.auctions if a['owner'] == owner])
+        self.assertEqual(self.listings.by_owner('Nobody'), [])
+
+    def testPriceRange(self):
+        expected = self.scan(self.item)
+        lo = self.unit(expected[0])
+        hi = self.unit(expected[len(expected) // 2])
+        found = self.listings.in_price_range(self.item, lo, hi)
+        self.assertEqual([a._json for a in found],
+                         [a for a in expected if lo <= self.unit(a) <= hi])
+        self.assertEqual(len(self.listings.in_price_range(self.item)),
+                         len(expected))
+        self.assertEqual(self.listings.in_price_range(self.item, hi=0), [])
+
+    def testBuiltOnce(self):
+        columns = self.listings.to_columns()
+        self.listings.cheapest(self.item)
+        items = columns._items
+        self.listings.by_owner(self.auctions[0]['owner'])
+        self.assertTrue(columns._items is items)
+        columns.append('horde', self.auctions[0])
+        self.assertTrue(columns._items is None)
+
+class MarketStatsTest(AuctionTestCase):
+    def percentile(self, units, p):
+        # Nearest rank over every item listed
+        rank = max(math.ceil(len(units) * p / 100), 1)
+        return units[rank - 1]
+
+    def testAgainstLoop(self):
+        listings = wowthon.AuctionListings(self.api)
+        listed = {}
+        for auction in listings.all_auctions():
+            if auction.buyout:
+                listed.setdefault(auction._json['item'], []).append(
+                    (auction.buyout, auction.quantity))
+        stats = listings.market_stats()
+        self.assertEqual(list(stats.item), sorted(listed))
+        for item, auctions in listed.items():
+            units = sorted(b / q for b, q in auctions
+                           for i in range(q))
+            row = stats.get(item)
+            self.assertEqual(row['auctions'], len(auctions))
+            self.assertEqual(row['quantity'], len(units))
+            self.assertAlmostEqual(row['mean'],
+                                   sum(b for b, q in auctions) / len(units))
+            for p in [10, 25, 50, 75, 90]:
+                self.assertEqual(row['p' + str(p)],
+                                 self.percentile(units, p))
+        self.assertEqual(stats.get(1), None)
+
+    def testOutliers(self):
+        columns = wowthon.AuctionColumns(self.api)
+        auction = {'auc' : 1, 'item' : 25, 'owner' : 'Bob', 'bid' : 10,
+                   'buyout' : 100, 'quantity' : 1, 'timeLeft' : 'SHORT'}
+        for i, buyout in enumerate([90, 100, 100, 110, 120, 5000, 2]):
+            columns.append('horde', dict(auction, auc=i, buyout=buyout))
+        row = columns.market_stats(percentiles=[50]).get(25)
+        self.assertEqual(row['outliers'], 2)
+        self.assertEqual(row['trimmed_median'], 100)
+        self.assertEqual(row['p50'], 100)
+        self.assertEqual(len(row), 7)
+
+class DiffTest(AuctionTestCase):
+    def testNextSnapshot(self):
+        before = wowthon.AuctionListings(self.api)
+        old = dict((a.id, a._json) for a in before.to_columns())
+        self.server.next_snapshot('draenor')
+        after = wowthon.AuctionListings(self.api)
+        new = dict((a.id, a._json) for a in after.to_columns())
+
+        diff = after.diff(before)
+        self.assertEqual([a.id for a in diff.new_auctions()],
+                         sorted(set(new) - set(old)))
+        self.assertEqual([a.id for a in diff.removed_auctions()],
+                         sorted(set(old) - set(new)))
+        changed = sorted(i for i in set(old) & set(new)
+                         if old[i]['bid'] != new[i]['bid'])
+        self.assertTrue(changed)
+        for (was, now), auc in zip(diff.changed_auctions(), changed):
+            self.assertEqual(was.id, auc)
+            self.assertEqual(now.id, auc)
+            self.assertEqual(was.bid, old[auc]['bid'])
+            self.assertEqual(now.bid, new[auc]['bid'])
+        self.assertEqual(diff.counts['changed'], len(changed))
+
+    def testEarlierListingsNotRefreshed(self):
+        self.api.max_age = 0
+        before = wowthon.AuctionListings(self.api)
+        old = set(a.id for a in before.to_columns())
+        self.server.next_snapshot('draenor')
+        after = wowthon.AuctionListings(self.api)
+        new = set(a.id for a in after.to_columns())
+        diff = after.diff(before)
+        self.assertTrue(old - new)
+        self.assertEqual(diff.counts['new'], len(new - old))
+        self.assertEqual(diff.counts['removed'], len(old - new))
+
+    def testSameSnapshot(self):
+        listings = wowthon.AuctionListings(self.api)
+        diff = listings.diff(listings.to_columns())
+        self.assertEqual(diff.counts, {'new' : 0, 'removed' : 0,
+                                       'changed' : 0})
+
+class RefreshTest(AuctionTestCase):
+    def testUnchangedNotDownloaded(self):
+        listings = wowthon.AuctionListings(self.api)
+        columns = listings.to_columns()
+        requests = self.server.stats['requests']
+        self.assertFalse(listings.refresh())
+        # Only the index is downloaded again
+        self.assertEqual(self.server.stats['requests'], requests + 1)
+        self.assertTrue(listings.to_columns() is columns)
+
+    def testNewDump(self):
+        listings = wowthon.AuctionListings(self.api)
+        auctions = listings.auctions('horde')
+        modified = listings.dump_modified
+        self.server.next_snapshot('draenor')
+        self.assertTrue(listings.refresh())
+        self.assertNotEqual([a.id for a in listings.auctions('horde')],
+                            [a.id for a in auctions])
+        self.assertEqual(listings.dump_modified, modified + 3600000)
+        self.assertFalse(listings.refresh())
+
+    def testStreamRemembersDump(self):
+        listings = wowthon.AuctionListings(self.api, stream=True)
+        self.assertEqual(listings.dump_modified, None)
+        self.assertEqual(len(list(listings.all_auctions())), 600)
+        self.assertFalse(listings.refresh())
+
+    def testStreamNewDumpClearsListings(self):
+        listings = wowthon.AuctionListings(self.api)
+        columns = listings.to_columns()
+        self.server.next_snapshot('draenor')
+        listings._fetch(force=True)
+        streamed = [a.id for a in listings.iter_auctions()]
+        # What was read from the old dump is not kept as the new one's
+        self.assertFalse(listings.to_columns() is columns)
+        self.assertEqual([a.id for a in listings.all_auctions()], streamed)
+
+class DumpCacheTest(AuctionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.dir = tempfile.TemporaryDirectory()
+        self.api.dump_cache = wowthon.DumpCache(self.dir.name, keep=1)
+
+    def tearDown(self):
+        super().tearDown()
+        self.dir.cleanup()
+
+    def testSharedBetweenListings(self):
+        whole = wowthon.AuctionListings(self.api).all_auctions()
+        self.assertEqual(len(self.api.dump_cache), 1)
+        requests = self.server.stats['requests']
+        # Every way of reading the dump uses the saved copy
+        columns = wowthon.AuctionListings(self.api).to_columns()
+        stream = wowthon.AuctionListings(self.api, stream=True)
+        self.assertEqual([a.id for a in stream.all_auctions()],
+                         [a.id for a in whole])
+        self.assertEqual([a.id for a in columns], [a.id for a in whole])
+        self.assertEqual(self.server.stats['requests'], requests + 2)
+        self.assertEqual(self.api.dump_cache.stats,
+                         {'hits' : 2, 'misses' : 1, 'writes' : 1})
+
+    def testOldDumpsDeleted(self):
+        listings = wowthon.AuctionListings(self.api)
+        listings.to_columns()
+        self.server.next_snapshot('draenor')
+        listings.refresh()
+        listings.to_columns()
+        self.assertEqual(len(self.api.dump_cache), 1)
+        self.assertEqual(os.listdir(self.dir.name),
+                         ['eu-draenor-' + str(listings.dump_modified) +
+                          '.json'])
+
+    def testPartialDumpNotSaved(self):
+        stream = wowthon.AuctionListings(self.api, stream=True)
+        auctions = stream.all_auctions()
+        next(auctions)
+        auctions.close()
+        self.assertEqual(os.listdir(self.dir.name), [])
+        self.assertEqual(stream.dump_modified, None)
+
+class BinaryTest(AuctionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'draenor.auctions')
+        self.listings = wowthon.AuctionListings(self.api)
+        self.listings.to_columns()
+        self.listings.save_binary(self.path)
+
+    def tearDown(self):
+        super().tearDown()
+        self.dir.cleanup()
+
+    def testRoundTrip(self):
+        expected = dict((ah, [a._json for a in self.listings.auctions(ah)])
+                        for ah in wowthon.AuctionListings.AUCTION_HOUSES)
+        requests = self.server.stats['requests']
+        saved = wowthon.AuctionListings.open_binary(self.api, self.path)
+        for ah in wowthon.AuctionListings.AUCTION_HOUSES:
+            self.assertEqual([a._json for a in saved.auctions(ah)],
+                             expected[ah])
+        self.assertEqual(len(saved.all_auctions()), 600)
+        self.assertEqual(saved.dump_modified, self.listings.dump_modified)
+        self.assertFalse(saved.refresh())
+        self.assertEqual(self.server.stats['requests'], requests)
+
+    def testQueries(self):
+        saved = wowthon.AuctionListings.open_binary(self.api, self.path)
+        columns = saved.to_columns()
+        item = columns.item[0]
+        self.assertEqual([a.id for a in saved.cheapest(item, 3)],
+                         [a.id for a in self.listings.cheapest(item, 3)])
+        self.assertEqual([a.id for a in saved.in_price_range(item, hi=1e9)],
+                         [a.id for a in self.listings.in_price_range(item)])
+        self.assertEqual(saved.market_stats().mean,
+                         self.listings.market_stats().mean)
+        owner = columns.owners[columns.owner[0]]
+        self.assertEqual([a.id for a in saved.by_owner(owner)],
+                         [a.id for a in self.listings.by_owner(owner)])
+        self.assertEqual(saved.diff(self.listings).counts['new'], 0)
+
+    def testSavedIndexKept(self):
+        columns = wowthon.AuctionColumns.open(self.api, self.path)
+        index = columns._items
+        owner = columns.owners[columns.owner[0]]
+        self.assertTrue(columns.by_owner(owner))
+        self.assertTrue(columns.item_totals())
+        self.assertTrue(columns._items is index)
+
+    def testResave(self):
+        saved = wowthon.AuctionListings.open_binary(self.api, self.path)
+        path = self.path + '.copy'
+        saved.save_binary(path)
+        copy = wowthon.AuctionListings.open_binary(self.api, path)
+        self.assertEqual([a._json for a in copy.all_auctions()],
+                         [a._json for a in self.listings.all_auctions()])
+
+    def testReadOnly(self):
+        columns = wowthon.AuctionColumns.open(self.api, self.path)
+        self.assertRaises(TypeError, columns.append, 'horde',
+                          columns.row(0))
+
+    def testNotSnapshot(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'{"files":[]}' * 4)
+        self.assertRaises(ValueError, wowthon.AuctionListings.open_binary,
+                          self.api, self.path)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,205 @@
+#! /usr/bin/env python
+'''
+Unit tests for `wowthon.Cache` and its use by `wowthon.WoWAPI`'s getters.
+'''
+
+import unittest
+import gc
+import os
+import tempfile
+import wowthon
+
+class Lazy:
+    # Stands in for an entity downloading its data after being cached
+    _json = None
+
+class CacheTest(unittest.TestCase):
+    def testLeastRecentlyUsedEvicted(self):
+        cache = wowthon.Cache(max_entries=2)
+        cache.set(('item', 1), 'a')
+        cache.set(('item', 2), 'b')
+        cache.get(('item', 1))
+        cache.set(('item', 3), 'c')
+        self.assertEqual(cache.get(('item', 2)), None)
+        self.assertEqual(cache.get(('item', 1)), 'a')
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.stats['evictions'], 1)
+
+    def testTtlPerKind(self):
+        cache = wowthon.Cache(ttls={'char' : 0})
+        cache.set(('char', 'eu', 'draenor', 'untamedbush'), 'char')
+        cache.set(('item', 1), 'item')
+        self.assertEqual(cache.get(('char', 'eu', 'draenor', 'untamedbush')),
+                         None)
+        self.assertEqual(cache.get(('item', 1)), 'item')
+        stats = cache.stats
+        self.assertEqual(stats['expired'], 1)
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['entries'], 1)
+
+    def testFalsyValuesCached(self):
+        cache = wowthon.Cache()
+        cache.set(('battlegroups', 'eu'), [])
+        self.assertEqual(cache.get(('battlegroups', 'eu')), [])
+
+class WeakCacheTest(unittest.TestCase):
+    def testIdentityKeptWhileReferenced(self):
+        cache = wowthon.Cache(max_entries=1, weak=True)
+        first = Lazy()
+        cache.set(('char', 'a'), first)
+        cache.set(('char', 'b'), Lazy())
+        self.assertEqual(len(cache), 1)
+        self.assertTrue(cache.get(('char', 'a')) is first)
+        self.assertEqual(cache.stats['weak_hits'], 1)
+
+    def testFreedOnceUnused(self):
+        cache = wowthon.Cache(max_entries=0, weak=True)
+        obj = Lazy()
+        cache.set(('char', 'a'), obj)
+        self.assertEqual(len(cache), 0)
+        self.assertTrue(cache.get(('char', 'a')) is obj)
+        del obj
+        gc.collect()
+        self.assertEqual(cache.get(('char', 'a')), None)
+        self.assertEqual(cache.stats['weak'], 0)
+
+    def testExpiredNotRevived(self):
+        cache = wowthon.Cache(max_entries=0, weak=True, ttls={'char' : 0})
+        obj = Lazy()
+        cache.set(('char', 'a'), obj)
+        self.assertEqual(cache.get(('char', 'a')), None)
+
+    def testRevivedMeasured(self):
+        cache = wowthon.Cache(max_bytes=5000, weak=True)
+        first = Lazy()
+        first._json = {'description' : 'x' * 3000}
+        second = Lazy()
+        second._json = {'description' : 'y' * 3000}
+        cache.set(('item', 1), first)
+        size = cache.stats['bytes']
+        cache.set(('item', 2), second)
+        self.assertEqual(len(cache), 1)
+        self.assertTrue(cache.get(('item', 1)) is first)
+        # The revived object is counted, and the other makes room for it
+        stats = cache.stats
+        self.assertEqual(stats['bytes'], size)
+        self.assertEqual(stats['entries'], 1)
+        self.assertEqual(stats['weak'], 1)
+
+    def testLists(self):
+        # Objects without weak reference support are evicted as normal
+        cache = wowthon.Cache(max_entries=1, weak=True)
+        cache.set(('races', 'eu'), [])
+        cache.set(('classes', 'eu'), [])
+        self.assertEqual(cache.get(('races', 'eu')), None)
+
+class WoWAPICacheTest(unittest.TestCase):
+    def testBounded(self):
+        api = wowthon.WoWAPI('Draenor', 'eu',
+                             cache=wowthon.Cache(max_entries=10))
+        items = [api.get_item(id) for id in range(20)]
+        self.assertEqual(api.cache_stats['entries'], 10)
+        self.assertTrue(api.get_item(19) is items[19])
+        self.assertFalse(api.get_item(0) is items[0])
+
+    def testIdentityMap(self):
+        api = wowthon.WoWAPI('Draenor', 'eu',
+                             cache=wowthon.Cache(max_entries=5, weak=True))
+        chars = [api.get_char('Char' + str(i)) for i in range(20)]
+        self.assertTrue(api.get_char('Char0') is chars[0])
+        self.assertEqual(api.cache_stats['weak'], 15)
+
+    def testUseCache(self):
+        api = wowthon.WoWAPI('Draenor', 'eu')
+        item = api.get_item(1, use_cache=False)
+        self.assertEqual(len(api.cache), 0)
+        self.assertFalse(api.get_item(1) is item)
+        self.assertTrue(api.get_item(1) is api.get_item(1))
+
+class ByteBudgetTest(unittest.TestCase):
+    def setUp(self):
+        self.server = wowthon.FakeBattleNet().start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def testFetchedDataCounted(self):
+        cache = wowthon.Cache(max_bytes=20000)
+        api = wowthon.WoWAPI('Draenor', 'eu', cache=cache,
+                             transport=self.server.transport())
+        items = api.get_items(range(1, 500))
+        stats = api.cache_stats
+        self.assertTrue(stats['evictions'] > 0)
+        self.assertTrue(stats['entries'] < 499)
+        self.assertTrue(0 < stats['bytes'] <= 20000)
+        # The most recently fetched items are the ones kept
+        self.assertTrue(api.get_item(499) is items[-1])
+        self.assertFalse(api.get_item(1) is items[0])
+
+    def testRefetchMeasured(self):
+        cache = wowthon.Cache(max_bytes=10**6)
+        api = wowthon.WoWAPI('Draenor', 'eu', cache=cache,
+                             transport=self.server.transport())
+        item = api.get_item(1)
+        self.assertTrue(api.cache_stats['bytes'] < 100)
+        item.name
+        size = api.cache_stats['bytes']
+        self.assertTrue(size > 1000)
+        item.force_update()
+        self.assertEqual(api.cache_stats['bytes'], size)
+
+class SnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'cache.bin')
+        self.server = wowthon.FakeBattleNet(guild_size=5).start()
+
+    def tearDown(self):
+        self.server.stop()
+        self.dir.cleanup()
+
+    def api(self):
+        return wowthon.WoWAPI('Draenor', 'eu',
+                              transport=self.server.transport())
+
+    def testRoundTrip(self):
+        api = self.api()
+        guild = api.get_guild('Delphae')
+        members = [char.name for rank, char in guild.members]
+        api.get_item(71086).name
+        api.get_item(1)
+        # Members, guild and the downloaded item, but not the lazy item
+        self.assertEqual(api.save_cache(self.path), 7)
+
+        other = self.api()
+        self.assertEqual(other.load_cache(self.path), 7)
+        requests = self.server.stats['requests']
+        guild = other.get_guild('Delphae')
+        self.assertEqual([char.name for rank, char in guild.members],
+                         members)
+        self.assertEqual(other.get_item(71086).name,
+                         self.server.item(71086)['name'])
+        self.assertEqual(self.server.stats['requests'], requests)
+        # Guilds remember the fields they were saved with
+        self.assertEqual(guild._fields, ['members'])
+        self.assertEqual(guild._last_modified, guild._json['lastModified'])
+
+    def testResave(self):
+        api = self.api()
+        api.get_item(1).name
+        api.get_item(2).name
+        api.save_cache(self.path)
+        other = self.api()
+        other.load_cache(self.path)
+        other.get_quest(5).title
+        # Saved objects not yet used are kept when saving again
+        self.assertEqual(other.save_cache(self.path), 3)
+
+    def testNotASnapshot(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'{}' * 20)
+        self.assertRaises(ValueError, self.api().load_cache, self.path)
+
+if __name__ == '__main__':
+    unittest.main()
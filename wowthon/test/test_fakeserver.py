@@ -0,0 +1,81 @@
+#! /usr/bin/env python
+'''
+Unit tests running the entity classes end to end against
+`wowthon.FakeBattleNet`.
+'''
+
+import unittest
+import wowthon
+
+class FakeBattleNetTestCase(unittest.TestCase):
+    #: Keyword arguments for the server
+    SERVER = {}
+
+    def setUp(self):
+        self.server = wowthon.FakeBattleNet(**self.SERVER).start()
+        self.api = wowthon.WoWAPI('Draenor', 'eu',
+                                  transport=self.server.transport(),
+                                  backoff=0)
+
+    def tearDown(self):
+        self.api.transport.clear()
+        self.server.stop()
+
+class EntityTest(FakeBattleNetTestCase):
+    SERVER = {'guild_size' : 10, 'auctions' : 20}
+
+    def testRealm(self):
+        realm = self.api.get_realm()[0]
+        self.assertEqual(realm.name, 'Draenor')
+        self.assertTrue(realm.type in wowthon.REALM_TYPES)
+
+    def testGuildMembers(self):
+        guild = self.api.get_guild('Delphae')
+        self.assertEqual(len(guild.members), 10)
+        rank, char = guild.members[0]
+        self.assertEqual(char.realm.name, 'Draenor')
+
+    def testDataIsDeterministic(self):
+        char = self.api.get_char('Untamedbush')
+        json = wowthon.FakeBattleNet().character('eu', 'draenor',
+                                                 'Untamedbush')[1]
+        self.assertEqual(char.level, json['level'])
+        self.assertEqual(char.race, json['race'])
+
+    def testItemQuestAchievement(self):
+        item = self.api.get_item(71086)
+        self.assertEqual(item.name, self.server.item(71086)['name'])
+        self.assertTrue(self.api.get_quest(5).title)
+        self.assertTrue(self.api.get_achieve(6).title)
+
+    def testMissingCharacter(self):
+        errors = {}
+        names = ['Char' + str(i) for i in range(40)]
+        chars = self.api.get_chars(names, errors=errors)
+        self.assertTrue(errors)
+        for name, error in errors.items():
+            self.assertEqual(error.code, 404)
+            self.assertEqual(chars[names.index(name)], None)
+
+    def testAuctionSnapshots(self):
+        auctions = wowthon.AuctionListings(self.api).all_auctions()
+        self.assertEqual(len(auctions), 60)
+        self.server.next_snapshot('draenor')
+        later = wowthon.AuctionListings(self.api).all_auctions()
+        self.assertEqual(len(later), 60)
+        # Most listings are still there after a snapshot
+        ids = set(a.id for a in auctions)
+        self.assertTrue(len([a for a in later if a.id in ids]) > 30)
+
+class ErrorInjectionTest(FakeBattleNetTestCase):
+    SERVER = {'error_rate' : 0.3, 'seed' : 1}
+
+    def testRetried(self):
+        items = self.api.get_items(range(1, 21))
+        self.assertTrue(all(items))
+        self.assertEqual(self.api.retry_stats['server_errors'],
+                         self.server.stats['errors'])
+        self.assertTrue(self.server.stats['errors'] > 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+#! /usr/bin/env python
+'''
+Unit tests for `wowthon.AuctionHarvester`, harvesting realms from
+`wowthon.FakeBattleNet`.
+'''
+
+import unittest
+import os
+import tempfile
+import wowthon
+
+class AuctionHarvesterTest(unittest.TestCase):
+    def setUp(self):
+        self.server = wowthon.FakeBattleNet(auctions=200).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def testSameAsListings(self):
+        realms = [('eu', 'Draenor'), ('us', 'Aggra (Português)')]
+        with wowthon.AuctionHarvester(processes=2, columns=True,
+                                      transport=self.server.transport()) \
+                as harvester:
+            results = harvester.harvest(realms)
+        self.assertEqual(list(results),
+                         [('eu', 'draenor'), ('us', 'aggra-portugues')])
+
+        for (region, realm), result in results.items():
+            self.assertEqual(result['error'], None)
+            api = wowthon.WoWAPI(realm, region,
+                                 transport=self.server.transport())
+            listings = wowthon.AuctionListings(api)
+            expected = listings.market_stats()
+            self.assertEqual(result['stats'].item, expected.item)
+            self.assertEqual(result['stats'].trimmed_median,
+                             expected.trimmed_median)
+            self.assertEqual(result['auctions'], 600)
+            self.assertEqual(result['columns'][0].id,
+                             listings.to_columns()[0].id)
+            for field in ['download_time', 'wait_time', 'parse_time']:
+                self.assertTrue(result[field] >= 0)
+
+    def testErrorsDoNotAbortHarvest(self):
+        with wowthon.AuctionHarvester(processes=1,
+                                      transport=self.server.transport()) \
+                as harvester:
+            results = harvester.harvest([('xx', 'Draenor'),
+                                         ('eu', 'Draenor')])
+        self.assertTrue(isinstance(results['xx', 'draenor']['error'],
+                                   KeyError))
+        self.assertEqual(results['eu', 'draenor']['error'], None)
+        self.assertEqual(results['eu', 'draenor']['columns'], None)
+
+    def testSavedDumpsReused(self):
+        with tempfile.TemporaryDirectory() as dir:
+            cache = wowthon.DumpCache(dir)
+            with wowthon.AuctionHarvester(processes=1, dump_cache=cache,
+                                          transport=self.server.transport()) \
+                    as harvester:
+                harvester.harvest([('eu', 'Draenor')])
+                sent = self.server.stats['bytes_sent']
+                harvester.harvest([('eu', 'Draenor')])
+            # Only the auction data index is downloaded again
+            self.assertTrue(self.server.stats['bytes_sent'] - sent < 1000)
+            self.assertEqual(len(os.listdir(dir)), 1)
+
+if __name__ == '__main__':
+    unittest.main()
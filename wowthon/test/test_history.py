@@ -0,0 +1,153 @@
+#! /usr/bin/env python
+'''
+Unit tests for `wowthon.PriceHistory`, recording snapshots from
+`wowthon.FakeBattleNet`.
+'''
+
+import unittest
+import os
+import math
+import statistics
+import tempfile
+import wowthon
+
+class PriceHistoryTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'draenor.hist')
+        self.server = wowthon.FakeBattleNet(auctions=200).start()
+        self.api = wowthon.WoWAPI('Draenor', 'eu',
+                                  transport=self.server.transport())
+
+    def tearDown(self):
+        self.api.transport.clear()
+        self.server.stop()
+        self.dir.cleanup()
+
+    def record(self, history, snapshots):
+        """Append `snapshots` snapshots, returning their columns."""
+        ret = []
+        for i in range(snapshots):
+            listings = wowthon.AuctionListings(self.api)
+            self.assertTrue(history.append(listings))
+            ret.append(listings.to_columns())
+            self.server.next_snapshot('draenor')
+        return ret
+
+    def testAggregates(self):
+        history = wowthon.PriceHistory(self.path)
+        columns = self.record(history, 3)
+        item = columns[0].item[0]
+        prices = history.price_history(item)
+        self.assertEqual(len(prices['time']), 3)
+        self.assertEqual(prices['time'][1] - prices['time'][0], 3600)
+
+        last = [columns[2].row(i) for i in range(len(columns[2]))
+                if columns[2].item[i] == item]
+        units = [a['buyout'] / a['quantity'] for a in last if a['buyout']]
+        self.assertEqual(prices['count'][2], len(last))
+        self.assertEqual(prices['quantity'][2],
+                         sum(a['quantity'] for a in last))
+        self.assertEqual(prices['min'][2], min(units))
+        # Weighted by quantity, as market statistics are
+        stats = columns[2].market_stats().get(item)
+        self.assertEqual(prices['median'][2], stats['p50'])
+        self.assertEqual(prices['mean'][2], stats['mean'])
+        history.close()
+
+    def testLargePricesExact(self):
+        columns = wowthon.AuctionColumns(self.api)
+        auction = {'auc' : 1, 'item' : 25, 'owner' : 'Bob', 'bid' : 10,
+                   'buyout' : 123456789012, 'quantity' : 1,
+                   'timeLeft' : 'SHORT'}
+        columns.append('horde', auction)
+        columns.append('horde', dict(auction, auc=2, buyout=200000001,
+                                     quantity=3))
+        history = wowthon.PriceHistory(self.path)
+        history.append(columns, when=1000)
+        prices = history.price_history(25)
+        self.assertEqual(prices['min'][0], 200000001 / 3)
+        self.assertEqual(prices['median'][0], 200000001 / 3)
+        self.assertEqual(prices['mean'][0], (123456789012 + 200000001) / 4)
+        history.close()
+
+    def testTimeRange(self):
+        history = wowthon.PriceHistory(self.path)
+        columns = self.record(history, 4)
+        item = columns[0].item[0]
+        times = history.price_history(item)['time']
+        found = history.price_history(item, since=times[1], until=times[2])
+        self.assertEqual(list(found['time']), list(times[1:3]))
+        self.assertEqual(len(history.price_history(1)['time']), 0)
+        history.close()
+
+    def testReopen(self):
+        history = wowthon.PriceHistory(self.path)
+        self.record(history, 2)
+        items = sorted(history.item_ids())
+        count = len(history)
+        history.close()
+
+        # Rebuilt from the history when the heads file is missing
+        os.remove(self.path + '.heads')
+        history = wowthon.PriceHistory(self.path)
+        self.assertEqual(sorted(history.item_ids()), items)
+        self.assertEqual(len(history), count)
+        self.record(history, 1)
+        history.close()
+
+        history = wowthon.PriceHistory(self.path)
+        self.assertTrue(len(history) > count)
+        self.assertEqual(len(history.price_history(items[0])['time']), 3)
+        history.close()
+
+    def testOldSnapshotIgnored(self):
+        history = wowthon.PriceHistory(self.path)
+        listings = wowthon.AuctionListings(self.api)
+        self.assertTrue(history.append(listings))
+        self.assertEqual(history.append(listings), 0)
+        history.close()
+
+    def testSelectedItems(self):
+        columns = wowthon.AuctionListings(self.api).to_columns()
+        item = columns.item[0]
+        history = wowthon.PriceHistory(self.path, items=[item])
+        self.assertEqual(history.append(columns, when=1000), 1)
+        self.assertEqual(history.item_ids(), [item])
+        history.close()
+
+    def testNoBuyout(self):
+        columns = wowthon.AuctionColumns(self.api)
+        columns.append('horde', {'auc' : 1, 'item' : 25, 'owner' : 'Bob',
+                                 'bid' : 10, 'buyout' : 0, 'quantity' : 2,
+                                 'timeLeft' : 'SHORT'})
+        history = wowthon.PriceHistory(self.path)
+        history.append(columns, when=1000)
+        prices = history.price_history(25)
+        self.assertEqual(list(prices['quantity']), [2])
+        self.assertTrue(math.isnan(prices['min'][0]))
+        history.close()
+
+    def testOpenedSnapshot(self):
+        snapshot = os.path.join(self.dir.name, 'draenor.auc')
+        listings = wowthon.AuctionListings(self.api)
+        listings.save_binary(snapshot)
+        modified = listings.dump_modified
+        self.api.transport.clear()
+        self.server.stop()
+
+        opened = wowthon.AuctionListings.open_binary(self.api, snapshot)
+        history = wowthon.PriceHistory(self.path)
+        self.assertTrue(history.append(opened))
+        item = opened.to_columns().item[0]
+        self.assertEqual(history.price_history(item)['time'][0],
+                         modified // 1000)
+        history.close()
+
+    def testNotHistory(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'x' * 32)
+        self.assertRaises(ValueError, wowthon.PriceHistory, self.path)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+#! /usr/bin/env python
+'''
+Unit tests for `wowthon.ConnectionPool`, run against a small local HTTP
+server so that no Battle.net access is needed.
+'''
+
+import unittest
+import threading
+import socket
+import http.server
+import json as jsonlib
+import wowthon
+
+class KeepAliveHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if self.path.startswith('/missing'):
+            code = 404
+            body = {'status' : 'nok', 'reason' : 'Character not found.'}
+        else:
+            code = 200
+            body = {'path' : self.path}
+        data = bytes(jsonlib.dumps(body), 'UTF-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+class ConnectionPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.server = http.server.HTTPServer(('127.0.0.1', 0),
+                                             KeepAliveHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       args=(0.05,))
+        self.thread.daemon = True
+        self.thread.start()
+        self.prefix = 'http://127.0.0.1:' + \
+                      str(self.server.server_address[1]) + '/'
+        self.api = wowthon.WoWAPI('Draenor', 'eu')
+
+    def tearDown(self):
+        self.api.transport.clear()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def testConnectionReused(self):
+        for i in range(5):
+            json = self.api._get_json(self.prefix + 'item/' + str(i))
+            self.assertEqual(json['path'], '/item/' + str(i))
+        stats = self.api.pool_stats
+        self.assertEqual(stats['requests'], 5)
+        self.assertEqual(stats['created'], 1)
+        self.assertEqual(stats['reused'], 4)
+        self.assertEqual(stats['idle'], 1)
+        self.assertEqual(stats['busy'], 0)
+
+    def testErrorKeepsConnection(self):
+        self.assertRaises(wowthon.APIError, self.api._get_json,
+                          self.prefix + 'missing')
+        self.api._get_json(self.prefix + 'item/1')
+        self.assertEqual(self.api.pool_stats['created'], 1)
+
+    def testIdleTimeout(self):
+        self.api.transport.idle_timeout = -1
+        self.api._get_json(self.prefix + 'item/1')
+        self.api._get_json(self.prefix + 'item/2')
+        stats = self.api.pool_stats
+        self.assertEqual(stats['created'], 2)
+        self.assertEqual(stats['expired'], 1)
+
+    def testSharedPool(self):
+        other = wowthon.WoWAPI('Draenor', 'eu', transport=self.api.transport)
+        self.api._get_json(self.prefix + 'item/1')
+        other._get_json(self.prefix + 'item/2')
+        self.assertEqual(other.pool_stats['reused'], 1)
+
+    def testTimeoutReleasesConnection(self):
+        # Accepts connections, but never responds
+        hung = socket.socket()
+        hung.bind(('127.0.0.1', 0))
+        hung.listen(16)
+        self.addCleanup(hung.close)
+        url = 'http://127.0.0.1:' + str(hung.getsockname()[1]) + '/item/1'
+
+        api = wowthon.WoWAPI('Draenor', 'eu', timeout=0.2, retries=1,
+                             backoff=0, breaker_threshold=100,
+                             transport=wowthon.ConnectionPool(max_size=2))
+        for i in range(3):
+            self.assertRaises(OSError, api._get_json, url)
+        self.assertEqual(api.pool_stats['busy'], 0)
+        # The pool still serves other requests
+        json = api._get_json(self.prefix + 'item/2')
+        self.assertEqual(json['path'], '/item/2')
+
+if __name__ == '__main__':
+    unittest.main()
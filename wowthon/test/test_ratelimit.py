@@ -0,0 +1,40 @@
+#! /usr/bin/env python
+'''
+Unit tests for `wowthon.RateLimiter`.
+'''
+
+import unittest
+import time
+import wowthon
+
+class RateLimiterTest(unittest.TestCase):
+    def testBurstThenWait(self):
+        limiter = wowthon.RateLimiter(100, burst=5)
+        start = time.monotonic()
+        for i in range(10):
+            limiter.acquire()
+        elapsed = time.monotonic() - start
+        # Five requests go straight through, the next five are spread out
+        self.assertTrue(elapsed >= 0.04, elapsed)
+        self.assertEqual(limiter.stats['delayed'], 5)
+
+    def testDailyQuota(self):
+        limiter = wowthon.RateLimiter(None, daily_quota=3)
+        for i in range(3):
+            self.assertEqual(limiter.acquire(), 0)
+        self.assertEqual(limiter.spent_today, 3)
+        self.assertEqual(limiter.remaining_today, 0)
+        self.assertRaises(wowthon.QuotaExceededError, limiter.acquire)
+
+    def testSharedByKey(self):
+        eu = wowthon.WoWAPI('Draenor', 'eu', public_key='test-shared',
+                            rate_limit=10)
+        other = wowthon.WoWAPI('Silvermoon', 'eu', public_key='test-shared',
+                               rate_limit=10)
+        self.assertTrue(eu.rate_limiter() is other.rate_limiter())
+        self.assertFalse(eu.rate_limiter() is eu.rate_limiter('us'))
+        self.assertEqual(
+            eu._region_for_url('http://us.battle.net/api/wow/item/1'), 'us')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+#! /usr/bin/env python
+'''
+Unit tests for `wowthon.PersistentStore`, run against
+`wowthon.FakeBattleNet`.
+'''
+
+import unittest
+import os
+import tempfile
+import multiprocessing
+import wowthon
+
+def write(path, first, count, ready):
+    # Run in another process, writing while the test process does
+    store = wowthon.PersistentStore(path)
+    ready.wait()
+    for i in range(first, first + count):
+        store.put(('eu', '', 'item', i), b'{"id":' + bytes(str(i), 'UTF-8') +
+                  b'}')
+    store.close()
+
+class PersistentStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'static.db')
+        self.server = wowthon.FakeBattleNet().start()
+
+    def tearDown(self):
+        self.server.stop()
+        self.dir.cleanup()
+
+    def api(self, store):
+        return wowthon.WoWAPI('Draenor', 'eu', store=store,
+                              transport=self.server.transport())
+
+    def testSharedBetweenStores(self):
+        first = self.api(wowthon.PersistentStore(self.path))
+        name = first.get_item(71086).name
+        self.assertEqual(first.get_races()[0]['name'], 'Human')
+        self.assertEqual(first.store.stats['writes'], 2)
+
+        # A new store on the same file, as opened by another process
+        second = self.api(wowthon.PersistentStore(self.path))
+        requests = self.server.stats['requests']
+        self.assertEqual(second.get_item(71086).name, name)
+        self.assertEqual(second.get_races()[0]['name'], 'Human')
+        self.assertEqual(self.server.stats['requests'], requests)
+        self.assertEqual(second.store.stats['hits'], 2)
+
+    def testCharactersNotStored(self):
+        api = self.api(wowthon.PersistentStore(self.path))
+        api.get_char('Untamedbush').level
+        self.assertEqual(len(api.store), 0)
+
+    def testForceUpdateRefreshes(self):
+        store = wowthon.PersistentStore(self.path)
+        api = self.api(store)
+        item = api.get_quest(5)
+        item.title
+        item.force_update()
+        self.assertEqual(store.stats['writes'], 2)
+
+    def testMaxAge(self):
+        api = self.api(wowthon.PersistentStore(self.path, max_age=-1))
+        api.get_item(1).name
+        api.get_item(1, use_cache=False).name
+        self.assertEqual(api.store.stats['hits'], 0)
+
+    def testThreads(self):
+        api = self.api(wowthon.PersistentStore(self.path))
+        items = api.get_items(range(1, 41), workers=8)
+        self.assertTrue(all(items))
+        self.assertEqual(len(api.store), 40)
+
+    def testStoredAsDownloaded(self):
+        store = wowthon.PersistentStore(self.path)
+        store.put(('eu', '', 'item', 1), b'{"id": 1,  "name":"x"}')
+        self.assertEqual(store.get(('eu', '', 'item', 1)),
+                         b'{"id": 1,  "name":"x"}')
+
+    def testProcessesWritingAtOnce(self):
+        wowthon.PersistentStore(self.path).close()
+        ready = multiprocessing.Event()
+        processes = [multiprocessing.Process(target=write,
+                                             args=(self.path, first, 200,
+                                                   ready))
+                     for first in [0, 100]]
+        for process in processes:
+            process.start()
+        ready.set()
+        for process in processes:
+            process.join(60)
+            self.assertEqual(process.exitcode, 0)
+
+        store = wowthon.PersistentStore(self.path)
+        self.assertEqual(len(store), 300)
+        self.assertEqual(store.get(('eu', '', 'item', 299)), b'{"id":299}')
+        store.close()
+
+if __name__ == '__main__':
+    unittest.main()
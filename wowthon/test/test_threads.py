@@ -0,0 +1,93 @@
+#! /usr/bin/env python
+'''
+Stress tests for a `wowthon.WoWAPI` created with `thread_safe=True`, shared
+by many threads reading the same guild and characters from
+`wowthon.FakeBattleNet`.
+'''
+
+import unittest
+import threading
+import wowthon
+
+THREADS = 16
+
+class ThreadSafeTest(unittest.TestCase):
+    def setUp(self):
+        self.server = wowthon.FakeBattleNet(guild_size=30,
+                                            latency=0.002).start()
+        self.api = wowthon.WoWAPI('Draenor', 'eu', thread_safe=True,
+                                  transport=self.server.transport(
+                                      max_size=THREADS))
+
+    def tearDown(self):
+        self.api.transport.clear()
+        self.server.stop()
+
+    def hammer(self, work):
+        """Run `work(thread number)` on every thread at once."""
+        errors = []
+        results = [None] * THREADS
+        barrier = threading.Barrier(THREADS)
+        def run(i):
+            try:
+                barrier.wait()
+                results[i] = work(i)
+            except Exception as e:
+                errors.append(e)
+        threads = [threading.Thread(target=run, args=(i,))
+                   for i in range(THREADS)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(errors, [])
+        return results
+
+    def testGuildMembers(self):
+        def work(i):
+            guild = self.api.get_guild('Delphae')
+            members = guild.members
+            for rank, char in members:
+                char.name
+                char.level
+            return guild, [char for rank, char in members]
+        results = self.hammer(work)
+        guild, members = results[0]
+        for other_guild, other_members in results:
+            self.assertTrue(other_guild is guild)
+            self.assertTrue(all(a is b for a, b in
+                                zip(members, other_members)))
+        # The guild was only downloaded once
+        self.assertEqual(self.server.stats['requests'], 1)
+
+    def testCharacterFields(self):
+        names = ['Char' + str(i) for i in range(15)]
+        fields = ['titles', 'stats', 'talents', 'professions', 'mounts']
+        def work(i):
+            seen = []
+            for name in names:
+                char = self.api.get_char(name)
+                try:
+                    # Every thread adds a different field first
+                    for field in fields[i % 5:] + fields[:i % 5]:
+                        getattr(char, field)
+                except wowthon.APIError:
+                    # Low level characters do not exist
+                    pass
+                seen.append(char)
+            return seen
+        results = self.hammer(work)
+        for seen in results:
+            self.assertTrue(all(a is b for a, b in zip(seen, results[0])))
+        for char in results[0]:
+            self.assertEqual(sorted(char._fields), sorted(fields))
+
+    def testShardedCache(self):
+        self.assertTrue(isinstance(self.api.cache, wowthon.ShardedCache))
+        self.hammer(lambda i: self.api.get_items(range(i, i + 20)))
+        stats = self.api.cache_stats
+        self.assertEqual(stats['entries'], THREADS + 19)
+        self.assertEqual(self.server.stats['requests'], THREADS + 19)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,322 @@
+#! /usr/bin/env python
+'''
+Unit tests for `wowthon.WoWAPI` request handling. The region prefix is
+pointed at a small local HTTP server so that no Battle.net access is needed.
+'''
+
+import unittest
+import threading
+import time
+import http.server
+import json as jsonlib
+import email.utils
+import zlib
+from urllib.error import HTTPError
+import gzip
+import wowthon
+
+# Path (without query) -> JSON document served for it
+FIXTURES = {
+    '/api/wow/item/1' : {'id' : 1, 'name' : 'Hearthstone'},
+    '/api/wow/item/2' : {'id' : 2, 'name' : 'Worn Shortsword'},
+    '/api/wow/quest/5' : {'id' : 5, 'title' : 'Jasperlode Mine'},
+    '/api/wow/achievement/6' : {'id' : 6, 'title' : 'Level 10'},
+    '/api/wow/character/draenor/Untamedbush' : {
+        'name' : 'Untamedbush',
+        'level' : 85,
+        'lastModified' : 1337000000000
+    },
+}
+
+class FixtureHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.paths.append(self.path)
+        time.sleep(self.server.delay)
+        if self.server.failures:
+            self.server.failures -= 1
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        path = self.path.split('?')[0]
+        since = self.headers.get('If-Modified-Since')
+        if path in FIXTURES and since and 'lastModified' in FIXTURES[path]:
+            since = email.utils.parsedate_to_datetime(since).timestamp()
+            if FIXTURES[path]['lastModified'] <= since * 1000:
+                self.send_response(304)
+                self.end_headers()
+                return
+
+        if path in FIXTURES:
+            code = 200
+            body = FIXTURES[path]
+            if 'fields=' in self.path:
+                body = dict(body, fields=self.path.split('fields=')[1])
+        else:
+            code = 404
+            body = {'status' : 'nok', 'reason' : 'Not found.'}
+        data = bytes(jsonlib.dumps(body), 'UTF-8')
+        encoding = self.server.compress
+        if not encoding or \
+           encoding not in self.headers.get('Accept-Encoding', ''):
+            encoding = None
+        elif encoding == 'gzip':
+            data = gzip.compress(data)
+        elif encoding == 'deflate':
+            data = zlib.compress(data)
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+class WoWAPITestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0),
+                                                      FixtureHandler)
+        self.server.paths = []
+        self.server.compress = None
+        self.server.failures = 0
+        self.server.delay = 0
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       args=(0.05,))
+        self.thread.daemon = True
+        self.thread.start()
+        self.old_prefix = wowthon.REGION['eu']['prefix']
+        wowthon.REGION['eu']['prefix'] = 'http://127.0.0.1:' + \
+            str(self.server.server_address[1]) + '/api/wow/'
+        self.api = wowthon.WoWAPI('Draenor', 'eu')
+
+    def tearDown(self):
+        wowthon.REGION['eu']['prefix'] = self.old_prefix
+        self.api.transport.clear()
+        self.server.shutdown()
+        self.server.server_close()
+
+class BulkGetterTest(WoWAPITestCase):
+    def testGetItemsInOrder(self):
+        items = self.api.get_items([2, 1, 2])
+        self.assertEqual([i.name for i in items],
+                         ['Worn Shortsword', 'Hearthstone', 'Worn Shortsword'])
+        # Duplicates are only fetched once, and results are cached
+        self.assertEqual(len(self.server.paths), 2)
+        self.assertTrue(self.api.get_item(1) is items[1])
+
+    def testErrorsDoNotAbortBatch(self):
+        errors = {}
+        items = self.api.get_items([1, 404], errors=errors)
+        self.assertEqual(items[0].name, 'Hearthstone')
+        self.assertEqual(items[1], None)
+        self.assertEqual(errors[404].code, 404)
+
+    def testQuestsAndAchievements(self):
+        self.assertEqual(self.api.get_quests([5])[0].title, 'Jasperlode Mine')
+        self.assertEqual(self.api.get_achieves([6])[0].title, 'Level 10')
+
+    def testCharFields(self):
+        char = self.api.get_chars(['Untamedbush'])[0]
+        self.assertEqual(char.level, 85)
+        # Asking for more fields refetches the cached character
+        char = self.api.get_chars(['Untamedbush'], fields=['titles'])[0]
+        self.assertEqual(char._json['fields'], 'titles')
+        self.assertEqual(len(self.server.paths), 2)
+
+class ConditionalGetTest(WoWAPITestCase):
+    def testForceUpdateNotModified(self):
+        char = self.api.get_char('Untamedbush')
+        char.level
+        json = char._json
+        char.force_update()
+        # A 304 keeps the existing data
+        self.assertTrue(char._json is json)
+        self.assertEqual(len(self.server.paths), 2)
+
+    def testMaxAgeRevalidates(self):
+        self.api.max_age = 0
+        char = self.api.get_char('Untamedbush')
+        char.level
+        char._fetched_at -= 1
+        char.level
+        self.assertEqual(len(self.server.paths), 2)
+
+    def testNewFieldIsNotConditional(self):
+        char = self.api.get_char('Untamedbush')
+        char.level
+        char._add_field('titles')
+        char.force_update()
+        self.assertEqual(char._json['fields'], 'titles')
+
+class CompressionTest(WoWAPITestCase):
+    def testGzip(self):
+        self.server.compress = 'gzip'
+        transfers = []
+        self.api.on_transfer = transfers.append
+        self.assertEqual(self.api.get_item(1).name, 'Hearthstone')
+        self.assertEqual(transfers[0]['encoding'], 'gzip')
+        self.assertEqual(transfers[0]['bytes'],
+                         len(jsonlib.dumps(FIXTURES['/api/wow/item/1'])))
+        self.assertEqual(self.api.transfer_stats['compressed'], 1)
+
+    def testDeflate(self):
+        self.server.compress = 'deflate'
+        self.assertRaises(wowthon.APIError, self.api._get_json,
+                          self.api.region_prefix + 'item/404')
+        self.assertEqual(self.api.get_item(2).name, 'Worn Shortsword')
+        self.assertEqual(self.api.transfer_stats['compressed'], 2)
+
+class RetryTest(WoWAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.api.backoff = 0
+
+    def testRetryServerError(self):
+        self.server.failures = 2
+        self.assertEqual(self.api.get_item(1).name, 'Hearthstone')
+        stats = self.api.retry_stats
+        self.assertEqual(stats['retries'], 2)
+        self.assertEqual(stats['server_errors'], 2)
+        self.assertEqual(stats['breakers']['eu']['state'], 'closed')
+
+    def testGiveUp(self):
+        self.server.failures = 10
+        self.api.retries = 1
+        self.assertRaises(HTTPError, self.api._get_json,
+                          self.api.region_prefix + 'item/1')
+        self.assertEqual(self.api.retry_stats['gave_up'], 1)
+
+    def testBreakerOpens(self):
+        self.server.failures = 10
+        self.api.breaker_threshold = 2
+        self.api.retries = 5
+        url = self.api.region_prefix + 'item/1'
+        self.assertRaises(wowthon.CircuitOpenError, self.api._get_json, url)
+        self.assertEqual(len(self.server.paths), 2)
+        # Requests now fail without reaching the server
+        self.assertRaises(wowthon.CircuitOpenError, self.api._get_json, url)
+        self.assertEqual(len(self.server.paths), 2)
+        stats = self.api.retry_stats['breakers']['eu']
+        self.assertEqual(stats['state'], 'open')
+        self.assertEqual(stats['rejected'], 2)
+
+    def testConnectionError(self):
+        self.api.retries = 1
+        self.assertRaises(OSError, self.api._get_json,
+                          'http://127.0.0.1:1/api/wow/item/1')
+        self.assertEqual(self.api.retry_stats['connection_errors'], 2)
+
+    def testTrialReleasedOnOtherErrors(self):
+        url = self.api.region_prefix + 'item/1'
+        breaker = self.api._breaker('eu')
+        breaker.reset_timeout = 0
+        for i in range(breaker.threshold):
+            breaker.failure()
+        self.assertEqual(breaker.state, 'half-open')
+
+        transport = self.api.transport
+        def fail(*args):
+            raise ValueError('not a network error')
+        self.api.transport = wowthon.Transport()
+        self.api.transport.urlopen = fail
+        self.assertRaises(ValueError, self.api._get_json, url)
+        # The trial was not used up, so the next request is let through
+        self.api.transport = transport
+        self.assertEqual(self.api._get_json(url)['name'], 'Hearthstone')
+        self.assertEqual(breaker.state, 'closed')
+
+    def testQuotaDoesNotTakeTrial(self):
+        url = self.api.region_prefix + 'item/1'
+        api = wowthon.WoWAPI('Draenor', 'eu', public_key='breaker-quota',
+                             daily_quota=1)
+        self.addCleanup(api.transport.clear)
+        self.assertEqual(api._get_json(url)['name'], 'Hearthstone')
+        breaker = api._breaker('eu')
+        breaker.reset_timeout = 0
+        for i in range(breaker.threshold):
+            breaker.failure()
+        self.assertRaises(wowthon.QuotaExceededError, api._get_json,
+                          url.replace('item/1', 'item/2'))
+        self.assertEqual(breaker.allow(), True)
+
+    def testOpenBreakerSpendsNothing(self):
+        url = self.api.region_prefix + 'item/1'
+        api = wowthon.WoWAPI('Draenor', 'eu', public_key='breaker-open',
+                             rate_limit=2, burst=1, daily_quota=100)
+        breaker = api._breaker('eu')
+        for i in range(breaker.threshold):
+            breaker.failure()
+        start = time.monotonic()
+        for i in range(4):
+            self.assertRaises(wowthon.CircuitOpenError, api._get_json, url)
+        self.assertTrue(time.monotonic() - start < 0.2)
+        self.assertEqual(api.rate_limiter().spent_today, 0)
+
+class CoalesceTest(WoWAPITestCase):
+    def testConcurrentRequestsShared(self):
+        self.server.delay = 0.2
+        url = self.api.region_prefix + 'item/1'
+        results = []
+        threads = [threading.Thread(
+                       target=lambda: results.append(self.api._get_json(url)))
+                   for i in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(self.server.paths), 1)
+        self.assertTrue(all(r is results[0] for r in results))
+        stats = self.api.coalesce_stats
+        self.assertEqual(stats['hits'], 4)
+        self.assertEqual(stats['misses'], 1)
+
+class NotFoundTest(WoWAPITestCase):
+    def testRemembered(self):
+        url = self.api.region_prefix + 'item/404'
+        for i in range(3):
+            self.assertRaises(wowthon.APIError, self.api._get_json, url)
+        self.assertEqual(len(self.server.paths), 1)
+        stats = self.api.not_found_stats
+        self.assertEqual(stats['saved'], 2)
+        self.assertEqual(stats['entries'], 1)
+
+    def testExpires(self):
+        self.api.not_found_ttl = -1
+        errors = {}
+        self.api.get_items([404], errors=errors)
+        self.api.get_items([404], errors=errors, use_cache=False)
+        self.assertEqual(len(self.server.paths), 2)
+        self.assertEqual(errors[404].code, 404)
+
+    def testDisabled(self):
+        self.api.not_found_ttl = 0
+        url = self.api.region_prefix + 'item/404'
+        self.assertRaises(wowthon.APIError, self.api._get_json, url)
+        self.assertRaises(wowthon.APIError, self.api._get_json, url)
+        self.assertEqual(len(self.server.paths), 2)
+        self.assertEqual(self.api.not_found_stats['entries'], 0)
+
+class JsonBackendTest(WoWAPITestCase):
+    def testStandardLibrary(self):
+        api = wowthon.WoWAPI('Draenor', 'eu', json_backend='json')
+        self.assertEqual(api.get_item(1).name, 'Hearthstone')
+
+    @unittest.skipUnless('orjson' in wowthon.WoWAPI.available_json_backends(),
+                         'orjson is not installed')
+    def testOrjson(self):
+        api = wowthon.WoWAPI('Draenor', 'eu', json_backend='orjson')
+        self.assertEqual(api.get_item(2).name, 'Worn Shortsword')
+        self.assertEqual(self.api.json_backend, 'orjson')
+
+    def testUnknownBackend(self):
+        self.assertRaises(ValueError, wowthon.WoWAPI, 'Draenor', 'eu',
+                          json_backend='yaml')
+
+if __name__ == '__main__':
+    unittest.main()
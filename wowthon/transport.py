@@ -0,0 +1,138 @@
+﻿import urllib.request
+from urllib.error import HTTPError
+import zlib
+
+class Transport:
+    """
+    The interface WoWAPI uses to make HTTP requests.
+
+    A transport may be passed to `wowthon.WoWAPI` to change how requests are
+    made, e.g. to send them to a local test server (see
+    `wowthon.FakeBattleNet`). Subclasses must implement `urlopen`.
+
+    `wowthon.ConnectionPool` is the default transport, and keeps connections
+    alive between requests. `wowthon.UrllibTransport` makes every request
+    with `urllib.request.urlopen`.
+
+    """
+    def urlopen(self, url, headers=None, timeout=None):
+        """
+        Make a GET request for `url` with the dictionary `headers`, waiting
+        up to `timeout` seconds on the server.
+
+        Redirects should be followed. Error responses should be returned,
+        not raised.
+
+        Returns a `wowthon.Response`, which is closed by the caller.
+
+        """
+        raise NotImplementedError
+
+    def clear(self):
+        """Close any connections held open by the transport."""
+        pass
+
+    @property
+    def stats(self):
+        """Return a dictionary of statistics about the transport."""
+        return {}
+
+class Response:
+    """
+    A response from a `wowthon.Transport`.
+
+    Wraps a file-like object `raw` with a `read(amt)` method and a
+    `headers` message, and decodes compressed bodies.
+
+    """
+    #: The content encodings that can be decoded by `iter_content`
+    ENCODINGS = ['gzip', 'deflate']
+
+    def __init__(self, raw, status, reason, headers):
+        self._resp = raw
+        self._closed = False
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.encoding = (headers.get('Content-Encoding') or '').lower()
+        #: The number of body bytes received so far by `iter_content`
+        self.wire_bytes = 0
+        #: The number of decoded bytes produced so far by `iter_content`
+        self.decoded_bytes = 0
+
+    def getheader(self, name, default=None):
+        """Return the value of the response header `name`."""
+        return self.headers.get(name, default)
+
+    def read(self, amt=None):
+        """Read up to `amt` bytes of the raw body, or all of it."""
+        return self._resp.read(amt)
+
+    def iter_content(self, chunk_size=65536):
+        """
+        Read the body `chunk_size` bytes at a time, yielding it in pieces.
+
+        gzip and deflate encoded bodies are decompressed as they arrive, so
+        the compressed body is never held in memory all at once.
+
+        """
+        decoder = None
+        if self.encoding in ['gzip', 'x-gzip']:
+            decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+        while True:
+            chunk = self._resp.read(chunk_size)
+            if not chunk:
+                break
+            self.wire_bytes += len(chunk)
+            if self.encoding == 'deflate' and decoder is None:
+                # Servers disagree over whether deflate has a zlib header
+                wbits = zlib.MAX_WBITS
+                if len(chunk) < 2 or (chunk[0] & 0x0f) != 8 or \
+                   (chunk[0] * 256 + chunk[1]) % 31:
+                    wbits = -zlib.MAX_WBITS
+                decoder = zlib.decompressobj(wbits)
+            if decoder:
+                chunk = decoder.decompress(chunk)
+            self.decoded_bytes += len(chunk)
+            if chunk:
+                yield chunk
+
+        if decoder:
+            chunk = decoder.flush()
+            self.decoded_bytes += len(chunk)
+            if chunk:
+                yield chunk
+
+    def close(self):
+        """Close the response."""
+        if self._closed:
+            return
+        self._closed = True
+        self._resp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class UrllibTransport(Transport):
+    """
+    A transport making each request with `urllib.request.urlopen`.
+
+    A new connection is made for every request.
+
+    """
+    def urlopen(self, url, headers=None, timeout=None):
+        if headers is None: headers = {}
+        requester = urllib.request.Request(url, headers=headers)
+        try:
+            if timeout is None:
+                raw = urllib.request.urlopen(requester)
+            else:
+                raw = urllib.request.urlopen(requester, timeout=timeout)
+        except HTTPError as e:
+            # Error responses still have a body to read
+            raw = e
+        return Response(raw, raw.getcode(), raw.reason, raw.headers)
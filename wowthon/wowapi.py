@@ -1,12 +1,25 @@
 ﻿# Imports
 import urllib.request
+import urllib.parse
 from urllib.error import HTTPError
 import json as jsonlib
 import time
+import asyncio
+import concurrent.futures
+import threading
+import random
+import socket
+import http.client
 import base64
 import hashlib
 import hmac
 
+# Optional Imports
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Package Imports
 import wowthon
 
@@ -37,8 +50,19 @@ class WoWAPI(wowthon._FetchMixin):
 
     _TIME_FORMAT = "%a, %d %b %Y %H:%M:%S GMT"
 
+    #: The maximum number of 404 responses remembered at once
+    NOT_FOUND_LIMIT = 10000
+
+    #: The JSON libraries responses can be decoded with, fastest first
+    JSON_BACKENDS = ['orjson', 'json']
+
     def __init__(self, realm, region='us', locale='',
-                 private_key='', public_key=''):
+                 private_key='', public_key='', transport=None, max_age=None,
+                 on_transfer=None, rate_limit=None, burst=None,
+                 daily_quota=None, timeout=30, retries=3, backoff=0.5,
+                 breaker_threshold=5, breaker_timeout=30, json_backend=None,
+                 cache=None, store=None, not_found_ttl=300, thread_safe=False,
+                 dump_cache=None):
         """
         Construct a new WoWAPI for the specified realm.
 
@@ -53,9 +77,61 @@ class WoWAPI(wowthon._FetchMixin):
         locale -- the locale to use (default '')
         private_key -- your private API key (default '')
         public_key -- your public API key (default '')
+        transport -- a `wowthon.Transport` to make requests with. Pass the
+                     same `wowthon.ConnectionPool` to several APIs to share
+                     connections between them. (default: a new
+                     `wowthon.ConnectionPool`)
+        max_age -- the number of seconds downloaded data is used for before
+                   it is refreshed from the server (default: None, forever)
+        on_transfer -- a function called after every request with a
+                       dictionary describing the transfer. See
+                       `WoWAPI.transfer_stats` for its fields. (default: None)
+        rate_limit -- the number of requests per second allowed to each
+                      region. Requests beyond this wait their turn.
+                      (default: None, unlimited)
+        burst -- the number of requests that may be made at once before
+                 `rate_limit` applies (default: `rate_limit`)
+        daily_quota -- the number of requests allowed per day to each region
+                       (default: None, unlimited)
+
+        Limits are shared by every WoWAPI using the same `public_key`. The
+        limits given by the first API created for a key are used.
+
+        timeout -- the number of seconds to wait on the server before a
+                   request fails (default: 30)
+        retries -- the number of times a request is retried after a
+                   connection error, a timeout, a 5xx error or a 429 (too
+                   many requests) response (default: 3)
+        backoff -- the base delay in seconds between retries. The delay is
+                   random, up to `backoff` doubled for every retry made.
+                   (default: 0.5)
+        breaker_threshold -- the number of failed requests in a row after
+                             which a region is considered down (default: 5)
+        breaker_timeout -- the number of seconds requests to a region that is
+                           down fail immediately with CircuitOpenError, before
+                           it is tried again (default: 30)
+        json_backend -- the name of the library used to decode JSON, one of
+                        `WoWAPI.JSON_BACKENDS` (default: the fastest one
+                        installed)
+        cache -- a `wowthon.Cache` to keep the objects returned by the
+                 getters in (default: a new `wowthon.Cache`)
+        store -- a `wowthon.PersistentStore` to keep static game data, such
+                 as items and quests, in between runs (default: None)
+        not_found_ttl -- the number of seconds a 404 response is remembered
+                         for. Requests for the same URL in that time raise
+                         the same APIError without contacting the server.
+                         (default: 300, 0 to disable)
+        thread_safe -- allow the API, and the objects it returns, to be used
+                       from several threads at once. Objects then lock
+                       while downloading or adding fields, and the default
+                       cache is a `wowthon.ShardedCache`. (default: False)
+        dump_cache -- a `wowthon.DumpCache` to keep downloaded auction dumps
+                      in, so that each is only downloaded once
+                      (default: None)
 
         Throws:
-        ValueError -- if the locale is not valid for the region
+        ValueError -- if the locale is not valid for the region, or the
+                      JSON backend is not installed
 
         """
         # TODO Implement public and private key
@@ -79,12 +155,212 @@ class WoWAPI(wowthon._FetchMixin):
             raise ValueError('Illegal locale "' + locale +
                             '" passed for region "' + self.region + '".')
 
-        self._cache = {}
+        if json_backend is None:
+            json_backend = self.available_json_backends()[0]
+        elif json_backend not in self.available_json_backends():
+            raise ValueError('JSON backend "' + json_backend +
+                             '" is not installed.')
+        self.json_backend = json_backend
+
+        self.thread_safe = thread_safe
+        if cache is None and thread_safe:
+            cache = wowthon.ShardedCache()
+        elif cache is None:
+            cache = wowthon.Cache()
+        self.cache = cache
+        self.store = store
+        self.dump_cache = dump_cache
+        # Objects yet to be rebuilt from a saved cache, see load_cache
+        self._snapshot = None
+        if transport is None:
+            transport = wowthon.ConnectionPool()
+        self.transport = transport
+        self.max_age = max_age
+        self.on_transfer = on_transfer
+        self.rate_limit = rate_limit
+        self.burst = burst
+        self.daily_quota = daily_quota
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker_threshold = breaker_threshold
+        self.breaker_timeout = breaker_timeout
+        self._breakers = {}
+        self._in_flight = wowthon.SingleFlight()
+        self.not_found_ttl = not_found_ttl
+        # URL -> (error dictionary, expiry time)
+        self._not_found = {}
+        self._not_found_saved = 0
+        self._stats_lock = threading.Lock()
+        self._transfer_stats = {
+            'requests' : 0,
+            'compressed' : 0,
+            'wire_bytes' : 0,
+            'bytes' : 0
+        }
+        self._retry_stats = {
+            'retries' : 0,
+            'timeouts' : 0,
+            'connection_errors' : 0,
+            'server_errors' : 0,
+            'throttled' : 0,
+            'gave_up' : 0
+        }
+        # Executor used for asynchronous fetches, set by AsyncWoWAPI
+        self._executor = None
+
+    @property
+    def pool_stats(self):
+        """
+        Return a dictionary of statistics for the API's transport.
+
+        For the default transport, the fields are described in
+        `wowthon.ConnectionPool.stats`.
+
+        """
+        return self.transport.stats
+
+    def rate_limiter(self, region=None):
+        """
+        Return the `wowthon.RateLimiter` used for requests to `region`, or
+        None if requests are not limited.
+
+        The limiter tells how much of the day's quota has been spent, e.g.
+            api.rate_limiter().spent_today
+
+        If no region is specified, the current API's region is used.
+
+        """
+        if not region: region = self.region
+        if self.rate_limit is None and self.daily_quota is None:
+            return None
+        return wowthon.RateLimiter.for_key(self.public_key, region,
+                                           self.rate_limit, self.burst,
+                                           self.daily_quota)
+
+    def _region_for_url(self, url):
+        """
+        Return the region whose servers `url` points at.
+
+        The current API's region is returned for unknown servers.
+
+        """
+        host = urllib.parse.urlsplit(url).netloc
+        for region, info in wowthon.REGION.items():
+            if urllib.parse.urlsplit(info['prefix']).netloc == host:
+                return region
+        return self.region
+
+    def _breaker(self, region):
+        """
+        Return the `wowthon.CircuitBreaker` for requests to `region`.
+
+        """
+        with self._stats_lock:
+            if region not in self._breakers:
+                self._breakers[region] = wowthon.CircuitBreaker(
+                    region, self.breaker_threshold, self.breaker_timeout)
+            return self._breakers[region]
+
+    @property
+    def retry_stats(self):
+        """
+        Return a dictionary of statistics on failed requests with the
+        following fields:
+
+        retries -- the number of requests retried
+        timeouts -- the number of requests that timed out
+        connection_errors -- the number of requests that failed to connect
+                             or lost their connection
+        server_errors -- the number of 5xx responses received
+        throttled -- the number of 429 (too many requests) responses received
+        gave_up -- the number of requests that failed after every retry
+        breakers -- a dictionary mapping regions to the statistics of their
+                    circuit breakers (see `wowthon.CircuitBreaker.stats`)
+
+        """
+        with self._stats_lock:
+            ret = dict(self._retry_stats)
+            breakers = dict(self._breakers)
+        ret['breakers'] = {}
+        for region, breaker in breakers.items():
+            ret['breakers'][region] = breaker.stats
+        return ret
+
+    @property
+    def coalesce_stats(self):
+        """
+        Return a dictionary of statistics on duplicate requests avoided.
+
+        `hits` counts requests that waited on an identical request already in
+        progress, `misses` counts requests sent to the server and `in_flight`
+        the number currently being made.
+
+        """
+        return self._in_flight.stats
+
+    @property
+    def not_found_stats(self):
+        """
+        Return a dictionary of statistics on remembered 404 responses.
+
+        `saved` counts the requests answered from memory instead of the
+        server and `entries` the number of URLs currently remembered.
+
+        """
+        with self._stats_lock:
+            return {
+                'saved' : self._not_found_saved,
+                'entries' : len(self._not_found)
+            }
+
+    def _count(self, stat):
+        with self._stats_lock:
+            self._retry_stats[stat] += 1
+
+    @property
+    def cache_stats(self):
+        """
+        Return a dictionary of statistics for the API's cache, with the
+        fields described in `wowthon.Cache.stats`.
+
+        """
+        return self.cache.stats
+
+    @property
+    def transfer_stats(self):
+        """
+        Return a dictionary of totals for the data downloaded by the API with
+        the following fields:
+
+        requests -- the number of requests made
+        compressed -- the number of responses sent compressed
+        wire_bytes -- the number of body bytes received from the server
+        bytes -- the number of body bytes after decompression
+
+        The dictionary passed to `on_transfer` for each request has the same
+        fields for that request alone, along with its `url` and `encoding`.
+
+        """
+        with self._stats_lock:
+            return dict(self._transfer_stats)
 
     #
     # Static methods
     #
 
+    @staticmethod
+    def available_json_backends():
+        """
+        Return a list of the JSON backends which are installed, fastest
+        first. The standard library's `json` is always available.
+
+        """
+        ret = []
+        for backend in WoWAPI.JSON_BACKENDS:
+            if backend != 'orjson' or orjson:
+                ret.append(backend)
+        return ret
 
     @staticmethod
     def _locale_case(s):
@@ -222,54 +498,186 @@ class WoWAPI(wowthon._FetchMixin):
     # Private helper methods
     #
 
-    def _cache_set(self, obj, *args):
+    def _cache_set(self, obj, *key):
         """
-        Caches the object `obj` at path `args`.
+        Caches the object `obj` at `key`, whose first element is the kind of
+        object, and returns it.
+
+        If another thread has cached an object at `key` in the meantime, that
+        object is returned instead.
 
         """
-        self._cache_set_helper(self._cache, obj, args)
+        ret = self.cache.setdefault(key, obj)
+        if isinstance(ret, wowthon._FetchMixin):
+            # So that the cache can measure it again once it is fetched
+            ret._cache_key = key
+        return ret
 
-    def _cache_set_helper(self, d, obj, path):
-        # TODO Add last_modified here?
-        # Recursively create cache structure
-        if len(path) > 1:
-            if not d.get(path[0]):
-                d.update({path[0] : {}})
-            # Add the first element of the path
-            self._cache_set_helper(d[path[0]], obj, path[1:])
-        else:
-            # and set the final item in the path to obj
-            d.update({path[0] : obj})
+    def _cache_resize(self, obj):
+        """
+        Update the size in the cache of `obj`, which has just stored newly
+        downloaded data.
+
+        """
+        key = getattr(obj, '_cache_key', None)
+        if key is not None:
+            self.cache.resize(key, obj)
 
-    def _cache_fetch(self, *args):
+    def _cache_fetch(self, *key):
         """
         Returns an object from the cache.
 
         Returns None if the object is not cached.
 
         """
-        c = self._cache
-        for field in args:
-            data = c.get(field)
-            if not data:
-                # Field not found, object is not cached
-                return None
-            # Otherwise, move to the next field
-            c = data
-        return c
+        ret = self.cache.get(key)
+        if ret is None and self._snapshot is not None:
+            ret = self._snapshot.pop(self, key)
+            if ret is not None:
+                ret = self._cache_set(ret, *key)
+        return ret
+
+    def save_cache(self, path):
+        """
+        Save the downloaded data of every cached character, guild, item,
+        quest and achievement to the file at `path`, so that another
+        process can start with them using `WoWAPI.load_cache`.
 
-    def _get_json(self, url):
+        Returns the number of objects saved.
+
+        """
+        objects = self.cache.items()
+        snapshot = self._snapshot
+        if snapshot is not None:
+            # Objects loaded but not yet used are saved again too
+            for key in snapshot.keys():
+                obj = snapshot.pop(self, key)
+                if obj is not None:
+                    objects.append((key, obj))
+            # The file may be about to be overwritten
+            self._snapshot = None
+            snapshot.close()
+        return wowthon.CacheSnapshot.write(path, objects)
+
+    def load_cache(self, path):
+        """
+        Use the objects saved to `path` by `WoWAPI.save_cache`.
+
+        Only the file's index is read straight away. Each object is rebuilt
+        from the memory mapped file when a getter first asks for it, and
+        has the fields and last modified time it was saved with.
+
+        Returns the number of objects available.
+
+        Throws:
+        ValueError -- if the file is not a saved cache
+
+        """
+        snapshot = wowthon.CacheSnapshot(path)
+        if self._snapshot is not None:
+            self._snapshot.close()
+        self._snapshot = snapshot
+        return len(snapshot)
+
+    def _get_json(self, url, last_modified=None, store_key=None):
         """
         Make a dictionary from the JSON file at `url`.
 
-        Throws APIError if a call returns an error.
+        If `last_modified` is given, as a lastModified timestamp in
+        milliseconds, the file is only downloaded if it has changed since.
+        None is returned if it has not.
+
+        If `store_key` is given and the API has a persistent store, the
+        file is saved in the store under that key.
+
+        If the same file is already being downloaded by another thread, that
+        download is waited for and its dictionary is returned instead.
+
+        Throws APIError if a call returns an error. 404 errors are
+        remembered for `not_found_ttl` seconds and raised again from memory.
+
+        """
+        if self.not_found_ttl:
+            with self._stats_lock:
+                missing = self._not_found.get(url)
+                if missing and missing[1] <= time.time():
+                    del self._not_found[url]
+                elif missing:
+                    self._not_found_saved += 1
+                    raise wowthon.APIError(404, missing[0])
+
+        if self.private_key and self.public_key:
+            final_url = url.replace('http://', 'https://')
+        else:
+            final_url = url
+        return self._in_flight.do((final_url, last_modified),
+                                  self._download_json, url, last_modified,
+                                  store_key)
+
+    def _get_stored_json(self, url, store_key):
+        """
+        Make a dictionary from the JSON file at `url`, using the copy in the
+        API's persistent store if there is one.
+
+        `store_key` is a tuple of (region, locale, kind, id).
+
+        """
+        if self.store is not None:
+            data = self.store.get(store_key)
+            if data is not None:
+                return self._decode_json(data)
+        return self._get_json(url, store_key=store_key)
+
+    def _download_json(self, url, last_modified=None, store_key=None):
+        """
+        Download the JSON file at `url`. See `WoWAPI._get_json`.
+
+        """
+        requested_url = url
+        url, headers = self._prepare_request(url, last_modified)
+        req, data = self._request(url, headers)
+        if req.status == 304:
+            return None
+        self._raise_for_status(requested_url, req, data)
+
+        json = self._decode_json(data)
+        if store_key and self.store is not None:
+            self.store.put(store_key, data)
+        return json
+
+    def _stream(self, url):
+        """
+        Download the file at `url`, yielding its decompressed body in pieces
+        as it arrives.
+
+        Errors are raised as by `WoWAPI._get_json`, before the first piece.
+
+        """
+        requested_url = url
+        url, headers = self._prepare_request(url)
+        req, data = self._request(url, headers, stream=True)
+        if data is not None:
+            # Not a success, so it has been read already
+            self._raise_for_status(requested_url, req, data)
+        with req:
+            yield from req.iter_content()
+        self._record_transfer(url, req)
+
+    def _prepare_request(self, url, last_modified=None):
+        """
+        Return a tuple of the URL to request for `url` and the headers to
+        send with it.
 
         """
         # TODO Just use SSL all the time?
         cur_time = time.strftime(self._TIME_FORMAT, time.gmtime())
         headers = {
             'Date' : cur_time,
+            'Accept-Encoding' : ', '.join(wowthon.Response.ENCODINGS)
         }
+        if last_modified:
+            headers['If-Modified-Since'] = time.strftime(
+                self._TIME_FORMAT, time.gmtime(last_modified / 1000))
 
         if self.private_key and self.public_key:
             # Auth keys set, add auth header and use SSL
@@ -280,21 +688,160 @@ class WoWAPI(wowthon._FetchMixin):
 
             headers.update({'Authorization' : auth_str})
             url = url.replace('http://', 'https://')
+        return url, headers
 
-        requester = urllib.request.Request(url, headers=headers)
-        try:
-            req = urllib.request.urlopen(requester)
-        except urllib.error.HTTPError as e:
-            code = e.getcode()
-            if code not in [404, 500]:
-                # We can only handle 404 and 500 errors
+    def _raise_for_status(self, url, req, data):
+        """
+        Raise the error for the response `req` to a request for `url`, with
+        the body `data`, unless it was successful.
+
+        """
+        code = req.status
+        if code in [404, 500]:
+            error_json = self._decode_json(data)
+            if code == 404 and self.not_found_ttl:
+                self._remember_not_found(url, error_json)
+            raise wowthon.APIError(code, error_json)
+        elif code != 200:
+            # We can only handle 404 and 500 errors
+            raise HTTPError(url, code, req.reason, req.headers, None)
+
+    def _remember_not_found(self, url, error_json):
+        """
+        Remember that `url` returned a 404 with the body `error_json`.
+
+        """
+        with self._stats_lock:
+            self._not_found.pop(url, None)
+            if len(self._not_found) >= self.NOT_FOUND_LIMIT:
+                # Drop the oldest
+                del self._not_found[next(iter(self._not_found))]
+            self._not_found[url] = (error_json,
+                                    time.time() + self.not_found_ttl)
+
+    def _decode_json(self, data):
+        """
+        Make a dictionary from the UTF-8 JSON document `data`.
+
+        The bytes are parsed directly, without first being decoded into a
+        string, to avoid holding another copy of large documents.
+
+        """
+        if self.json_backend == 'orjson':
+            return orjson.loads(data)
+        return jsonlib.loads(data)
+
+    def _request(self, url, headers, stream=False):
+        """
+        Make a GET request for `url`, returning a tuple of the response and
+        its decompressed body.
+
+        If `stream` is true, a successful response is returned open and
+        unread, with None in place of its body, for the caller to read and
+        close.
+
+        Connection errors, timeouts, 5xx and 429 responses are retried with
+        a random, exponentially growing delay. Requests to a region that
+        keeps failing are refused by its circuit breaker.
+
+        """
+        region = self._region_for_url(url)
+        breaker = self._breaker(region)
+        limiter = self.rate_limiter(region)
+
+        attempt = 0
+        while True:
+            # Asked first, so that an open breaker fails fast without
+            # waiting for or spending the limiter's tokens
+            trial = breaker.allow()
+
+            error = None
+            retry_after = None
+            try:
+                if limiter:
+                    limiter.acquire()
+                # Connections are kept alive and reused between calls
+                req = self.transport.urlopen(url, headers, self.timeout)
+                if stream and req.status == 200:
+                    data = None
+                else:
+                    with req:
+                        # Grown in place to avoid holding every chunk and
+                        # the joined body at once
+                        data = bytearray()
+                        for chunk in req.iter_content():
+                            data += chunk
+                    self._record_transfer(url, req)
+            except socket.timeout as e:
+                error = e
+                self._count('timeouts')
+                breaker.failure()
+            except (OSError, http.client.HTTPException) as e:
+                error = e
+                self._count('connection_errors')
+                breaker.failure()
+            except BaseException:
+                if trial:
+                    # Nothing was learnt about the region
+                    breaker.release()
                 raise
             else:
-                error_data = str(e.read(), 'UTF-8')
-                error_json = jsonlib.loads(error_data)
-                raise wowthon.APIError(code, error_json)
+                if req.status >= 500:
+                    self._count('server_errors')
+                    breaker.failure()
+                elif req.status == 429:
+                    # The region is up, we are just asking too much of it
+                    self._count('throttled')
+                    breaker.success()
+                else:
+                    breaker.success()
+                    return req, data
+                retry_after = req.getheader('Retry-After')
+
+            if attempt >= self.retries:
+                self._count('gave_up')
+                if error:
+                    raise error
+                return req, data
+
+            # Full jitter: wait anything up to the exponential backoff
+            delay = random.uniform(0, self.backoff * 2 ** attempt)
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, int(retry_after))
+            attempt += 1
+            self._count('retries')
+            time.sleep(delay)
+
+    def _record_transfer(self, url, req):
+        """
+        Add the transfer sizes of the response `req` to the API's totals.
 
-        return jsonlib.loads(str(req.read(), 'UTF-8'))
+        """
+        transfer = {
+            'url' : url,
+            'encoding' : req.encoding,
+            'requests' : 1,
+            'compressed' : 1 if req.encoding else 0,
+            'wire_bytes' : req.wire_bytes,
+            'bytes' : req.decoded_bytes
+        }
+        with self._stats_lock:
+            for key in self._transfer_stats:
+                self._transfer_stats[key] += transfer[key]
+        if self.on_transfer:
+            self.on_transfer(transfer)
+
+    def _fetch_async(self, obj, force=False):
+        """
+        Return an awaitable which fetches the data for `obj` in a worker
+        thread and resolves to `obj`.
+
+        """
+        def hydrate():
+            obj._fetch(force)
+            return obj
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(self._executor, hydrate)
 
     def _get_locale_suffix(self, prefix='?', locale=None):
         """
@@ -389,9 +936,9 @@ class WoWAPI(wowthon._FetchMixin):
             realm_name = wowthon.WoWAPI.realm_name_to_slug(realm)
 
         if use_cache:
-            cdata = self._cache_fetch(region, 'guild', realm_name,
+            cdata = self._cache_fetch('guild', region, realm_name,
                                       name.lower())
-            if cdata:
+            if cdata is not None:
                 # print('Using cached data for guild', name, 'on', realm)
                 return cdata
         # Requested to not use cache, return new quest without updating
@@ -399,7 +946,8 @@ class WoWAPI(wowthon._FetchMixin):
         data = wowthon.Guild(self, name, realm, region, initial_fields,
                              json=json)
         if use_cache:
-            self._cache_set(data, region, 'guild', realm_name, name.lower())
+            data = self._cache_set(data, 'guild', region, realm_name,
+                                   name.lower())
         return data
 
     def get_char(self, name, realm=None, region=None, locale=None,
@@ -417,9 +965,9 @@ class WoWAPI(wowthon._FetchMixin):
             realm_name = wowthon.WoWAPI.realm_name_to_slug(realm)
 
         if use_cache:
-            cdata = self._cache_fetch(region, locale, 'char', realm_name,
+            cdata = self._cache_fetch('char', region, locale, realm_name,
                                       name.lower())
-            if cdata:
+            if cdata is not None:
                 #print('Using cached data for character', name, 'on', realm)
                 return cdata
         # Requested to not use cache, return new quest without updating
@@ -427,8 +975,8 @@ class WoWAPI(wowthon._FetchMixin):
         data = wowthon.Character(self, name, realm, region, locale,
                                  initial_fields, json=json)
         if use_cache:
-            self._cache_set(data, region, locale, 'char', realm_name,
-                            name.lower())
+            data = self._cache_set(data, 'char', region, locale,
+                                   realm_name, name.lower())
         return data
 
     def get_achieve(self, id, region=None, locale=None, use_cache=True):
@@ -439,15 +987,15 @@ class WoWAPI(wowthon._FetchMixin):
         if not region: region = self.region
         if not locale: locale = self.locale
         if use_cache:
-            cdata = self._cache_fetch(region, locale, 'ach', id)
-            if cdata:
+            cdata = self._cache_fetch('ach', region, locale, id)
+            if cdata is not None:
                 # print('Using cached data for achieve', id) # Debug
                 return cdata
         # Requested to not use cache, return new quest without updating
         # the cache.
         data = wowthon.Achievement(self, id, region=region, locale=locale)
         if use_cache:
-            self._cache_set(data, region, locale, 'ach', id)
+            data = self._cache_set(data, 'ach', region, locale, id)
         return data
 
     def get_quest(self, id, region=None, locale=None, use_cache=True):
@@ -458,15 +1006,15 @@ class WoWAPI(wowthon._FetchMixin):
         if not region: region = self.region
         if not locale: locale = self.locale
         if use_cache:
-            cdata = self._cache_fetch(region, locale, 'quest', id)
-            if cdata:
+            cdata = self._cache_fetch('quest', region, locale, id)
+            if cdata is not None:
                 # print('Using cached data for quest', id) # Debug
                 return cdata
         # Requested to not use cache, return new quest without updating
         # the cache.
         data = wowthon.Quest(self, id, region=region, locale=locale)
         if use_cache:
-            self._cache_set(data, region, locale, 'quest', id)
+            data = self._cache_set(data, 'quest', region, locale, id)
         return data
 
     def get_item(self, id, region=None, locale=None, use_cache=True):
@@ -478,17 +1026,151 @@ class WoWAPI(wowthon._FetchMixin):
         if not locale: locale = self.locale
 
         if use_cache:
-            cdata = self._cache_fetch(region, locale, 'item', id)
-            if cdata:
+            cdata = self._cache_fetch('item', region, locale, id)
+            if cdata is not None:
                 # print('Using cached data for item', id) # Debug
                 return cdata
         # Requested to not use cache, return new item without updating
         # the cache.
         data = wowthon.Item(self, id, region=region, locale=locale)
         if use_cache:
-            self._cache_set(data, region, locale, 'item', id)
+            data = self._cache_set(data, 'item', region, locale, id)
         return data
 
+    #
+    # Bulk getters
+    #
+
+    def _fetch_many(self, objs, workers=None, errors=None, keys=None,
+                    force=None):
+        """
+        Fetch the data for every object in `objs` that has not yet been
+        downloaded, using up to `workers` threads at once.
+
+        Objects whose request raises an APIError are replaced with None in
+        the returned list. If `errors` is a dictionary, the error is stored
+        in it, keyed by the matching entry of `keys`.
+
+        `force` may be a set of ids of objects to fetch even if they have
+        already been downloaded.
+
+        """
+        if not workers:
+            workers = getattr(self.transport, 'max_size', 8)
+        if keys is None: keys = list(range(len(objs)))
+        if force is None: force = set()
+
+        # Only fetch each distinct object once
+        pending = {}
+        for obj in objs:
+            if not obj._json or id(obj) in force:
+                pending[id(obj)] = obj
+
+        failed = {}
+        if pending:
+            with concurrent.futures.ThreadPoolExecutor(workers) as ex:
+                futures = {}
+                for obj in pending.values():
+                    f = ex.submit(obj._fetch, id(obj) in force)
+                    futures[f] = obj
+                for f in concurrent.futures.as_completed(futures):
+                    try:
+                        f.result()
+                    except wowthon.APIError as e:
+                        failed[id(futures[f])] = e
+
+        ret = []
+        for key, obj in zip(keys, objs):
+            if id(obj) in failed:
+                if errors is not None:
+                    errors[key] = failed[id(obj)]
+                ret.append(None)
+            else:
+                ret.append(obj)
+        return ret
+
+    def get_chars(self, names, realm=None, region=None, locale=None,
+                  fields=None, workers=None, errors=None, use_cache=True):
+        """
+        Return a list of downloaded Character objects, one for each name in
+        `names`, in the same order.
+
+        Characters that are not yet downloaded are fetched in parallel.
+        If a character cannot be fetched (for example, if it does not exist)
+        None is returned in its place and, if `errors` is a dictionary, the
+        `wowthon.APIError` raised is stored in it by name.
+
+        Arguments:
+        names -- a list of character names
+
+        Optional arguments:
+        realm -- the realm the characters reside on (default: api settings)
+        region -- the API region the realm is on (default: api settings)
+        locale -- the locale to use (default: api settings)
+        fields -- a list of fields to fetch for every character
+                  (default: None)
+        workers -- the maximum number of requests to make at once
+                   (default: the connection pool size, or 8)
+        errors -- a dictionary to record failures in (default: None)
+        use_cache -- whether to use and fill the cache (default: True)
+
+        """
+        if not fields: fields = []
+        names = list(names)
+        objs = []
+        stale = set()
+        for name in names:
+            char = self.get_char(name, realm, region, locale,
+                                 initial_fields=list(fields),
+                                 use_cache=use_cache)
+            # Cached characters may not have every field asked for
+            for field in fields:
+                if field not in char._fields:
+                    char._add_field(field)
+                    stale.add(id(char))
+            objs.append(char)
+        return self._fetch_many(objs, workers, errors, names, stale)
+
+    def get_items(self, ids, region=None, locale=None, workers=None,
+                  errors=None, use_cache=True):
+        """
+        Return a list of downloaded Item objects, one for each id in `ids`,
+        in the same order.
+
+        Failures are handled as in `WoWAPI.get_chars`.
+
+        """
+        ids = list(ids)
+        objs = [self.get_item(id, region, locale, use_cache) for id in ids]
+        return self._fetch_many(objs, workers, errors, ids)
+
+    def get_quests(self, ids, region=None, locale=None, workers=None,
+                   errors=None, use_cache=True):
+        """
+        Return a list of downloaded Quest objects, one for each id in `ids`,
+        in the same order.
+
+        Failures are handled as in `WoWAPI.get_chars`.
+
+        """
+        ids = list(ids)
+        objs = [self.get_quest(id, region, locale, use_cache) for id in ids]
+        return self._fetch_many(objs, workers, errors, ids)
+
+    def get_achieves(self, ids, region=None, locale=None, workers=None,
+                     errors=None, use_cache=True):
+        """
+        Return a list of downloaded Achievement objects, one for each id in
+        `ids`, in the same order.
+
+        Failures are handled as in `WoWAPI.get_chars`.
+
+        """
+        ids = list(ids)
+        objs = [self.get_achieve(id, region, locale, use_cache)
+                for id in ids]
+        return self._fetch_many(objs, workers, errors, ids)
+
     def get_arena_team(self, size, name, realm=None, region=None,
                        locale=None):
         """
@@ -529,21 +1211,21 @@ class WoWAPI(wowthon._FetchMixin):
         if not locale: locale = self.locale
 
         if use_cache:
-            cdata = self._cache_fetch(region, locale, 'item_class')
-            if cdata:
+            cdata = self._cache_fetch('item_class', region, locale)
+            if cdata is not None:
                 return cdata
 
         # Data not cached or cache not being used
         url = wowthon.REGION[region]['prefix'] + 'data/item/classes' + \
               '?locale=' + locale
-        data = self._get_json(url)
+        data = self._get_stored_json(url, (region, locale, 'item_class', ''))
 
         ret = {}
         for ic in data['classes']:
             ret.update({ic['class'] : ic['name']})
 
         if use_cache:
-            self._cache_set(ret, region, locale, 'item_class')
+            ret = self._cache_set(ret, 'item_class', region, locale)
         return ret
 
     def get_battlegroups(self, region=None, use_cache=True):
@@ -558,16 +1240,17 @@ class WoWAPI(wowthon._FetchMixin):
         if not region: region = self.region
 
         if use_cache:
-            cdata = self._cache_fetch(region, 'battlegroups')
-            if cdata:
+            cdata = self._cache_fetch('battlegroups', region)
+            if cdata is not None:
                 return cdata
 
         # Data not cached or cache not being used
         url = wowthon.REGION[region]['prefix'] + 'data/battlegroups/'
-        data = self._get_json(url)['battlegroups']
+        data = self._get_stored_json(url, (region, '', 'battlegroups', ''))
+        data = data['battlegroups']
 
         if use_cache:
-            self._cache_set(data, region, 'battlegroups')
+            data = self._cache_set(data, 'battlegroups', region)
         return data
 
     def get_classes(self, region=None, locale=None, use_cache=True):
@@ -585,12 +1268,13 @@ class WoWAPI(wowthon._FetchMixin):
         if not locale: locale = self.locale
 
         if use_cache:
-            cdata = self._cache_fetch(region, locale, 'classes')
-            if cdata: return cdata
+            cdata = self._cache_fetch('classes', region, locale)
+            if cdata is not None: return cdata
 
         url = wowthon.REGION[region]['prefix'] + 'data/character/classes' + \
               '?locale=' + locale
-        data = self._get_json(url)['classes']
+        data = self._get_stored_json(url, (region, locale, 'classes', ''))
+        data = data['classes']
 
         ret = []
 
@@ -604,7 +1288,7 @@ class WoWAPI(wowthon._FetchMixin):
             ret.append(pycls)
 
         if use_cache:
-            self._cache_set(ret, region, locale, 'classes')
+            ret = self._cache_set(ret, 'classes', region, locale)
         return ret
 
     def get_races(self, region=None, locale=None, use_cache=True):
@@ -617,13 +1301,14 @@ class WoWAPI(wowthon._FetchMixin):
         if not locale: locale = self.locale
 
         if use_cache:
-            cdata = self._cache_fetch(region, locale, 'races')
-            if cdata: return cdata
+            cdata = self._cache_fetch('races', region, locale)
+            if cdata is not None: return cdata
 
         url = wowthon.REGION[region]['prefix'] + 'data/character/races' + \
               '?locale=' + locale
-        data = self._get_json(url)['races']
+        data = self._get_stored_json(url, (region, locale, 'races', ''))
+        data = data['races']
 
         if use_cache:
-            self._cache_set(data, region, locale, 'races')
+            data = self._cache_set(data, 'races', region, locale)
         return data